@@ -1,13 +1,28 @@
 """
 Admin site for models.
 """
-from django.contrib import admin
+from decimal import ROUND_HALF_UP, Decimal
+
+from django import forms
+from django.conf import settings
+from django.contrib import admin, messages
+from django.contrib.admin import helpers
 from django.contrib.auth.admin import UserAdmin
+from django.core.paginator import Paginator
+from django.db import transaction
+from django.db.models import DecimalField, F, Max, Min, Value
+from django.db.models.functions import Round
+from django.forms.models import BaseInlineFormSet
+from django.http import QueryDict
+from django.template.response import TemplateResponse
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
 from django.urls import reverse
 from django.utils.safestring import mark_safe
 
+from mptt.forms import TreeNodeChoiceField
+
 from core.models.product import (
     Category,
     Product,
@@ -21,6 +36,7 @@ from core.models.user import (
     Profile,
     ProfileImage
 )
+from core.signals import catalog_changed
 
 User = get_user_model()
 
@@ -85,59 +101,424 @@ class EditLinkInline(object):
             return ""
 
 
-class ProductImageInline(admin.TabularInline):
+class PaginatedInlineFormSet(BaseInlineFormSet):
+    """Inline formset of one page of the related objects, the page
+    number is read from the "<prefix>-page" query parameter."""
+
+    per_page = 20
+    query_params = QueryDict()
+
+    @property
+    def page_param(self):
+        return f"{self.prefix}-page"
+
+    def get_page_query(self, number):
+        """Returning the query string of the current page with
+        the page of this inline replaced by the number, so the
+        pages of the other inlines and the preserved filters stay."""
+        params = self.query_params.copy()
+        params[self.page_param] = number
+        return params.urlencode()
+
+    @property
+    def previous_page_query(self):
+        return self.get_page_query(self.page.previous_page_number())
+
+    @property
+    def next_page_query(self):
+        return self.get_page_query(self.page.next_page_number())
+
+    def get_queryset(self):
+        if not hasattr(self, "page"):
+            paginator = Paginator(super().get_queryset(), self.per_page)
+            self.page = paginator.get_page(
+                self.query_params.get(self.page_param)
+            )
+            self._queryset = self.page.object_list
+        return self._queryset
+
+
+class PaginatedInline(object):
+    """Showing the related objects of an inline in pages of
+    ADMIN_INLINE_PER_PAGE rows, so the change form of an object with
+    many related objects renders and saves a bounded number."""
+
+    formset = PaginatedInlineFormSet
+    template = "admin/edit_inline/paginated_tabular.html"
+
+    def get_formset(self, request, obj=None, **kwargs):
+        formset = super().get_formset(request, obj, **kwargs)
+        formset.per_page = settings.ADMIN_INLINE_PER_PAGE
+        formset.query_params = request.GET
+        return formset
+
+
+class AttributeValueChoices(object):
+    """Loading the attribute of the attribute values shown
+    by the autocomplete widgets of the attribute_value field."""
+
+    autocomplete_fields = ["attribute_value"]
+
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == "attribute_value":
+            kwargs["queryset"] = AttributeValue.objects.select_related(
+                "attribute"
+            )
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+
+
+class ProductImageInline(PaginatedInline, admin.TabularInline):
     """To adding ProductImage's instances to a
     ProductLine instance while creating it in admin site."""
 
     model = ProductImage
+    ordering = ["order", "pk"]
 
 
-class AttributeValueInline(admin.TabularInline):
+class AttributeValueInline(
+    PaginatedInline, AttributeValueChoices, admin.TabularInline
+):
     """To adding AttributeValues instances to a
     ProductLine instance while creating it in admin site."""
 
     model = AttributeValue.product_line_attribute_value.through
+    ordering = ["pk"]
 
 
-class AttributeValueProductInline(admin.TabularInline):
+class AttributeValueProductInline(
+    PaginatedInline, AttributeValueChoices, admin.TabularInline
+):
     """To adding AttributeValues instances to a
     ProductLine instance while creating it in admin site."""
 
     model = AttributeValue.product_attribute_value.through
+    ordering = ["pk"]
+
+
+# ======= Bulk actions applied by set-based updates =======
+class MoveCategoryForm(forms.Form):
+    """Form of the category the selected products are moved to."""
+
+    category = TreeNodeChoiceField(queryset=Category.objects.all())
+
+
+class PriceChangeForm(forms.Form):
+    """Form of a price change of the selected product lines."""
+
+    MODES = [
+        ("set", "Set the price to"),
+        ("amount", "Add to the price"),
+        ("percent", "Add a percentage to the price"),
+    ]
+
+    mode = forms.ChoiceField(choices=MODES)
+    value = forms.DecimalField(max_digits=9, decimal_places=4)
+
+
+def get_price_limit():
+    """Returning the highest price the price column holds."""
+    field = ProductLine._meta.get_field("price")
+    return (
+        Decimal(10) ** (field.max_digits - field.decimal_places)
+        - Decimal(10) ** -field.decimal_places
+    )
+
+
+def get_price_expression(mode, value):
+    """Returning the new price of the lines as an SQL expression,
+    rounded to the cents like the price column."""
+    output_field = ProductLine._meta.get_field("price")
+    if mode == "set":
+        return Value(value, output_field=output_field)
+    if mode == "amount":
+        change = F("price") + Value(value, output_field=output_field)
+    else:
+        change = F("price") * Value(
+            1 + value / 100,
+            output_field=DecimalField(max_digits=11, decimal_places=4),
+        )
+    return Round(change, 2, output_field=output_field)
+
+
+@transaction.atomic
+def change_prices(lines, mode, value):
+    """Changing the prices of the product lines in one query, after
+    checking the new prices are within the bounds of the column in
+    another. Returning the number of changed lines."""
+    price = get_price_expression(
+        mode, value.quantize(Decimal("0.01"), ROUND_HALF_UP)
+    )
+    line_ids = list(lines.values_list("pk", flat=True))
+    lines = ProductLine.objects.filter(pk__in=line_ids)
+    bounds = lines.aggregate(low=Min(price), high=Max(price))
+    if line_ids and not (
+        0 <= bounds["low"] and bounds["high"] <= get_price_limit()
+    ):
+        raise ValueError(
+            f"The new prices range from {bounds['low']:.2f} to "
+            f"{bounds['high']:.2f}, outside of 0 to {get_price_limit()}."
+        )
+    lines.update(price=price, updated_at=timezone.now())
+    catalog_changed.send(
+        sender=ProductLine,
+        product_ids=set(lines.values_list("product_id", flat=True)),
+    )
+    return len(line_ids)
+
+
+@transaction.atomic
+def update_products(products, **values):
+    """Updating the products in one query, the categories they
+    leave have their facets invalidated. Returning their number."""
+    product_ids = list(products.values_list("pk", flat=True))
+    products = Product.objects.filter(pk__in=product_ids)
+    category_ids = (
+        set(products.values_list("category_id", flat=True))
+        if "category" in values
+        else ()
+    )
+    products.update(**values, updated_at=timezone.now())
+    catalog_changed.send(
+        sender=Product, product_ids=product_ids, category_ids=category_ids
+    )
+    return len(product_ids)
+
+
+@transaction.atomic
+def update_product_lines(lines, **values):
+    """Updating the product lines in one query. Returning their number."""
+    line_ids = list(lines.values_list("pk", flat=True))
+    lines = ProductLine.objects.filter(pk__in=line_ids)
+    lines.update(**values, updated_at=timezone.now())
+    catalog_changed.send(
+        sender=ProductLine,
+        product_ids=set(lines.values_list("product_id", flat=True)),
+    )
+    return len(line_ids)
+
+
+@transaction.atomic
+def update_categories(categories, **values):
+    """Updating the categories in one query. Returning their number."""
+    category_ids = list(categories.values_list("pk", flat=True))
+    Category.objects.filter(pk__in=category_ids).update(
+        **values, updated_at=timezone.now()
+    )
+    catalog_changed.send(
+        sender=Category, product_ids=[], category_ids=category_ids
+    )
+    return len(category_ids)
+
+
+class BulkActionsAdmin(object):
+    """Helpers of the bulk actions asking for their parameters with
+    an intermediate form, the form is posted back to the changelist
+    with the selection and applied when it's valid."""
+
+    def get_action_form(self, request, queryset, form_class, title):
+        """Returning the bound form of an applied action, or a
+        response rendering the form with the selection."""
+        if "apply" in request.POST:
+            form = form_class(request.POST)
+            if form.is_valid():
+                return form
+        else:
+            form = form_class()
+        return TemplateResponse(
+            request,
+            "admin/bulk_action_form.html",
+            {
+                **self.admin_site.each_context(request),
+                "title": title,
+                "opts": self.model._meta,
+                "form": form,
+                "count": queryset.count(),
+                "action": request.POST["action"],
+                "selected": request.POST.getlist(
+                    helpers.ACTION_CHECKBOX_NAME
+                ),
+                "select_across": request.POST.get("select_across", "0"),
+                "action_checkbox_name": helpers.ACTION_CHECKBOX_NAME,
+            },
+        )
+
+    def report(self, request, count, change):
+        self.message_user(
+            request,
+            f"{change.capitalize()} {count} "
+            f"{self.model._meta.verbose_name_plural}.",
+            messages.SUCCESS,
+        )
+
+    def apply_price_change(self, request, lines):
+        """Applying the price change form to the product lines."""
+        form = self.get_action_form(
+            request, lines, PriceChangeForm, "Change the prices"
+        )
+        if isinstance(form, TemplateResponse):
+            return form
+        try:
+            count = change_prices(lines, **form.cleaned_data)
+        except ValueError as error:
+            self.message_user(request, str(error), messages.ERROR)
+            return
+        self.message_user(
+            request,
+            f"Changed the prices of {count} product lines.",
+            messages.SUCCESS,
+        )
 
 
 @admin.register(ProductLine)
-class ProductLineAdmin(admin.ModelAdmin):
+class ProductLineAdmin(BulkActionsAdmin, admin.ModelAdmin):
     """Exhibiting ProductLine's instances in admin site."""
 
     inlines = [ProductImageInline, AttributeValueInline]
+    list_display = (
+        "sku", "product", "product_type", "price", "stock_qty", "is_active"
+    )
+    list_select_related = ("product", "product_type")
+    search_fields = ["sku", "product__name"]
+    autocomplete_fields = ["product", "product_type"]
+    show_full_result_count = False
+    actions = ["activate", "deactivate", "change_prices"]
+
+    @admin.action(description="Activate the selected product lines")
+    def activate(self, request, queryset):
+        self.report(
+            request, update_product_lines(queryset, is_active=True),
+            "activated",
+        )
+
+    @admin.action(description="Deactivate the selected product lines")
+    def deactivate(self, request, queryset):
+        self.report(
+            request, update_product_lines(queryset, is_active=False),
+            "deactivated",
+        )
 
+    @admin.action(description="Change the prices of the selected lines")
+    def change_prices(self, request, queryset):
+        return self.apply_price_change(request, queryset)
 
-class ProductLineInline(EditLinkInline, admin.TabularInline):
+
+class ProductLineInline(PaginatedInline, EditLinkInline, admin.TabularInline):
     """To adding ProductLine's instances to a
     Product instance while creating it in admin site."""
 
     model = ProductLine
     readonly_fields = ("edit",)
+    autocomplete_fields = ["product_type"]
+    ordering = ["order", "pk"]
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(BulkActionsAdmin, admin.ModelAdmin):
     """Exhibiting Product's instances in admin site."""
 
     inlines = [ProductLineInline, AttributeValueProductInline]
+    list_display = (
+        "name",
+        "category",
+        "product_type",
+        "min_price",
+        "in_stock",
+        "is_active",
+    )
+    list_select_related = ("category", "product_type")
+    search_fields = ["name", "pid", "slug"]
+    autocomplete_fields = ["category", "product_type"]
+    show_full_result_count = False
+    actions = ["activate", "deactivate", "move_to_category", "change_prices"]
+
+    @admin.action(description="Activate the selected products")
+    def activate(self, request, queryset):
+        self.report(
+            request, update_products(queryset, is_active=True), "activated"
+        )
+
+    @admin.action(description="Deactivate the selected products")
+    def deactivate(self, request, queryset):
+        self.report(
+            request, update_products(queryset, is_active=False),
+            "deactivated",
+        )
+
+    @admin.action(description="Move the selected products to a category")
+    def move_to_category(self, request, queryset):
+        form = self.get_action_form(
+            request, queryset, MoveCategoryForm, "Move to a category"
+        )
+        if isinstance(form, TemplateResponse):
+            return form
+        category = form.cleaned_data["category"]
+        self.report(
+            request,
+            update_products(queryset, category=category),
+            f"moved to {category}",
+        )
+
+    @admin.action(description="Change the prices of the selected products")
+    def change_prices(self, request, queryset):
+        return self.apply_price_change(
+            request, ProductLine.objects.filter(product__in=queryset)
+        )
 
 
-class AttributeInline(admin.TabularInline):
+class AttributeInline(PaginatedInline, admin.TabularInline):
     model = Attribute.product_type_attribute.through
+    autocomplete_fields = ["attribute"]
+    ordering = ["pk"]
 
 
 @admin.register(ProductType)
 class ProductTypeAdmin(admin.ModelAdmin):
     """Exhibiting ProductType's instances in admin site."""
     inlines = [AttributeInline]
+    search_fields = ["name"]
+
+
+@admin.register(Category)
+class CategoryAdmin(BulkActionsAdmin, admin.ModelAdmin):
+    """Exhibiting Category's instances in admin site."""
+
+    list_display = ("name", "slug", "parent", "is_active")
+    list_select_related = ("parent",)
+    search_fields = ["name", "slug"]
+    autocomplete_fields = ["parent"]
+    actions = ["activate", "deactivate"]
+
+    @admin.action(description="Activate the selected categories")
+    def activate(self, request, queryset):
+        self.report(
+            request, update_categories(queryset, is_active=True),
+            "activated",
+        )
+
+    @admin.action(description="Deactivate the selected categories")
+    def deactivate(self, request, queryset):
+        self.report(
+            request, update_categories(queryset, is_active=False),
+            "deactivated",
+        )
+
+
+@admin.register(Attribute)
+class AttributeAdmin(admin.ModelAdmin):
+    """Exhibiting Attribute's instances in admin site."""
+
+    search_fields = ["name"]
+
+
+@admin.register(AttributeValue)
+class AttributeValueAdmin(admin.ModelAdmin):
+    """Exhibiting AttributeValue's instances in admin site, their
+    attribute is part of their name in the autocomplete results."""
 
+    list_display = ("value", "attribute")
+    ordering = ["attribute__name", "value"]
+    search_fields = ["value", "attribute__name"]
+    autocomplete_fields = ["attribute"]
 
-admin.site.register(Category)
-admin.site.register(Attribute)
-admin.site.register(AttributeValue)
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related("attribute")
@@ -1,9 +1,12 @@
 """
 Custom fields for models.
 """
-from django.db import models
+from django.db import IntegrityError, connections, models, router, transaction
+from django.db.models import Max
 from django.core import checks
-from django.core.exceptions import ObjectDoesNotExist
+
+# Attempts of a save whose order number was taken by a concurrent save.
+ORDER_ALLOCATION_ATTEMPTS = 5
 
 
 class OrderField(models.PositiveIntegerField):
@@ -44,24 +47,115 @@ class OrderField(models.PositiveIntegerField):
             ]
         return []
 
+    @property
+    def unique_for_attname(self):
+        """Returning the column name of the unique_for_field attribute."""
+        return self.model._meta.get_field(self.unique_for_field).attname
+
+    def lock_parents(self, values, using):
+        """Locking the parent rows of the given values, so concurrent
+        allocations for the same parent wait until commit."""
+        field = self.model._meta.get_field(self.unique_for_field)
+        connection = connections[using]
+        if not (
+            field.is_relation
+            and connection.features.has_select_for_update
+            and connection.in_atomic_block
+        ):
+            return
+        list(
+            field.related_model._base_manager.using(using)
+            .select_for_update()
+            .filter(pk__in=values)
+            .values_list("pk", flat=True)
+        )
+
+    def next_values(self, values, using):
+        """Returning the next free order number
+        for each of the given values in one query."""
+        queryset = (
+            self.model._base_manager.using(using)
+            .filter(**{f"{self.unique_for_attname}__in": values})
+            .values(self.unique_for_attname)
+            .annotate(last=Max(self.attname))
+            .order_by()
+        )
+        next_values = dict.fromkeys(values, 1)
+        for row in queryset:
+            next_values[row[self.unique_for_attname]] = row["last"] + 1
+        return next_values
+
+    def allocate(self, objs, using):
+        """Assigning contiguous order numbers to all
+        the instances without an order number."""
+        objs = [obj for obj in objs if getattr(obj, self.attname) is None]
+        if not objs:
+            return
+        values = {getattr(obj, self.unique_for_attname) for obj in objs}
+        self.lock_parents(values, using)
+        next_values = self.next_values(values, using)
+        for obj in objs:
+            value = getattr(obj, self.unique_for_attname)
+            setattr(obj, self.attname, next_values[value])
+            next_values[value] += 1
+
+    def is_taken(self, obj, using):
+        """Returning whether another row has the order number of obj."""
+        return (
+            self.model._base_manager.using(using)
+            .filter(
+                **{
+                    self.unique_for_attname: getattr(
+                        obj, self.unique_for_attname
+                    ),
+                    self.attname: getattr(obj, self.attname),
+                }
+            )
+            .exclude(pk=obj.pk)
+            .exists()
+        )
+
     def pre_save(self, model_instance, add):
         """Generating the order field automatically according
-        to whether there is any instances in database or not."""
+        to the biggest order number of the same parent."""
         if getattr(model_instance, self.attname) is None:
-            queryset = self.model.objects.all()
-            try:
-                query = {
-                    self.unique_for_field: getattr(
-                        model_instance, self.unique_for_field
-                    )
-                }
-                queryset = queryset.filter(**query)
-                last_obj = queryset.latest(self.attname)
-                value = last_obj.order + 1
+            using = router.db_for_write(self.model, instance=model_instance)
+            self.allocate([model_instance], using)
+        return super().pre_save(model_instance, add)
+
+
+class OrderFieldQuerySet(models.QuerySet):
+    """QuerySet allocating order numbers of OrderFields
+    for all the objects of bulk_create in one query."""
+
+    def bulk_create(self, objs, *args, **kwargs):
+        objs = list(objs)
+        with transaction.atomic(using=self.db, savepoint=False):
+            for field in self.model._meta.concrete_fields:
+                if isinstance(field, OrderField):
+                    field.allocate(objs, self.db)
+            return super().bulk_create(objs, *args, **kwargs)
 
-            except ObjectDoesNotExist:
-                value = 1
 
-            return value
-        else:
-            return super().pre_save(model_instance, add)
+def save_allocating_order(instance, save, using=None):
+    """Running save in a savepoint, retrying it with a new order number
+    while a concurrent save takes the allocated one first. SQLite can't
+    lock the parent rows, so concurrent saves can read the same maximum
+    and the unique constraint rejects all but the first insert."""
+    using = using or router.db_for_write(type(instance), instance=instance)
+    fields = [
+        field for field in instance._meta.concrete_fields
+        if isinstance(field, OrderField)
+        and getattr(instance, field.attname) is None
+    ]
+    for attempt in range(1, ORDER_ALLOCATION_ATTEMPTS + 1):
+        try:
+            with transaction.atomic(using=using):
+                return save()
+        except IntegrityError:
+            if attempt == ORDER_ALLOCATION_ATTEMPTS or not any(
+                field.is_taken(instance, using) for field in fields
+            ):
+                raise
+            for field in fields:
+                setattr(instance, field.attname, None)
@@ -0,0 +1,395 @@
+"""
+Custom command for importing a catalog from a CSV or JSONL file.
+"""
+import csv
+import json
+import time
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+from itertools import islice
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from core.models.product import (
+    Attribute,
+    AttributeValue,
+    Category,
+    Product,
+    ProductLine,
+    ProductLineAttributeValue,
+    ProductType,
+)
+from core.signals import catalog_changed
+
+REQUIRED_FIELDS = (
+    "pid",
+    "name",
+    "slug",
+    "category",
+    "product_type",
+    "sku",
+    "price",
+    "stock_qty",
+    "weight",
+)
+MAX_LENGTHS = {"pid": 10, "name": 230, "slug": 255, "sku": 10}
+MAX_PRICE = Decimal("999.99")
+LINE_FIELDS = ("price", "stock_qty", "weight", "is_active")
+PRODUCT_FIELDS = (
+    "name", "description", "category_id", "product_type_id", "is_active"
+)
+
+
+class RowError(Exception):
+    """Raised for a row which can't be imported."""
+
+
+def parse_attributes(value):
+    """Parsing attributes of a JSONL object or
+    a CSV cell like 'color=red;size=M'."""
+    if isinstance(value, dict):
+        return {str(name): str(value) for name, value in value.items()}
+    attributes = {}
+    for item in filter(str.strip, (value or "").split(";")):
+        name, separator, attribute_value = item.partition("=")
+        if not separator:
+            raise RowError(f"Invalid attribute '{item}'.")
+        attributes[name.strip()] = attribute_value.strip()
+    return attributes
+
+
+def clean_row(row):
+    """Validating and converting the values of a row."""
+    missing = [
+        field for field in REQUIRED_FIELDS
+        if not str(row.get(field) or "").strip()
+    ]
+    if missing:
+        raise RowError(f"Missing {', '.join(missing)}.")
+    cleaned = {field: str(row[field]).strip() for field in REQUIRED_FIELDS}
+    for field, max_length in MAX_LENGTHS.items():
+        if len(cleaned[field]) > max_length:
+            raise RowError(f"{field} is longer than {max_length}.")
+    try:
+        cleaned["price"] = Decimal(cleaned["price"])
+        cleaned["stock_qty"] = int(cleaned["stock_qty"])
+        cleaned["weight"] = float(cleaned["weight"])
+    except (InvalidOperation, ValueError):
+        raise RowError("Invalid price, stock_qty or weight.")
+    if (
+        not cleaned["price"].is_finite()
+        or cleaned["price"].as_tuple().exponent < -2
+        or not 0 <= cleaned["price"] <= MAX_PRICE
+    ):
+        raise RowError(f"price must be between 0 and {MAX_PRICE}.")
+    cleaned["description"] = str(row.get("description") or "")
+    cleaned["is_active"] = str(row.get("is_active", "true")).lower() in (
+        "1", "true", "yes"
+    )
+    cleaned["attributes"] = parse_attributes(row.get("attributes"))
+    return cleaned
+
+
+class Command(BaseCommand):
+    """Custom command for streaming a catalog to the
+    database in transactional chunks of bulk writes."""
+
+    help = (
+        "Import product lines from a CSV or JSONL file, one product line "
+        "per row with the columns: pid, name, slug, description, category "
+        "(slug), product_type, sku, price, stock_qty, weight, is_active and "
+        "attributes ('color=red;size=M' in CSV, an object in JSONL)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", help="CSV or JSONL file.")
+        parser.add_argument(
+            "--format",
+            choices=("csv", "jsonl"),
+            help="File format, detected by the file extension by default.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            default=1000,
+            help="Number of rows written in one transaction.",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        path = Path(options["path"])
+        file_format = options["format"] or path.suffix.lstrip(".").lower()
+        if file_format not in ("csv", "jsonl"):
+            raise CommandError("Use a .csv or .jsonl file or --format.")
+        if options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be positive.")
+
+        self.load_lookups()
+        imported = rejected = 0
+        start = time.perf_counter()
+        with path.open(newline="") as file:
+            rows = self.read_rows(file, file_format)
+            while chunk := list(islice(rows, options["chunk_size"])):
+                count, errors = self.import_chunk(chunk)
+                imported += count
+                rejected += len(chunk) - count
+                for line, error in errors:
+                    self.stderr.write(f"Row {line}: {error}")
+                rate = (imported + rejected) / (time.perf_counter() - start)
+                self.stdout.write(
+                    f"{imported} rows imported, {rejected} rejected "
+                    f"({rate:.0f} rows/sec)."
+                )
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {imported} rows in "
+            f"{time.perf_counter() - start:.2f} seconds, "
+            f"{rejected} rows rejected."
+        ))
+
+    def read_rows(self, file, file_format):
+        """Yielding the line number and the raw row of the file."""
+        if file_format == "csv":
+            reader = csv.DictReader(file)
+            for row in reader:
+                yield reader.line_num, row
+            return
+        for line, text in enumerate(file, start=1):
+            if not text.strip():
+                continue
+            try:
+                row = json.loads(text)
+            except ValueError:
+                row = None
+            yield line, row if isinstance(row, dict) else {}
+
+    def load_lookups(self):
+        """Loading the lookup maps of the rows' names to primary keys,
+        their sizes depend on the taxonomy and not on the catalog."""
+        self.categories = dict(Category.objects.values_list("slug", "pk"))
+        self.product_types = dict(
+            ProductType.objects.values_list("name", "pk")
+        )
+        self.attributes = dict(Attribute.objects.values_list("name", "pk"))
+        self.attribute_values = {
+            (attribute_id, value): pk
+            for attribute_id, value, pk in AttributeValue.objects.values_list(
+                "attribute_id", "value", "pk"
+            )
+        }
+
+    def validate_chunk(self, chunk):
+        """Returning the valid rows and the errors of a chunk
+        with set-based checks instead of per-row queries."""
+        rows, errors = [], []
+        for line, raw in chunk:
+            try:
+                rows.append((line, clean_row(raw)))
+            except RowError as error:
+                errors.append((line, str(error)))
+
+        sku_counts = Counter(row["sku"] for _, row in rows)
+        # The unique names and slugs taken by products outside the chunk
+        # or by several products of the chunk, keyed by field and value.
+        taken = {
+            (field, value)
+            for name, slug in Product.objects.exclude(
+                pid__in={row["pid"] for _, row in rows}
+            ).filter(
+                Q(name__in={row["name"] for _, row in rows})
+                | Q(slug__in={row["slug"] for _, row in rows})
+            ).values_list("name", "slug")
+            for field, value in (("name", name), ("slug", slug))
+        }
+        for field in ("name", "slug"):
+            pids = {}
+            for _, row in rows:
+                pids.setdefault(row[field], set()).add(row["pid"])
+            taken.update(
+                (field, value) for value, pid in pids.items() if len(pid) > 1
+            )
+        valid = []
+        for line, row in rows:
+            conflict = next(
+                (
+                    field for field in ("name", "slug")
+                    if (field, row[field]) in taken
+                ),
+                None,
+            )
+            if sku_counts[row["sku"]] > 1:
+                errors.append((line, f"Duplicate sku {row['sku']}."))
+            elif row["category"] not in self.categories:
+                errors.append((line, f"Unknown category {row['category']}."))
+            elif conflict:
+                errors.append((line, f"{conflict} {row[conflict]} is taken."))
+            else:
+                valid.append(row)
+        return valid, sorted(errors)
+
+    def import_chunk(self, chunk):
+        """Writing the valid rows of a chunk in one transaction,
+        the whole chunk is rolled back if any write fails."""
+        rows, errors = self.validate_chunk(chunk)
+        if not rows:
+            return 0, errors
+        lookups = {
+            "product_types": dict(self.product_types),
+            "attributes": dict(self.attributes),
+            "attribute_values": dict(self.attribute_values),
+        }
+        try:
+            with transaction.atomic():
+                self.write_rows(rows, **lookups)
+        except DatabaseError as error:
+            first_line = chunk[0][0]
+            return 0, [*errors, (first_line, f"Chunk rolled back: {error}")]
+        # Keeping the created rows only after the chunk is committed.
+        for name, lookup in lookups.items():
+            setattr(self, name, lookup)
+        return len(rows), errors
+
+    def write_rows(self, rows, product_types, attributes, attribute_values):
+        """Writing the rows with bulk inserts and updates."""
+        self.create_missing(
+            ProductType, "name", product_types,
+            {row["product_type"] for row in rows},
+        )
+        self.create_missing(
+            Attribute, "name", attributes,
+            {name for row in rows for name in row["attributes"]},
+        )
+        missing_values = {
+            (attributes[name], value)
+            for row in rows
+            for name, value in row["attributes"].items()
+        } - attribute_values.keys()
+        for value in AttributeValue.objects.bulk_create(
+            AttributeValue(attribute_id=attribute_id, value=value)
+            for attribute_id, value in missing_values
+        ):
+            attribute_values[(value.attribute_id, value.value)] = value.pk
+
+        existing_products = Product.objects.in_bulk(
+            {row["pid"] for row in rows}, field_name="pid"
+        )
+        # The categories losing products, which need their facets updated.
+        old_category_ids = set()
+        new_products, updated_products = {}, {}
+        for row in rows:
+            if row["pid"] in new_products or row["pid"] in updated_products:
+                continue
+            values = {
+                "name": row["name"],
+                "description": row["description"],
+                "category_id": self.categories[row["category"]],
+                "product_type_id": product_types[row["product_type"]],
+                "is_active": row["is_active"],
+            }
+            product = existing_products.get(row["pid"])
+            if product is None:
+                new_products[row["pid"]] = Product(
+                    pid=row["pid"], slug=row["slug"], **values
+                )
+                continue
+            old_category_ids.add(product.category_id)
+            for field, value in values.items():
+                setattr(product, field, value)
+            updated_products[row["pid"]] = product
+        Product.objects.bulk_create(new_products.values())
+        # bulk_update() doesn't run the auto_now of updated_at.
+        now = timezone.now()
+        for product in updated_products.values():
+            product.updated_at = now
+        Product.objects.bulk_update(
+            updated_products.values(), [*PRODUCT_FIELDS, "updated_at"]
+        )
+        products = {
+            pid: product.pk
+            for pid, product in {**new_products, **updated_products}.items()
+        }
+
+        product_lines = ProductLine.objects.in_bulk(
+            [row["sku"] for row in rows], field_name="sku"
+        )
+        existing_lines = list(product_lines.values())
+        new_lines = []
+        for row in rows:
+            product_line = product_lines.get(row["sku"])
+            if product_line is None:
+                product_line = ProductLine(
+                    sku=row["sku"],
+                    product_id=products[row["pid"]],
+                    product_type_id=product_types[row["product_type"]],
+                )
+                new_lines.append(product_line)
+                product_lines[row["sku"]] = product_line
+            for field in LINE_FIELDS:
+                setattr(product_line, field, row[field])
+        ProductLine.objects.bulk_create(new_lines)
+        for product_line in existing_lines:
+            product_line.updated_at = now
+        ProductLine.objects.bulk_update(
+            existing_lines, [*LINE_FIELDS, "updated_at"]
+        )
+
+        self.delete_links(existing_lines, rows, attributes)
+        ProductLineAttributeValue.objects.bulk_create(
+            [
+                ProductLineAttributeValue(
+                    product_line_id=product_lines[row["sku"]].pk,
+                    attribute_value_id=attribute_values[
+                        (attributes[name], value)
+                    ],
+                )
+                for row in rows
+                for name, value in row["attributes"].items()
+            ],
+            ignore_conflicts=True,
+        )
+        catalog_changed.send(
+            sender=self.__class__,
+            product_ids={
+                *products.values(),
+                *(line.product_id for line in product_lines.values()),
+            },
+            category_ids=old_category_ids,
+        )
+
+    def delete_links(self, product_lines, rows, attributes):
+        """Deleting the attribute values of the existing product lines
+        for the attributes of their rows, so an imported value replaces
+        the previous value of its attribute. The lines are grouped by
+        their set of attributes for one condition per group."""
+        attribute_ids = {
+            row["sku"]: frozenset(
+                attributes[name] for name in row["attributes"]
+            )
+            for row in rows
+        }
+        groups = {}
+        for product_line in product_lines:
+            if attribute_ids[product_line.sku]:
+                groups.setdefault(
+                    attribute_ids[product_line.sku], []
+                ).append(product_line.pk)
+        condition = Q()
+        for group_attribute_ids, line_ids in groups.items():
+            condition |= Q(
+                product_line__in=line_ids,
+                attribute_value__attribute__in=group_attribute_ids,
+            )
+        if condition:
+            ProductLineAttributeValue.objects.filter(condition).delete()
+
+    def create_missing(self, model, field, lookup, names):
+        """Creating the missing rows of a lookup map by their names."""
+        created = model.objects.bulk_create(
+            model(**{field: name}) for name in names - lookup.keys()
+        )
+        for obj in created:
+            lookup[getattr(obj, field)] = obj.pk
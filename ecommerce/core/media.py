@@ -0,0 +1,164 @@
+"""
+On-demand resizing of uploaded images. Resized files are cached on disk
+under a content address derived from the source file and the requested
+box, and the cache is kept under its size cap by evicting the least
+recently used files. Resizing runs in a bounded pool of processes.
+"""
+import hashlib
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+
+from PIL import Image, ImageOps
+
+# Pillow save options of the output formats, other formats become JPEG.
+SAVE_OPTIONS = {
+    "JPEG": {"quality": 82, "optimize": True, "progressive": True},
+    "PNG": {"optimize": True},
+    "WEBP": {"quality": 80},
+}
+EXTENSIONS = {"JPEG": ".jpg", "PNG": ".png", "WEBP": ".webp"}
+
+
+class PoolBusy(Exception):
+    """Raised when the resize pool already has its maximum pending work."""
+
+
+class SourceNotFound(Exception):
+    """Raised when the source is missing or outside the resizable trees."""
+
+
+def resize_file(source, target, width, height):
+    """Resizing the source image to fit the box without upscaling and
+    writing it to the target atomically, run by the worker processes."""
+    with Image.open(source) as image:
+        image_format = image.format if image.format in SAVE_OPTIONS else "JPEG"
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((width, height), Image.LANCZOS)
+        if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+        temporary = f"{target}.{os.getpid()}.tmp"
+        image.save(temporary, image_format, **SAVE_OPTIONS[image_format])
+    os.replace(temporary, target)
+    return target
+
+
+class ResizeCache:
+    """Caching the resized images of the files under MEDIA_ROOT."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.executor = None
+        self.pending = None
+        self.size = None
+
+    @property
+    def root(self):
+        return Path(settings.IMAGE_RESIZE_CACHE_DIR)
+
+    def get_source(self, path):
+        """Returning the source file of a media path in the
+        resizable trees, raising SourceNotFound otherwise."""
+        media_root = Path(settings.MEDIA_ROOT).resolve()
+        source = (media_root / path).resolve()
+        if not any(
+            source.is_relative_to(media_root / tree)
+            for tree in settings.IMAGE_RESIZE_TREES
+        ) or not source.is_file():
+            raise SourceNotFound(path)
+        return source
+
+    def get_target(self, source, width, height):
+        """Returning the cache file of the source resized to the box,
+        addressed by the digest of the source's identity and the box."""
+        stat = source.stat()
+        key = hashlib.sha256(
+            f"{source}:{stat.st_size}:{stat.st_mtime_ns}:{width}x{height}"
+            .encode()
+        ).hexdigest()
+        extension = EXTENSIONS.get(
+            Image.registered_extensions().get(source.suffix.lower()), ".jpg"
+        )
+        return self.root / key[:2] / key[2:4] / f"{key}{extension}"
+
+    def get_executor(self):
+        """Returning the process pool with the number of
+        pending resizes it may accept, created on first use."""
+        with self.lock:
+            if self.executor is None:
+                workers = settings.IMAGE_RESIZE_WORKERS
+                self.executor = ProcessPoolExecutor(max_workers=workers)
+                self.pending = threading.BoundedSemaphore(
+                    workers * settings.IMAGE_RESIZE_QUEUE_FACTOR
+                )
+        return self.executor
+
+    def resize(self, source, target, width, height):
+        """Resizing the source in the process pool and waiting for it,
+        PoolBusy is raised instead of queueing beyond the bound. The
+        slot is given back when the job finishes, not when waiting for
+        it times out, so jobs still running count against the bound."""
+        executor = self.get_executor()
+        pending = self.pending
+        if not pending.acquire(blocking=False):
+            raise PoolBusy()
+        try:
+            target.parent.mkdir(parents=True, exist_ok=True)
+            future = executor.submit(
+                resize_file, str(source), str(target), width, height
+            )
+        except BaseException:
+            pending.release()
+            raise
+        future.add_done_callback(lambda future: pending.release())
+        future.result(timeout=settings.IMAGE_RESIZE_TIMEOUT)
+        self.add(target.stat().st_size)
+
+    def get(self, path, width, height):
+        """Returning the cache file of a media path resized to
+        the box, the file is resized and cached on a miss."""
+        source = self.get_source(path)
+        target = self.get_target(source, width, height)
+        try:
+            # Bumping the modification time keeps the LRU order.
+            os.utime(target)
+        except FileNotFoundError:
+            self.resize(source, target, width, height)
+        return target
+
+    def files(self):
+        """Returning the cached files with their stat results."""
+        return [
+            (file, file.stat())
+            for file in self.root.glob("*/*/*")
+            if not file.name.endswith(".tmp")
+        ]
+
+    def add(self, size):
+        """Adding a cached file's size to the total and evicting the
+        least recently used files when the total exceeds the cap."""
+        with self.lock:
+            if self.size is None:
+                self.size = sum(stat.st_size for _, stat in self.files())
+            else:
+                self.size += size
+            if self.size > settings.IMAGE_RESIZE_CACHE_SIZE:
+                self.evict()
+
+    def evict(self):
+        """Deleting the least recently used files until the
+        total is below 90% of the cap, lock must be held."""
+        files = sorted(self.files(), key=lambda item: item[1].st_mtime_ns)
+        self.size = sum(stat.st_size for _, stat in files)
+        limit = settings.IMAGE_RESIZE_CACHE_SIZE * 0.9
+        for file, stat in files:
+            if self.size <= limit:
+                break
+            file.unlink(missing_ok=True)
+            self.size -= stat.st_size
+
+
+resize_cache = ResizeCache()
@@ -0,0 +1,273 @@
+"""
+Request metrics in the Prometheus text format. Every process adds to
+its own metrics in memory and writes them to a file of METRICS_DIR at
+most every METRICS_FLUSH_SECONDS, the metrics endpoint sums the files
+of all the processes. The files are named by the pid and a token of
+the process, so a process reusing the pid of an exited one never
+overwrites its file. The files of exited processes are folded into one
+aggregate file, so the sums never go down and the files don't pile up.
+"""
+import atexit
+import fcntl
+import json
+import os
+import secrets
+import tempfile
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+
+# Histograms by name with their help text and bucket upper bounds.
+HISTOGRAMS = {
+    "http_request_duration_seconds": (
+        "Latency of the requests by view.",
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    ),
+    "http_response_size_bytes": (
+        "Size of the response bodies by view.",
+        (100, 1000, 10000, 100000, 1000000, 10000000),
+    ),
+    "db_queries_per_request": (
+        "Database queries of the requests by view.",
+        (0, 1, 2, 5, 10, 20, 50, 100),
+    ),
+}
+# File the metrics of the exited processes are summed in.
+AGGREGATE_FILE = "aggregate.json"
+# Counters by name with their help text.
+COUNTERS = {
+    "http_requests_total": "Requests by view, method and status.",
+    "db_queries_total": "Database queries by view.",
+    "cache_requests_total": "Cache lookups by view, cache and result.",
+}
+
+
+class Metrics:
+    """Metrics of this process, stored as a dict of (name, labels)
+    to values. Histograms keep a count per bucket, the cumulative
+    counts of the Prometheus format are summed when rendering."""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        """Starting empty metrics with a new file token, also run in
+        forked children so they don't count the parent's metrics."""
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.values = {}
+        self.token = secrets.token_hex(4)
+        self.flushed_at = time.monotonic()
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def observe(self, name, labels, value):
+        """Adding a value to a histogram."""
+        buckets = HISTOGRAMS[name][1]
+        index = bisect_left(buckets, value)
+        le = str(buckets[index]) if index < len(buckets) else "+Inf"
+        self.inc(f"{name}_bucket", {**labels, "le": le})
+        self.inc(f"{name}_sum", labels, value)
+        self.inc(f"{name}_count", labels)
+
+    def path(self):
+        return Path(settings.METRICS_DIR) / f"{os.getpid()}-{self.token}.json"
+
+    def flush(self, force=False):
+        """Writing the metrics to this process's file, unless
+        they were written less than METRICS_FLUSH_SECONDS ago.
+        Flushes are serialized, each through its own temporary file."""
+        with self.flush_lock:
+            now = time.monotonic()
+            if not force and (
+                now - self.flushed_at < settings.METRICS_FLUSH_SECONDS
+            ):
+                return
+            self.flushed_at = now
+            with self.lock:
+                rows = [
+                    [name, dict(labels), value]
+                    for (name, labels), value in self.values.items()
+                ]
+            write_rows(self.path(), rows)
+
+
+def write_rows(path, rows):
+    """Writing the rows of a metric file through a temporary file
+    of its own, so readers never see a partly written file."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    descriptor, temporary = tempfile.mkstemp(
+        dir=path.parent, prefix=f"{path.stem}.", suffix=".tmp"
+    )
+    try:
+        with os.fdopen(descriptor, "w") as file:
+            json.dump(rows, file)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def add_rows(values, path):
+    """Adding the rows of a metric file to the values
+    by name and labels, unreadable files are skipped."""
+    try:
+        rows = json.loads(path.read_text())
+    except (OSError, ValueError):
+        return
+    for name, labels, value in rows:
+        key = (name, tuple(sorted(labels.items())))
+        values[key] = values.get(key, 0) + value
+
+
+def is_running(pid):
+    """Returning whether a process with the pid exists."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+@contextmanager
+def locked_directory(exclusive):
+    """Locking METRICS_DIR across processes, shared while the files
+    are read and exclusive while files are folded, so no file is read
+    both in the aggregate file and on its own."""
+    directory = Path(settings.METRICS_DIR)
+    directory.mkdir(parents=True, exist_ok=True)
+    with open(directory / f"{AGGREGATE_FILE}.lock", "a") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+        yield directory
+
+
+def mark_process_dead(pid):
+    """Folding the metric files of an exited process into the aggregate
+    file and removing them, like prometheus_client's function of the
+    same name. It may be called from a gunicorn child_exit hook, the
+    metrics endpoint calls it for the processes which no longer exist."""
+    with locked_directory(exclusive=True) as directory:
+        paths = list(directory.glob(f"{pid}-*.json"))
+        if not paths:
+            return
+        values = {}
+        for path in [directory / AGGREGATE_FILE, *paths]:
+            add_rows(values, path)
+        write_rows(
+            directory / AGGREGATE_FILE,
+            [
+                [name, dict(labels), value]
+                for (name, labels), value in values.items()
+            ],
+        )
+        for path in paths:
+            path.unlink()
+
+
+def mark_dead_processes():
+    """Folding the metric files of all the exited processes."""
+    pids = set()
+    for path in Path(settings.METRICS_DIR).glob("*-*.json"):
+        pid = path.stem.split("-")[0]
+        if pid.isdigit():
+            pids.add(int(pid))
+    for pid in pids:
+        if not is_running(pid):
+            mark_process_dead(pid)
+
+
+def collect():
+    """Returning the metrics of all processes summed by name and
+    labels, from their metric files and the aggregate file."""
+    mark_dead_processes()
+    values = {}
+    with locked_directory(exclusive=False) as directory:
+        for path in directory.glob("*.json"):
+            add_rows(values, path)
+    return values
+
+
+def escape(value):
+    """Escaping a label value of the text format."""
+    return (
+        str(value)
+        .replace("\\", "\\\\")
+        .replace('"', '\\"')
+        .replace("\n", "\\n")
+    )
+
+
+def format_sample(name, labels, value):
+    """Returning a sample line of the text format."""
+    label_text = ",".join(f'{key}="{escape(val)}"' for key, val in labels)
+    if label_text:
+        name = f"{name}{{{label_text}}}"
+    return f"{name} {value}"
+
+
+def cumulative_buckets(name, values):
+    """Returning the cumulative bucket samples of a histogram."""
+    buckets = HISTOGRAMS[name][1]
+    order = [str(bucket) for bucket in buckets] + ["+Inf"]
+    series = {}
+    for (sample, labels), value in values.items():
+        if sample != f"{name}_bucket":
+            continue
+        labels = dict(labels)
+        le = labels.pop("le")
+        counts = series.setdefault(tuple(sorted(labels.items())), {})
+        counts[le] = counts.get(le, 0) + value
+
+    samples = []
+    for labels, counts in sorted(series.items()):
+        total = 0
+        for le in order:
+            total += counts.get(le, 0)
+            samples.append(
+                (f"{name}_bucket", (*labels, ("le", le)), total)
+            )
+    return samples
+
+
+def render(values):
+    """Rendering the metrics in the Prometheus text format."""
+    lines = []
+    for name, help_text in COUNTERS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        lines += [
+            format_sample(name, labels, value)
+            for (sample, labels), value in sorted(values.items())
+            if sample == name
+        ]
+    for name, (help_text, _) in HISTOGRAMS.items():
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        lines += [
+            format_sample(*sample)
+            for sample in cumulative_buckets(name, values)
+        ]
+        lines += [
+            format_sample(sample, labels, value)
+            for (sample, labels), value in sorted(values.items())
+            if sample in (f"{name}_sum", f"{name}_count")
+        ]
+    return "\n".join(lines) + "\n"
+
+
+metrics = Metrics()
+os.register_at_fork(after_in_child=metrics.reset)
+
+
+@atexit.register
+def flush_on_exit():
+    """Writing the last metrics of an exiting process."""
+    if metrics.values:
+        metrics.flush(force=True)
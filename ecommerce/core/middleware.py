@@ -0,0 +1,264 @@
+"""
+Middlewares of the core app.
+"""
+import json
+import logging
+import random
+from time import perf_counter
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.urls import Resolver404, resolve
+
+from core.metrics import metrics
+from core.nplusone import NPlusOne, detecting
+from core.performance import RequestStats, get_stats, recording
+from core.routers import replica_reads
+
+logger = logging.getLogger("core.performance")
+nplusone_logger = logging.getLogger("core.nplusone")
+
+
+def view_path(func):
+    """Returning the dotted path of a view function or its class."""
+    view = getattr(func, "cls", None) or getattr(func, "view_class", func)
+    return f"{view.__module__}.{view.__qualname__}"
+
+
+class ReplicaRoutingMiddleware:
+    """Sending the reads of the GET and HEAD requests of the views in
+    REPLICA_READ_VIEWS and of the admin changelists to a replica."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with replica_reads(self.uses_replicas(request)):
+            return self.get_response(request)
+
+    async def __acall__(self, request):
+        with replica_reads(self.uses_replicas(request)):
+            return await self.get_response(request)
+
+    def uses_replicas(self, request):
+        """Returning whether the request reads from a replica."""
+        if not settings.DATABASE_REPLICAS or request.method not in (
+            "GET", "HEAD"
+        ):
+            return False
+        try:
+            match = resolve(request.path_info)
+        except Resolver404:
+            return False
+        if match.app_name == "admin":
+            return match.url_name.endswith("_changelist")
+        path = view_path(match.func)
+        return any(
+            path == view or path.startswith(f"{view}.")
+            for view in settings.REPLICA_READ_VIEWS
+        )
+
+
+class PerformanceMiddleware:
+    """Recording the query count, SQL time, serializer time and render
+    time of a sample of the requests to the views in PERFORMANCE_VIEWS,
+    returned as Server-Timing headers and logged as JSON lines. The
+    requests over PERFORMANCE_QUERY_BUDGET queries are logged as
+    warnings."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not self.is_sampled():
+            return self.get_response(request)
+        with recording(RequestStats()) as stats:
+            response = self.get_response(request)
+        return self.report(request, response, stats)
+
+    async def __acall__(self, request):
+        if not self.is_sampled():
+            return await self.get_response(request)
+        with recording(RequestStats()) as stats:
+            response = await self.get_response(request)
+        return self.report(request, response, stats)
+
+    def is_sampled(self):
+        rate = settings.PERFORMANCE_SAMPLE_RATE
+        return rate >= 1 or random.random() < rate
+
+    def process_template_response(self, request, response):
+        """Timing the rendering of the DRF responses, which
+        happens after the view and this hook return."""
+        stats = get_stats()
+        if stats is not None:
+            start = perf_counter()
+            response.add_post_render_callback(
+                lambda response: stats.add("render", perf_counter() - start)
+            )
+        return response
+
+    def is_instrumented(self, request):
+        """Returning whether the resolved view is in PERFORMANCE_VIEWS."""
+        match = getattr(request, "resolver_match", None)
+        if match is None:
+            return False
+        path = view_path(match.func)
+        return any(
+            path == view or path.startswith(f"{view}.")
+            for view in settings.PERFORMANCE_VIEWS
+        )
+
+    def report(self, request, response, stats):
+        """Adding the Server-Timing header and logging the stats."""
+        if not self.is_instrumented(request):
+            return response
+        timings = stats.milliseconds()
+        over_budget = stats.queries > settings.PERFORMANCE_QUERY_BUDGET
+        response["Server-Timing"] = ", ".join([
+            f'db;dur={timings["sql"]};desc="{stats.queries} queries"',
+            f"serialize;dur={timings['serialize']}",
+            f"render;dur={timings['render']}",
+            f"total;dur={timings['total']}",
+        ])
+        logger.log(
+            logging.WARNING if over_budget else logging.INFO,
+            json.dumps({
+                "method": request.method,
+                "path": request.path,
+                "view": request.resolver_match.view_name,
+                "status": response.status_code,
+                "queries": stats.queries,
+                "over_budget": over_budget,
+                **{f"{name}_ms": value for name, value in timings.items()},
+            }),
+        )
+        return response
+
+
+class MetricsMiddleware:
+    """Adding the latency, response size, query count and cache lookups
+    of every request to the metrics of the process, labeled by the name
+    of the resolved view. The stats of a request sampled by
+    PerformanceMiddleware are reused, any other request is recorded."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = get_stats()
+        if stats is not None:
+            response = self.get_response(request)
+        else:
+            with recording(RequestStats()) as stats:
+                response = self.get_response(request)
+        self.observe(request, response, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats = get_stats()
+        if stats is not None:
+            response = await self.get_response(request)
+        else:
+            with recording(RequestStats()) as stats:
+                response = await self.get_response(request)
+        self.observe(request, response, stats)
+        return response
+
+    def get_size(self, response):
+        """Returning the size of the response body, or None
+        for the streaming responses of unknown length."""
+        if response.has_header("Content-Length"):
+            return int(response["Content-Length"])
+        if response.streaming:
+            return None
+        return len(response.content)
+
+    def observe(self, request, response, stats):
+        match = getattr(request, "resolver_match", None)
+        labels = {"view": match.view_name if match else "<unresolved>"}
+        metrics.inc(
+            "http_requests_total",
+            {
+                **labels,
+                "method": request.method,
+                "status": str(response.status_code),
+            },
+        )
+        metrics.observe(
+            "http_request_duration_seconds", labels, stats.elapsed()
+        )
+        size = self.get_size(response)
+        if size is not None:
+            metrics.observe("http_response_size_bytes", labels, size)
+        metrics.observe("db_queries_per_request", labels, stats.queries)
+        metrics.inc("db_queries_total", labels, stats.queries)
+        for (cache, result), count in stats.cache.items():
+            metrics.inc(
+                "cache_requests_total",
+                {**labels, "cache": cache, "result": result},
+                count,
+            )
+        metrics.flush()
+
+
+class NPlusOneMiddleware:
+    """Detecting the N+1 queries of every request, logged as warnings
+    or raised as NPlusOne depending on NPLUSONE_DETECTION. Not used
+    when the detection is off, as in production."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if settings.NPLUSONE_DETECTION not in ("log", "raise"):
+            raise MiddlewareNotUsed()
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with detecting() as detector:
+            response = self.get_response(request)
+        self.check(request, detector)
+        return response
+
+    async def __acall__(self, request):
+        with detecting() as detector:
+            response = await self.get_response(request)
+        self.check(request, detector)
+        return response
+
+    def check(self, request, detector):
+        report = detector.report()
+        if not report:
+            return
+        message = f"N+1 queries in {request.method} {request.path}:\n{report}"
+        if settings.NPLUSONE_DETECTION == "raise":
+            raise NPlusOne(message)
+        nplusone_logger.warning(message)
@@ -3,13 +3,24 @@ Product app models.
 """
 import uuid
 import os
+from functools import partial
 
+from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.core.exceptions import ValidationError
 
 from mptt.models import TreeForeignKey, MPTTModel
 
-from core.fields import OrderField
+from core.fields import (
+    OrderField,
+    OrderFieldQuerySet,
+    save_allocating_order,
+)
+
+# Product fields kept by ProductQuerySet.update_line_summary().
+LINE_SUMMARY_FIELDS = ("min_price", "max_price", "in_stock")
+
 
 def product_image_file_path(instance, filename):
     """Generating a file path for a new profile image."""
@@ -30,6 +41,130 @@ class IsActiveQuerySet(models.QuerySet):
         return queryset
 
 
+class ProductLineQuerySet(IsActiveQuerySet, OrderFieldQuerySet):
+    """Custom queryset for the ProductLine model."""
+
+    def covers(self):
+        """Returning the cover lines, the first product line of every
+        product by order, whose images are shown in the listings."""
+        return self.filter(
+            ~models.Exists(
+                ProductLine.objects.filter(
+                    product=models.OuterRef("product"),
+                    order__lt=models.OuterRef("order"),
+                )
+            )
+        )
+
+
+class ProductQuerySet(IsActiveQuerySet):
+    """Custom queryset for the Product model."""
+
+    def with_attribute_values(self, filters):
+        """Returning the products having a product line with one of the
+        given values for every attribute name in the filters dict."""
+        queryset = self
+        for name, values in filters.items():
+            queryset = queryset.filter(
+                models.Exists(
+                    ProductLineAttributeValue.objects.filter(
+                        product_line__product=models.OuterRef("pk"),
+                        attribute_value__attribute__name=name,
+                        attribute_value__value__in=values,
+                    )
+                )
+            )
+        return queryset
+
+    def in_category(self, slug, include_descendants=False):
+        """Returning the products of the category with the given slug,
+        descendant categories are matched by one range semi-join on the
+        tree_id, lft and rght columns of the category."""
+        if not include_descendants:
+            return self.filter(category__slug=slug)
+        return self.filter(
+            models.Exists(
+                Category.objects.filter(
+                    slug=slug,
+                    tree_id=models.OuterRef("category__tree_id"),
+                    lft__lte=models.OuterRef("category__lft"),
+                    rght__gte=models.OuterRef("category__rght"),
+                )
+            )
+        )
+
+    def in_price_range(self, min_price=None, max_price=None):
+        """Returning the products whose lowest price is in the range."""
+        queryset = self
+        if min_price is not None:
+            queryset = queryset.filter(min_price__gte=min_price)
+        if max_price is not None:
+            queryset = queryset.filter(min_price__lte=max_price)
+        return queryset
+
+    def update_line_summary(self):
+        """Updating the price range and stock flag of the products from
+        their product lines in one query, bumping their updated_at."""
+        lines = (
+            ProductLine.objects.filter(product=models.OuterRef("pk"))
+            .order_by()
+            .values("product")
+        )
+        return self.update(
+            min_price=models.Subquery(
+                lines.annotate(price=models.Min("price")).values("price")
+            ),
+            max_price=models.Subquery(
+                lines.annotate(price=models.Max("price")).values("price")
+            ),
+            in_stock=models.Exists(
+                ProductLine.objects.filter(
+                    product=models.OuterRef("pk"), stock_qty__gt=0
+                )
+            ),
+            updated_at=timezone.now(),
+        )
+
+    def for_listing(self):
+        """Prefetching the first image of the cover line
+        the product listing representation needs."""
+        return self.prefetch_related(
+            models.Prefetch(
+                "product_line", queryset=ProductLine.objects.covers()
+            ),
+            models.Prefetch(
+                "product_line__product_image",
+                queryset=ProductImage.objects.filter(order=1),
+            ),
+        )
+
+    def with_details(self):
+        """Prefetching everything the product detail
+        representation needs in a fixed number of queries."""
+        return self.prefetch_related(
+            models.Prefetch(
+                "product_line",
+                queryset=ProductLine.objects.order_by("order"),
+            ),
+            models.Prefetch(
+                "product_line__product_image",
+                queryset=ProductImage.objects.order_by("order"),
+            ),
+            models.Prefetch(
+                "product_line__attribute_value",
+                queryset=AttributeValue.objects.select_related(
+                    "attribute"
+                ).order_by("pk"),
+            ),
+            models.Prefetch(
+                "attribute_value",
+                queryset=AttributeValue.objects.select_related(
+                    "attribute"
+                ).order_by("pk"),
+            ),
+        )
+
+
 class Category(MPTTModel):
     """This class defines all attributes of the Category model."""
 
@@ -39,12 +174,21 @@ class Category(MPTTModel):
     parent = TreeForeignKey(
         "self", on_delete=models.PROTECT, null=True, blank=True
     )
+    updated_at = models.DateTimeField(auto_now=True)
 
     objects = IsActiveQuerySet.as_manager()
 
     class MPTTMeta:
         order_insertion_by = ["name"]
 
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["tree_id", "lft", "rght"],
+                name="category_tree_range_idx",
+            ),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -60,6 +204,16 @@ class Product(models.Model):
     category = TreeForeignKey(Category, on_delete=models.PROTECT)
     is_active = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True, editable=False)
+    # Bumped by the changes of the product's lines, images and attributes.
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
+    # Summary of the product lines kept by update_line_summary().
+    min_price = models.DecimalField(
+        max_digits=5, decimal_places=2, null=True, editable=False
+    )
+    max_price = models.DecimalField(
+        max_digits=5, decimal_places=2, null=True, editable=False
+    )
+    in_stock = models.BooleanField(default=False, editable=False)
     product_type = models.ForeignKey(
         "ProductType", related_name="product_type", on_delete=models.PROTECT
     )
@@ -69,7 +223,32 @@ class Product(models.Model):
         through="ProductAttributeValue",
     )
 
-    objects = IsActiveQuerySet.as_manager()
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["category", "min_price"],
+                name="product_category_price_idx",
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        """Save method leaving out the line summary of existing rows,
+        so saving a stale instance can't overwrite the summary."""
+        if not (
+            self._state.adding
+            or args
+            or kwargs.get("update_fields")
+            or kwargs.get("force_insert")
+        ):
+            kwargs["update_fields"] = [
+                field.name
+                for field in self._meta.concrete_fields
+                if not field.primary_key
+                and field.name not in LINE_SUMMARY_FIELDS
+            ]
+        return super().save(*args, **kwargs)
 
     def __str__(self):
         return self.name
@@ -175,27 +354,32 @@ class ProductLine(models.Model):
         on_delete=models.PROTECT
     )
     created_at = models.DateTimeField(auto_now_add=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
     attribute_value = models.ManyToManyField(
         AttributeValue,
         through="ProductLineAttributeValue",
         related_name="product_line_attribute_value",
     )
 
-    objects = IsActiveQuerySet.as_manager()
-
-    def clean(self, exclude=None):
-        """Validating multiple fields with clean_fields
-        method for preventing from inserting duplicate values."""
-        queryset = ProductLine.objects.filter(product=self.product)
+    objects = ProductLineQuerySet.as_manager()
 
-        for object in queryset:
-            if self.id != object.id and self.order == object.order:
-                raise ValidationError("Duplicate value.")
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product", "order"],
+                name="unique_product_line_order",
+            ),
+        ]
 
     def save(self, *args, **kwargs):
-        """Save method for running clean method."""
+        """Save method for running full_clean, which checks the
+        unique order constraint with a single exists() query,
+        the order number is allocated again if a concurrent save
+        takes it first."""
         self.full_clean()
-        return super().save(*args, **kwargs)
+        return save_allocating_order(
+            self, partial(super().save, *args, **kwargs), kwargs.get("using")
+        )
 
     def __str__(self):
         return self.sku
@@ -212,20 +396,29 @@ class ProductImage(models.Model):
         ProductLine, related_name="product_image", on_delete=models.CASCADE
     )
     order = OrderField(unique_for_field="product_line", blank=True)
+    # Responsive variants generated in the background by product.images.
+    variants = models.JSONField(default=list, blank=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True)
 
-    def clean(self, exclude=None):
-        """Validating multiple fields with clean_fields
-        method for preventing from inserting duplicate values."""
-        queryset = ProductImage.objects.filter(product_line=self.product_line)
+    objects = OrderFieldQuerySet.as_manager()
 
-        for object in queryset:
-            if self.id != object.id and self.order == object.order:
-                raise ValidationError("Duplicate value.")
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["product_line", "order"],
+                name="unique_product_image_order",
+            ),
+        ]
 
     def save(self, *args, **kwargs):
-        """Save method for running clean method."""
+        """Save method for running full_clean, which checks the
+        unique order constraint with a single exists() query,
+        the order number is allocated again if a concurrent save
+        takes it first."""
         self.full_clean()
-        return super().save(*args, **kwargs)
+        return save_allocating_order(
+            self, partial(super().save, *args, **kwargs), kwargs.get("using")
+        )
 
     def __str__(self):
         return f"{self.product_line.sku}_img"
@@ -292,3 +485,49 @@ class ProductAttributeValue(models.Model):
 
     def __str__(self):
         return f"{self.product}"
+
+
+class StockReservation(models.Model):
+    """This class defines a hold on the stock of product lines,
+    identified by its token and released when it expires."""
+
+    token = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    # Reservations of deleted users are kept until they expire.
+    owner = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        related_name="stock_reservation",
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+    )
+    expires_at = models.DateTimeField(db_index=True)
+    created_at = models.DateTimeField(auto_now_add=True, editable=False)
+
+    def __str__(self):
+        return str(self.token)
+
+
+class StockReservationLine(models.Model):
+    """This class defines the quantity of a product
+    line held by a stock reservation."""
+
+    reservation = models.ForeignKey(
+        StockReservation, related_name="lines", on_delete=models.CASCADE
+    )
+    product_line = models.ForeignKey(
+        ProductLine,
+        related_name="stock_reservation_line",
+        on_delete=models.PROTECT,
+    )
+    quantity = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["reservation", "product_line"],
+                name="unique_stock_reservation_line",
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.reservation}_{self.product_line}"
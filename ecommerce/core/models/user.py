@@ -3,9 +3,9 @@ Custom user models.
 """
 import uuid
 import os
+from functools import partial
 from django.dispatch import receiver
 from django.db.models.signals import post_save
-from django.core.exceptions import ValidationError
 from django.contrib.auth import get_user_model
 from django.db import models
 from django.contrib.auth.models import (
@@ -14,7 +14,9 @@ from django.contrib.auth.models import (
     PermissionsMixin
 )
 from django.utils.translation import gettext_lazy as _
-from core.fields import OrderField
+from core.fields import (
+    OrderField, OrderFieldQuerySet, save_allocating_order
+)
 
 
 def profile_image_file_path(instance, filename):
@@ -101,19 +103,21 @@ class ProfileImage(models.Model) :
     )
     order = OrderField(unique_for_field="profile", blank=True)
 
-    def clean(self):
-        """Validating multiple fields with clean_fields
-        method for preventing from inserting duplicate values."""
-        queryset = ProfileImage.objects.filter(
-            profile=self.profile
-        )
-        for object in queryset:
-            if self.id != object.id and self.order == object.order:
-                raise ValidationError('Duplicate value.')
+    objects = OrderFieldQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['profile', 'order'],
+                name='unique_profile_image_order',
+            ),
+        ]
 
     def save(self, *args, **kwargs) :
         self.full_clean()
-        return super().save(*args, **kwargs)
+        return save_allocating_order(
+            self, partial(super().save, *args, **kwargs), kwargs.get("using")
+        )
 
     def __str__(self):
         return f'{self.profile.user.email}: {self.url}'
@@ -0,0 +1,99 @@
+"""
+Detection of N+1 queries. While detecting, every SELECT is counted by
+its SQL, with the parameters and the lengths of the IN lists left out,
+and by the serializer field or the project code running it. The same
+query run NPLUSONE_THRESHOLD times or more from the same place is a
+lazy load repeated across a list of instances, which a select_related
+or a prefetch_related of the queryset should have loaded.
+"""
+import re
+import sys
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+
+from django.conf import settings
+
+from rest_framework.serializers import Serializer
+
+_detector = ContextVar("nplusone_detector", default=None)
+
+IN_LIST = re.compile(r"IN \((?:%s, )*%s\)")
+
+
+class NPlusOne(Exception):
+    """Raised for the N+1 queries of a request in the raise mode."""
+
+
+def normalize(sql):
+    """Returning the SQL with the IN lists of any length alike."""
+    return IN_LIST.sub("IN (...)", sql)
+
+
+def get_call_site(frame):
+    """Returning the serializer field whose representation runs the
+    query, or else the innermost line of the project running it."""
+    project = str(settings.BASE_DIR)
+    line = None
+    while frame is not None:
+        code = frame.f_code
+        if code.co_name == "to_representation" and isinstance(
+            frame.f_locals.get("self"), Serializer
+        ) and "field" in frame.f_locals:
+            serializer = type(frame.f_locals["self"]).__name__
+            return f"{serializer}.{frame.f_locals['field'].field_name}"
+        if line is None and code.co_filename.startswith(project) and (
+            "site-packages" not in code.co_filename
+            and code.co_filename != __file__
+        ):
+            path = Path(code.co_filename).relative_to(project)
+            line = f"{path}:{frame.f_lineno} in {code.co_name}"
+        frame = frame.f_back
+    return line or "<unknown>"
+
+
+class Detector:
+    """Counting the SELECTs by call site and SQL."""
+
+    def __init__(self, threshold=None):
+        self.threshold = threshold or settings.NPLUSONE_THRESHOLD
+        self.counts = {}
+
+    def add(self, sql, frame):
+        key = (get_call_site(frame), normalize(sql))
+        self.counts[key] = self.counts.get(key, 0) + 1
+
+    def problems(self):
+        """Returning the (call site, SQL, count) of the N+1 queries."""
+        return [
+            (site, sql, count)
+            for (site, sql), count in self.counts.items()
+            if count >= self.threshold
+        ]
+
+    def report(self):
+        """Returning a description of the N+1 queries, or ''."""
+        return "\n".join(
+            f"{site} ran {count} times: {sql}"
+            for site, sql, count in self.problems()
+        )
+
+
+@contextmanager
+def detecting(threshold=None):
+    """Detecting the N+1 queries of the code in the block."""
+    detector = Detector(threshold)
+    token = _detector.set(detector)
+    try:
+        yield detector
+    finally:
+        _detector.reset(token)
+
+
+def detect_queries(execute, sql, params, many, context):
+    """Execute wrapper counting the SELECTs while detecting, installed
+    on every database connection."""
+    detector = _detector.get()
+    if detector is not None and sql.lstrip()[:6].upper() == "SELECT":
+        detector.add(sql, sys._getframe(1))
+    return execute(sql, params, many, context)
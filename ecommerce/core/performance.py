@@ -0,0 +1,89 @@
+"""
+Per-request performance stats. The stats of a sampled request live in a
+context variable, so the SQL of every connection and thread serving the
+request, the serializers and the renderers add to them through cheap
+hooks which do nothing for the requests that aren't sampled.
+"""
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+
+_stats = ContextVar("request_stats", default=None)
+
+
+class RequestStats:
+    """Counting the queries and timing the phases of a request."""
+
+    def __init__(self):
+        self.start = perf_counter()
+        self.queries = 0
+        self.timings = {"sql": 0.0, "serialize": 0.0, "render": 0.0}
+        # Cache lookups by cache name and hit or miss result.
+        self.cache = {}
+
+    def add(self, name, seconds):
+        self.timings[name] += seconds
+
+    def elapsed(self):
+        return perf_counter() - self.start
+
+    def milliseconds(self):
+        """Returning the timings and the total time in milliseconds."""
+        timings = {**self.timings, "total": self.elapsed()}
+        return {
+            name: round(seconds * 1000, 2)
+            for name, seconds in timings.items()
+        }
+
+
+@contextmanager
+def recording(stats):
+    """Recording the stats of the code in the block."""
+    token = _stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _stats.reset(token)
+
+
+def get_stats():
+    """Returning the stats being recorded, or None."""
+    return _stats.get()
+
+
+@contextmanager
+def timed(name):
+    """Adding the time of the block to a phase of the recorded stats."""
+    stats = _stats.get()
+    if stats is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        stats.add(name, perf_counter() - start)
+
+
+def record_cache(name, value):
+    """Counting a cache lookup of the recorded stats as a hit
+    unless the value is None. Returning the value."""
+    stats = _stats.get()
+    if stats is not None:
+        key = (name, "miss" if value is None else "hit")
+        stats.cache[key] = stats.cache.get(key, 0) + 1
+    return value
+
+
+def record_queries(execute, sql, params, many, context):
+    """Execute wrapper counting and timing the queries of the
+    recorded stats, installed on every database connection."""
+    stats = _stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.queries += 1
+        stats.add("sql", perf_counter() - start)
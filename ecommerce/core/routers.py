@@ -0,0 +1,80 @@
+"""
+Database router sending the reads of the API and admin changelists
+to the read replicas, and the writes to the primary database.
+"""
+import random
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+# The routing state of the current request, a dict shared by reference
+# with the threads sync_to_async() runs the ORM in under ASGI.
+_routing = ContextVar("replica_routing", default=None)
+# Monotonic times until which the failed replicas aren't tried again.
+_unavailable_until = {}
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """Sending the reads inside the block to one replica
+    until the first write pins them to the primary."""
+    token = _routing.set(
+        {"pinned": False, "replica": None} if enabled else None
+    )
+    try:
+        yield
+    finally:
+        _routing.reset(token)
+
+
+def is_available(alias):
+    """Returning whether a replica can be connected to, a failing
+    replica is skipped for REPLICA_RETRY_SECONDS seconds."""
+    if _unavailable_until.get(alias, 0) > time.monotonic():
+        return False
+    try:
+        connections[alias].ensure_connection()
+    except DatabaseError:
+        _unavailable_until[alias] = (
+            time.monotonic() + settings.REPLICA_RETRY_SECONDS
+        )
+        return False
+    _unavailable_until.pop(alias, None)
+    return True
+
+
+def choose_replica():
+    """Returning a random available replica or the primary."""
+    replicas = list(settings.DATABASE_REPLICAS)
+    random.shuffle(replicas)
+    return next(filter(is_available, replicas), DEFAULT_DB_ALIAS)
+
+
+class PrimaryReplicaRouter:
+    """Routing reads to a replica inside replica_reads() blocks,
+    one replica serves the whole block. Everything else uses
+    the primary, so do the reads following a write."""
+
+    def db_for_read(self, model, **hints):
+        state = _routing.get()
+        if state is None or state["pinned"]:
+            return DEFAULT_DB_ALIAS
+        if state["replica"] is None:
+            state["replica"] = choose_replica()
+        return state["replica"]
+
+    def db_for_write(self, model, **hints):
+        state = _routing.get()
+        if state is not None:
+            state["pinned"] = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replicas hold copies of the primary's rows.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db not in settings.DATABASE_REPLICAS
@@ -0,0 +1,130 @@
+"""
+Custom signals for the core app and receivers keeping
+the updated_at timestamps of the parent rows up to date.
+"""
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import Signal, receiver
+from django.utils import timezone
+
+from core.nplusone import detect_queries
+from core.performance import record_queries
+from core.models.product import (
+    Attribute,
+    AttributeValue,
+    Product,
+    ProductAttributeValue,
+    ProductImage,
+    ProductLine,
+    ProductLineAttributeValue,
+)
+
+# Sent with the product_ids argument after bulk writes bypassing
+# the model signals, like bulk_create() or queryset update() calls,
+# and with the category_ids argument after bulk category writes.
+catalog_changed = Signal()
+
+
+def touch(queryset):
+    """Bumping the updated_at timestamp of a queryset in one query."""
+    queryset.update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=ProductLine)
+@receiver(post_delete, sender=ProductLine)
+def update_line_summary(sender, instance, **kwargs):
+    """Updating the price range and stock flag of
+    the product of a changed line and bumping it."""
+    Product.objects.filter(pk=instance.product_id).update_line_summary()
+
+
+@receiver(post_save, sender=ProductAttributeValue)
+@receiver(post_delete, sender=ProductAttributeValue)
+def touch_product(sender, instance, **kwargs):
+    """Bumping the product of a changed related row."""
+    touch(Product.objects.filter(pk=instance.product_id))
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductLineAttributeValue)
+@receiver(post_delete, sender=ProductLineAttributeValue)
+def touch_product_line(sender, instance, **kwargs):
+    """Bumping the product line and the product of a changed row."""
+    touch(ProductLine.objects.filter(pk=instance.product_line_id))
+    touch(Product.objects.filter(product_line=instance.product_line_id))
+
+
+@receiver(post_save, sender=AttributeValue)
+@receiver(post_save, sender=Attribute)
+def touch_attribute_users(sender, instance, **kwargs):
+    """Bumping the products and product lines using
+    a changed attribute or attribute value."""
+    lookup = "attribute" if sender is Attribute else "pk"
+    values = AttributeValue.objects.filter(**{lookup: instance.pk})
+    touch(ProductLine.objects.filter(attribute_value__in=values))
+    touch(
+        Product.objects.filter(
+            Q(attribute_value__in=values)
+            | Q(product_line__attribute_value__in=values)
+        )
+    )
+
+
+@receiver(m2m_changed, sender=ProductAttributeValue)
+@receiver(m2m_changed, sender=ProductLineAttributeValue)
+def touch_attribute_links(sender, instance, action, reverse, pk_set, **kwargs):
+    """Bumping the rows whose attribute values are changed through
+    the many to many managers, clear() is handled before clearing."""
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if sender is ProductAttributeValue:
+        if not reverse:
+            products = Product.objects.filter(pk=instance.pk)
+        elif pk_set is None:
+            products = Product.objects.filter(attribute_value=instance.pk)
+        else:
+            products = Product.objects.filter(pk__in=pk_set)
+        touch(products)
+        return
+
+    if not reverse:
+        product_lines = ProductLine.objects.filter(pk=instance.pk)
+    elif pk_set is None:
+        product_lines = ProductLine.objects.filter(attribute_value=instance.pk)
+    else:
+        product_lines = ProductLine.objects.filter(pk__in=pk_set)
+    touch(Product.objects.filter(product_line__in=product_lines))
+    touch(product_lines)
+
+
+@receiver(catalog_changed)
+def update_changed_products(sender, product_ids, **kwargs):
+    """Updating the line summaries of the products
+    changed in bulk and bumping them."""
+    Product.objects.filter(pk__in=product_ids).update_line_summary()
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    """Running the SQLITE_PRAGMAS on a new SQLite connection, the
+    journal mode of read-only replicas is left to their writer."""
+    if connection.vendor != "sqlite" or not settings.SQLITE_PRAGMAS:
+        return
+    read_only = "mode=ro" in str(connection.settings_dict["NAME"])
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            if not (read_only and name == "journal_mode"):
+                cursor.execute(f"PRAGMA {name} = {value}")
+
+
+@receiver(connection_created)
+def install_query_recorder(sender, connection, **kwargs):
+    """Counting the queries of the requests recording performance
+    stats or detecting N+1 queries, the wrappers outlive the
+    reconnections of the connection."""
+    for wrapper in (record_queries, detect_queries):
+        if wrapper not in connection.execute_wrappers:
+            connection.execute_wrappers.append(wrapper)
@@ -0,0 +1,200 @@
+"""
+Test the bulk actions of the catalog admin.
+"""
+from decimal import Decimal
+
+import factory
+import pytest
+
+from django.contrib.admin import helpers
+from django.contrib.messages import get_messages
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.models.product import Category, Product, ProductLine
+
+pytestmark = pytest.mark.django_db
+
+PRODUCTS_URL = reverse("admin:core_product_changelist")
+LINES_URL = reverse("admin:core_productline_changelist")
+CATEGORIES_URL = reverse("admin:core_category_changelist")
+
+
+@pytest.fixture
+def catalog(category_factory, attribute_value_factory):
+    """Creating the active lamps and chairs categories,
+    returning the lamps category and the red color."""
+    lamps = category_factory(name="lamps", slug="lamps", is_active=True)
+    category_factory(name="chairs", slug="chairs", is_active=True)
+    red = attribute_value_factory(value="red", attribute__name="color")
+    return lamps, red
+
+
+def make_lamps(make_product, catalog, count, prices=("10.00",)):
+    """Creating active red products in the lamps
+    category with a line of each price."""
+    lamps, red = catalog
+    return [
+        make_product(
+            f"p{number}-{count}",
+            len(prices),
+            category=lamps,
+            is_active=True,
+            line_fields={
+                "price": factory.Iterator(prices),
+                "attribute_value": [red],
+            },
+        )
+        for number in range(count)
+    ]
+
+
+def run_action(client, url, action, objects, **data):
+    """Posting an admin action of the objects, the intermediate
+    form is applied when data is given."""
+    return client.post(url, {
+        "action": action,
+        helpers.ACTION_CHECKBOX_NAME: [obj.pk for obj in objects],
+        **({"apply": "Apply", **data} if data else {}),
+    })
+
+
+def get_facets(client, slug):
+    url = reverse(
+        "product-api:product-list-facets-by-category-slug", args=[slug]
+    )
+    return client.get(url).json()
+
+
+class TestProductActions:
+    """Test the bulk actions of the products."""
+
+    def test_deactivate(self, superuser_client, make_product, catalog):
+        """Test deactivating products costs the same queries for
+        any number of them and invalidates their documents."""
+        few = make_lamps(make_product, catalog, 2)
+        many = make_lamps(make_product, catalog, 20)
+        detail_url = reverse(
+            "product-api:product-detail", args=[few[0].slug]
+        )
+        superuser_client.get(detail_url)
+
+        counts = []
+        for products in (few, many):
+            with CaptureQueriesContext(connection) as queries:
+                response = run_action(
+                    superuser_client, PRODUCTS_URL, "deactivate", products
+                )
+            assert response.status_code == 302
+            counts.append(len(queries))
+
+        assert counts[0] == counts[1]
+        assert not Product.objects.filter(is_active=True).exists()
+        assert superuser_client.get(detail_url).json() == []
+
+    def test_move_to_category(
+        self, superuser_client, make_product, catalog
+    ):
+        """Test the intermediate form and moving products, the
+        facets of both categories are invalidated."""
+        products = make_lamps(make_product, catalog, 3)
+        chairs = Category.objects.get(slug="chairs")
+        assert get_facets(superuser_client, "lamps") == {"color": {"red": 3}}
+        assert get_facets(superuser_client, "chairs") == {}
+
+        form = run_action(
+            superuser_client, PRODUCTS_URL, "move_to_category", products[:2]
+        )
+        response = run_action(
+            superuser_client, PRODUCTS_URL, "move_to_category", products[:2],
+            category=chairs.pk,
+        )
+
+        assert form.status_code == 200
+        assert b'name="category"' in form.content
+        assert response.status_code == 302
+        assert Product.objects.filter(category=chairs).count() == 2
+        assert get_facets(superuser_client, "lamps") == {"color": {"red": 1}}
+        assert get_facets(superuser_client, "chairs") == {"color": {"red": 2}}
+
+
+class TestPriceActions:
+    """Test the bulk price changes of the product lines."""
+
+    @pytest.mark.parametrize(
+        "mode, value, prices",
+        [
+            ("set", "12.345", ["12.35", "12.35"]),
+            ("amount", "-2.5", ["7.50", "17.50"]),
+            ("percent", "15", ["11.50", "23.00"]),
+            ("percent", "33.33", ["13.33", "26.67"]),
+        ],
+    )
+    def test_change_prices(
+        self, superuser_client, make_product, catalog, mode, value, prices
+    ):
+        """Test the new prices are rounded to the cents and the price
+        range and document of the product are updated."""
+        (product,) = make_lamps(
+            make_product, catalog, 1, prices=("10.00", "20.00")
+        )
+        detail_url = reverse(
+            "product-api:product-detail", args=[product.slug]
+        )
+        superuser_client.get(detail_url)
+
+        response = run_action(
+            superuser_client, LINES_URL, "change_prices",
+            ProductLine.objects.all(), mode=mode, value=value,
+        )
+        detail = superuser_client.get(detail_url).json()[0]
+        product.refresh_from_db()
+
+        assert response.status_code == 302
+        expected = [Decimal(price) for price in prices]
+        assert [
+            line["price"] for line in detail["product_line"]
+        ] == prices
+        assert (product.min_price, product.max_price) == (
+            min(expected), max(expected)
+        )
+
+    def test_out_of_bounds(self, superuser_client, make_product, catalog):
+        """Test a change taking any price out of the column
+        bounds is refused without changing any line."""
+        products = make_lamps(
+            make_product, catalog, 2, prices=("10.00", "20.00")
+        )
+
+        response = run_action(
+            superuser_client, PRODUCTS_URL, "change_prices", products,
+            mode="amount", value="980",
+        )
+
+        assert response.status_code == 302
+        (message,) = get_messages(response.wsgi_request)
+        assert "990.00 to 1000.00" in str(message)
+        assert sorted(
+            ProductLine.objects.values_list("price", flat=True).distinct()
+        ) == [Decimal("10.00"), Decimal("20.00")]
+
+
+class TestCategoryActions:
+    """Test the bulk actions of the categories."""
+
+    def test_deactivate(self, superuser_client, catalog):
+        """Test deactivating categories invalidates the category trees."""
+        tree_url = reverse("product-api:category-tree")
+        tree = superuser_client.get(tree_url).json()
+
+        response = run_action(
+            superuser_client, CATEGORIES_URL, "deactivate",
+            Category.objects.filter(slug="chairs"),
+        )
+
+        assert response.status_code == 302
+        assert {node["slug"] for node in tree} == {"lamps", "chairs"}
+        assert [
+            node["slug"] for node in superuser_client.get(tree_url).json()
+        ] == ["lamps"]
@@ -0,0 +1,125 @@
+"""
+Test the queries of the catalog admin pages.
+"""
+import pytest
+
+from django.contrib.admin import site
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.admin import PaginatedInline
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def admin_settings(settings, detect_n_plus_one):
+    """Showing inline pages of 5 rows. The autocomplete widgets of the
+    inlines look up their selected value per row, which the pagination
+    of the inlines bounds, so N+1 queries are allowed."""
+    settings.NPLUSONE_DETECTION = ""
+    settings.ADMIN_INLINE_PER_PAGE = 5
+
+
+def count_queries(client, url):
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    assert response.status_code == 200
+    return len(queries)
+
+
+def change_url(product):
+    return reverse("admin:core_product_change", args=[product.pk])
+
+
+class TestCatalogAdmin:
+    """Test the admin pages don't grow with the catalog."""
+
+    def test_product_change_form(self, superuser_client, make_product):
+        """Test the change form of a product with many lines and
+        attribute values costs the same queries as a smaller one."""
+        small = make_product("a", lines=6, attribute_values=6)
+        large = make_product("b", lines=30, attribute_values=30)
+        superuser_client.get(change_url(small))
+
+        assert count_queries(superuser_client, change_url(small)) == (
+            count_queries(superuser_client, change_url(large))
+        )
+
+    def test_inline_pages(self, superuser_client, make_product):
+        """Test the product lines are shown a page at a time."""
+        product = make_product("a", lines=7)
+
+        first = superuser_client.get(change_url(product)).content.decode()
+        second = superuser_client.get(
+            f"{change_url(product)}?product_line-page=2"
+        ).content.decode()
+
+        assert 'value="a4"' in first and 'value="a5"' not in first
+        assert 'value="a5"' in second and 'value="a4"' not in second
+        assert "?product_line-page=1" in second
+
+    def test_inline_page_links_keep_query(
+        self, superuser_client, make_product
+    ):
+        """Test the pager of an inline only replaces its own page,
+        keeping the other inlines' pages and the preserved filters."""
+        product = make_product("a", lines=7)
+        filters = "_changelist_filters=q%3Da"
+
+        content = superuser_client.get(
+            f"{change_url(product)}?{filters}&product_line-page=2"
+        ).content.decode()
+
+        assert f'href="?{filters}&amp;product_line-page=1"' in content
+
+    def test_paginated_inlines_ordered(self):
+        """Test the paginated inlines have a stable order, so the rows
+        of a page don't move between showing and saving it."""
+        inlines = [
+            inline
+            for model_admin in site._registry.values()
+            for inline in model_admin.inlines
+            if issubclass(inline, PaginatedInline)
+        ]
+
+        assert inlines
+        assert all(inline.ordering for inline in inlines)
+
+    @pytest.mark.parametrize(
+        "name", ["core_product", "core_productline", "core_attributevalue"]
+    )
+    def test_changelists(self, superuser_client, make_product, name):
+        """Test the changelists cost the same queries for any number
+        of rows with their related objects."""
+        url = reverse(f"admin:{name}_changelist")
+        make_product("a", lines=1, attribute_values=1)
+        few = count_queries(superuser_client, url)
+        make_product("b", lines=10, attribute_values=10)
+
+        assert count_queries(superuser_client, url) == few
+
+    def test_attribute_value_autocomplete(
+        self, superuser_client, make_product, attribute_value_factory
+    ):
+        """Test the autocomplete of the attribute values
+        names them with their attribute without more queries."""
+        make_product("a", lines=5, attribute_values=5)
+        url = reverse("admin:autocomplete")
+        params = {
+            "app_label": "core",
+            "model_name": "productattributevalue",
+            "field_name": "attribute_value",
+        }
+
+        with CaptureQueriesContext(connection) as queries:
+            response = superuser_client.get(url, params)
+        results = response.json()["results"]
+
+        assert len(results) == 5
+        assert all(": " in result["text"] for result in results)
+        assert not [
+            query for query in queries
+            if 'FROM "core_attribute" ' in query["sql"]
+        ]
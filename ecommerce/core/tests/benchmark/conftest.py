@@ -0,0 +1,60 @@
+"""
+Fixtures for the benchmark suite.
+"""
+import json
+import os
+import platform
+import time
+import tracemalloc
+
+import django
+import pytest
+
+from django.db import connection, reset_queries
+from django.test.utils import CaptureQueriesContext
+
+REPORT_PATH = os.environ.get("BENCHMARK_REPORT", "benchmark_report.json")
+
+
+@pytest.fixture(scope="session")
+def benchmark_report():
+    """Collecting benchmark results of the whole session and
+    writing them as a json report for comparing releases."""
+    results = {}
+    yield results
+    if not results:
+        return
+    report = {
+        "generated_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "django": django.get_version(),
+        "database": connection.vendor,
+        "results": results,
+    }
+    with open(REPORT_PATH, "w") as report_file:
+        json.dump(report, report_file, indent=2, sort_keys=True)
+
+
+@pytest.fixture
+def measure(client):
+    """Returning a callable which requests the given url and
+    measures its query count, wall time and peak memory."""
+
+    def _measure(url, **params):
+        client.get(url, params)  # Warming up lazy caches.
+        # Every request resets the queries log of the connection.
+        reset_queries()
+        tracemalloc.start()
+        with CaptureQueriesContext(connection) as queries:
+            start = time.perf_counter()
+            response = client.get(url, params)
+            wall_time = time.perf_counter() - start
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        return response, {
+            "queries": len(queries),
+            "wall_ms": round(wall_time * 1000, 3),
+            "peak_memory_kb": round(peak_memory / 1024, 3),
+        }
+
+    return _measure
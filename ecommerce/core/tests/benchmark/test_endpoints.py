@@ -0,0 +1,110 @@
+"""
+Query count and latency benchmarks for API's endpoints.
+"""
+import pytest
+
+from django.urls import reverse
+
+from rest_framework import status
+
+from core.tests.factories import (
+    CategoryFactory,
+    ProductFactory,
+    ProductLineFactory,
+    ProductImageFactory,
+    ProductTypeFactory,
+    AttributeValueFactory,
+)
+
+pytestmark = pytest.mark.django_db
+
+CATALOG_SIZES = (2, 8, 24)
+LINES_PER_PRODUCT = 2
+IMAGES_PER_LINE = 2
+
+
+class Catalog:
+    """Growing a sample catalog with the existing factories."""
+
+    def __init__(self):
+        self.category = CategoryFactory(slug="benchmark", is_active=True)
+        self.product_type = ProductTypeFactory()
+        self.attribute_values = AttributeValueFactory.create_batch(2)
+        self.products = []
+        self.featured = self.add_product()
+        self.size = 0
+
+    def add_product(self):
+        """Creating an active product with lines, images and attributes."""
+        n = len(self.products)
+        product = ProductFactory(
+            pid=f"bench{n}",
+            category=self.category,
+            product_type=self.product_type,
+            attribute_value=self.attribute_values,
+        )
+        for _ in range(LINES_PER_PRODUCT):
+            self.add_product_line(product)
+        self.products.append(product)
+        return product
+
+    def add_product_line(self, product):
+        """Creating a product line with images for the given product."""
+        n = ProductLineFactory._meta.model.objects.count()
+        product_line = ProductLineFactory(
+            sku=f"sku{n}",
+            product=product,
+            product_type=self.product_type,
+            attribute_value=self.attribute_values,
+        )
+        ProductImageFactory.create_batch(
+            IMAGES_PER_LINE, product_line=product_line
+        )
+
+    def grow(self, size):
+        """Growing the catalog until it has the given size, the
+        featured product gets one more product line per step."""
+        while self.size < size:
+            CategoryFactory(
+                name=f"benchmark{self.size}",
+                slug=f"benchmark{self.size}",
+                is_active=True,
+            )
+            self.add_product()
+            self.add_product_line(self.featured)
+            self.size += 1
+
+
+ENDPOINTS = {
+    "category-list": lambda catalog: reverse("product-api:category-list"),
+    "product-list": lambda catalog: reverse("product-api:product-list"),
+    "product-detail": lambda catalog: reverse(
+        "product-api:product-detail", args=[catalog.featured.slug]
+    ),
+    "product-list-product-by-category-slug": lambda catalog: reverse(
+        "product-api:product-list-product-by-category-slug",
+        args=[catalog.category.slug],
+    ),
+}
+
+
+@pytest.mark.parametrize("endpoint", ENDPOINTS)
+def test_query_count_does_not_grow_with_catalog_size(
+    endpoint, measure, benchmark_report
+):
+    """Test the number of queries of each endpoint stays
+    the same while the catalog gets bigger."""
+    catalog = Catalog()
+    samples = []
+
+    for size in CATALOG_SIZES:
+        catalog.grow(size)
+        response, sample = measure(ENDPOINTS[endpoint](catalog))
+        assert response.status_code == status.HTTP_200_OK
+        samples.append({"catalog_size": size, **sample})
+
+    benchmark_report[endpoint] = samples
+    query_counts = [sample["queries"] for sample in samples]
+    assert len(set(query_counts)) == 1, (
+        f"{endpoint} issues a growing number of queries: {query_counts}"
+    )
@@ -0,0 +1,145 @@
+"""
+Read throughput benchmark of the SQLite database profiles
+while a writer commits to the same database file.
+"""
+import os
+import threading
+import time
+
+import pytest
+
+from django.db import OperationalError, connections, transaction
+
+from core.models.product import Category
+
+ALIAS = "benchmark"
+DURATION = 1.0
+READERS = 2
+# Whether the profiles enable the production pragmas and connections.
+PROFILES = {"default": False, "production": True}
+# Wall-clock throughput depends on the machine, so it's only
+# measured when asked for with BENCHMARK_THROUGHPUT=1.
+MEASURE_THROUGHPUT = os.environ.get("BENCHMARK_THROUGHPUT") == "1"
+
+
+@pytest.fixture
+def database(tmp_path, django_db_blocker):
+    """Adding a file database with the categories table."""
+    connections.settings[ALIAS] = connections.configure_settings(
+        {
+            "default": connections.settings["default"],
+            ALIAS: {
+                "ENGINE": "django.db.backends.sqlite3",
+                "NAME": str(tmp_path / "benchmark.sqlite3"),
+            },
+        }
+    )[ALIAS]
+    with django_db_blocker.unblock():
+        with connections[ALIAS].schema_editor() as editor:
+            editor.create_model(Category)
+        connections[ALIAS].close()
+        yield
+        connections[ALIAS].close()
+    del connections[ALIAS]
+    del connections.settings[ALIAS]
+
+
+def run_workload(profile, persistent):
+    """Counting the reads and writes of concurrent threads."""
+    stop = threading.Event()
+    counts = {"reads": 0, "writes": 0, "errors": 0}
+    lock = threading.Lock()
+
+    def count(key):
+        with lock:
+            counts[key] += 1
+
+    def write():
+        n = 0
+        while not stop.is_set():
+            try:
+                with transaction.atomic(using=ALIAS):
+                    Category.objects.using(ALIAS).bulk_create(
+                        Category(
+                            name=f"{profile}{n}-{i}",
+                            slug=f"{profile}{n}-{i}",
+                            is_active=True,
+                            lft=1, rght=2, tree_id=n, level=0,
+                        )
+                        for i in range(20)
+                    )
+                count("writes")
+            except OperationalError:
+                count("errors")
+            n += 1
+        connections[ALIAS].close()
+
+    def read():
+        while not stop.is_set():
+            try:
+                list(
+                    Category.objects.using(ALIAS)
+                    .filter(is_active=True)
+                    .order_by("-pk")
+                    .values_list("name", flat=True)[:20]
+                )
+                count("reads")
+            except OperationalError:
+                count("errors")
+            if not persistent:
+                # Every request reopens the connection without CONN_MAX_AGE.
+                connections[ALIAS].close()
+        connections[ALIAS].close()
+
+    threads = [threading.Thread(target=write)] + [
+        threading.Thread(target=read) for _ in range(READERS)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(DURATION)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return {key: round(value / DURATION) for key, value in counts.items()}
+
+
+def test_production_profile_pragmas(database, settings):
+    """Test new connections of the production profile
+    run in WAL mode with the production pragmas."""
+    settings.SQLITE_PRAGMAS = settings.SQLITE_PRODUCTION_PRAGMAS
+    values = {}
+    with connections[ALIAS].cursor() as cursor:
+        for name in ("journal_mode", "synchronous", "cache_size"):
+            cursor.execute(f"PRAGMA {name}")
+            values[name] = cursor.fetchone()[0]
+    connections[ALIAS].close()
+
+    # synchronous is reported as a number, 1 is NORMAL.
+    assert values == {
+        "journal_mode": "wal",
+        "synchronous": 1,
+        "cache_size": settings.SQLITE_PRODUCTION_PRAGMAS["cache_size"],
+    }
+
+
+@pytest.mark.skipif(
+    not MEASURE_THROUGHPUT, reason="Set BENCHMARK_THROUGHPUT=1 to measure."
+)
+def test_production_profile_read_throughput(
+    database, settings, benchmark_report
+):
+    """Test the production profile serves more reads per second
+    than the default profile while writes run at the same time."""
+    results = {}
+    for profile, production in PROFILES.items():
+        settings.SQLITE_PRAGMAS = (
+            settings.SQLITE_PRODUCTION_PRAGMAS if production else {}
+        )
+        results[profile] = run_workload(profile, persistent=production)
+
+    benchmark_report["sqlite-profile"] = {
+        profile: {f"{key}_per_second": value for key, value in rates.items()}
+        for profile, rates in results.items()
+    }
+    assert results["production"]["errors"] == 0
+    assert results["production"]["reads"] > results["default"]["reads"]
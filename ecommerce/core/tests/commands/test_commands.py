@@ -31,3 +31,210 @@ Test custom commands.
 
 #         self.assertEqual(patched_check.call_count, 6)
 #         patched_check.assert_called_with(databases=['default'])
+import json
+from io import StringIO
+
+import pytest
+
+from django.core.management import call_command
+from django.db import DatabaseError, connection
+
+from core.models.product import Product, ProductLine
+from product.search import SearchResults
+
+pytestmark = pytest.mark.django_db
+
+
+def test_rebuild_search_index(product_factory):
+    """Test rebuilding the search index from the products table."""
+    product_factory(name="Lamp")
+    product_factory(name="Desk lamp")
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM product_search")
+
+    call_command("rebuild_search_index")
+
+    assert SearchResults("lamp").count() == 2
+
+
+CSV_HEADER = (
+    "pid,name,slug,category,product_type,sku,price,stock_qty,weight,"
+    "attributes\n"
+)
+
+
+def test_import_catalog_csv(category_factory, tmp_path):
+    """Test importing product lines of a CSV file."""
+    category_factory(name="Lamps", slug="lamps")
+    path = tmp_path / "catalog.csv"
+    path.write_text(
+        CSV_HEADER
+        + "p1,Desk lamp,desk-lamp,lamps,Lamp,s1,10.50,5,1.5,color=red\n"
+        + "p1,Desk lamp,desk-lamp,lamps,Lamp,s2,11,3,1.5,color=blue\n"
+        + "p2,Floor lamp,floor-lamp,lamps,Lamp,s3,20,1,4,\n"
+    )
+    out = StringIO()
+
+    call_command("import_catalog", str(path), chunk_size=2, stdout=out)
+
+    assert "Imported 3 rows" in out.getvalue()
+    product = Product.objects.get(pid="p1")
+    assert list(
+        product.product_line.order_by("order").values_list("sku", "order")
+    ) == [("s1", 1), ("s2", 2)]
+    assert list(
+        ProductLine.objects.get(sku="s2").attribute_value.values_list(
+            "value", flat=True
+        )
+    ) == ["blue"]
+    assert SearchResults("floor").count() == 1
+
+
+def test_import_catalog_jsonl_updates_lines(category_factory, tmp_path):
+    """Test importing a JSONL file twice updates the existing lines."""
+    category_factory(name="Lamps", slug="lamps")
+    row = {
+        "pid": "p1", "name": "Desk lamp", "slug": "desk-lamp",
+        "category": "lamps", "product_type": "Lamp", "sku": "s1",
+        "price": "10", "stock_qty": 5, "weight": 1,
+        "attributes": {"color": "red"},
+    }
+    path = tmp_path / "catalog.jsonl"
+    path.write_text(json.dumps(row) + "\n")
+    call_command("import_catalog", str(path), stdout=StringIO())
+    path.write_text(json.dumps({**row, "price": "12.25"}) + "\n")
+
+    call_command("import_catalog", str(path), stdout=StringIO())
+
+    product_line = ProductLine.objects.get()
+    assert str(product_line.price) == "12.25"
+    assert product_line.attribute_value.count() == 1
+
+
+def test_import_catalog_rejects_invalid_rows(category_factory, tmp_path):
+    """Test invalid rows are reported and skipped."""
+    category_factory(name="Lamps", slug="lamps")
+    path = tmp_path / "catalog.csv"
+    path.write_text(
+        CSV_HEADER
+        + "p1,Desk lamp,desk-lamp,lamps,Lamp,s1,10,5,1,\n"
+        + "p2,Lamp,lamp,unknown,Lamp,s2,10,5,1,\n"
+        + "p3,Lamp 3,lamp-3,lamps,Lamp,s3,1000,5,1,\n"
+        + "p4,Lamp 4,lamp-4,lamps,Lamp,s1,10,5,1,\n"
+    )
+    err = StringIO()
+
+    call_command(
+        "import_catalog", str(path), stdout=StringIO(), stderr=err
+    )
+
+    assert not ProductLine.objects.exists()
+    assert "Row 3: Unknown category unknown." in err.getvalue()
+    assert "Row 4: price must be between" in err.getvalue()
+    assert "Row 5: Duplicate sku s1." in err.getvalue()
+
+
+def test_import_catalog_reimport_replaces_values(
+    category_factory, tmp_path
+):
+    """Test importing changed rows updates the products and replaces
+    the values of the imported attributes only."""
+    category_factory(name="Lamps", slug="lamps")
+    category_factory(name="Lights", slug="lights")
+    path = tmp_path / "catalog.csv"
+    path.write_text(
+        CSV_HEADER
+        + "p1,Desk lamp,desk-lamp,lamps,Lamp,s1,10,5,1,color=red;size=M\n"
+    )
+    call_command("import_catalog", str(path), stdout=StringIO())
+    path.write_text(
+        CSV_HEADER
+        + "p1,Table lamp,desk-lamp,lights,Light,s1,10,5,1,color=blue\n"
+    )
+
+    call_command("import_catalog", str(path), stdout=StringIO())
+
+    product = Product.objects.get()
+    assert (product.name, product.category.slug) == ("Table lamp", "lights")
+    assert sorted(
+        ProductLine.objects.get().attribute_value.values_list(
+            "value", flat=True
+        )
+    ) == ["M", "blue"]
+
+
+def test_import_catalog_rejects_taken_names(
+    category_factory, product_factory, tmp_path
+):
+    """Test rows of new products with a taken name or slug are rejected
+    one by one while the other rows of the chunk are imported."""
+    category = category_factory(name="Lamps", slug="lamps")
+    product_factory(pid="p0", name="Lamp", slug="lamp", category=category)
+    path = tmp_path / "catalog.csv"
+    path.write_text(
+        CSV_HEADER
+        + "p1,Desk lamp,desk-lamp,lamps,Lamp,s1,10,5,1,\n"
+        + "p2,Lamp,lamp-2,lamps,Lamp,s2,10,5,1,\n"
+        + "p3,Lamp 3,lamp,lamps,Lamp,s3,10,5,1,\n"
+        + "p4,Lamp 4,lamp-4,lamps,Lamp,s4,10,5,1,\n"
+        + "p5,Lamp 4,lamp-5,lamps,Lamp,s5,10,5,1,\n"
+    )
+    err = StringIO()
+
+    call_command(
+        "import_catalog", str(path), stdout=StringIO(), stderr=err
+    )
+
+    assert err.getvalue().splitlines() == [
+        "Row 3: name Lamp is taken.",
+        "Row 4: slug lamp is taken.",
+        "Row 5: name Lamp 4 is taken.",
+        "Row 6: name Lamp 4 is taken.",
+    ]
+    assert set(ProductLine.objects.values_list("sku", flat=True)) == {"s1"}
+
+
+def test_import_catalog_rolls_back_failed_chunk(
+    category_factory, tmp_path, monkeypatch
+):
+    """Test a failed chunk is rolled back and the import continues."""
+    category_factory(name="Lamps", slug="lamps")
+    path = tmp_path / "catalog.csv"
+    path.write_text(
+        CSV_HEADER
+        + "p1,Desk lamp,desk-lamp,lamps,Lamp,s1,10,5,1,\n"
+        + "p2,Lamp,lamp,lamps,Lamp,s2,10,5,1,color=red\n"
+        + "p3,Lamp 3,lamp-3,lamps,Lamp,s3,10,5,1,\n"
+    )
+    bulk_create = ProductLine.objects.bulk_create
+
+    def fail_on_red(objs, *args, **kwargs):
+        objs = list(objs)
+        if any(line.sku == "s2" for line in objs):
+            raise DatabaseError("disk I/O error")
+        return bulk_create(objs, *args, **kwargs)
+
+    monkeypatch.setattr(ProductLine.objects, "bulk_create", fail_on_red)
+    err = StringIO()
+
+    call_command(
+        "import_catalog", str(path), chunk_size=2,
+        stdout=StringIO(), stderr=err,
+    )
+
+    assert "Chunk rolled back: disk I/O error" in err.getvalue()
+    assert set(ProductLine.objects.values_list("sku", flat=True)) == {"s3"}
+
+
+def test_export_catalog(product_factory, tmp_path):
+    """Test exporting the active products to a JSONL file."""
+    product_factory(slug="lamp")
+    product_factory(slug="desk")
+    path = tmp_path / "catalog.jsonl"
+
+    call_command(
+        "export_catalog", output=str(path), chunk_size=1, stderr=StringIO()
+    )
+
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["slug"] for line in lines] == ["lamp", "desk"]
@@ -1,11 +1,15 @@
 """
 Init file for pytest package.
 """
+import factory
 import pytest
 from pytest_factoryboy import register
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
 from rest_framework.test import APIClient
 
+from core.metrics import metrics
+
 from .factories import (
     CategoryFactory,
     ProductFactory,
@@ -31,6 +35,27 @@ register(ProductAttributeValueFactory)
 register(ProductLineAttributeValueFactory)
 
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Clearing the cache between tests."""
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture(autouse=True)
+def isolate_metrics(settings, tmp_path, monkeypatch):
+    """Keeping the request metrics of every test apart."""
+    settings.METRICS_DIR = tmp_path / "metrics"
+    monkeypatch.setattr(metrics, "values", {})
+
+
+@pytest.fixture(autouse=True)
+def detect_n_plus_one(settings):
+    """Failing the requests of every test on N+1 queries."""
+    settings.NPLUSONE_DETECTION = "raise"
+
+
 @pytest.fixture
 def client():
     """Sample client for http methods."""
@@ -52,4 +77,55 @@ def create_superuser():
         email='Test@example.com',
         password='Test12345'
     )
-    return user
\ No newline at end of file
+    return user
+
+
+@pytest.fixture
+def user_client(client, create_user):
+    """Returning the client logged in as create_user."""
+    client.force_login(create_user)
+    return client
+
+
+@pytest.fixture
+def superuser_client(client, create_superuser):
+    """Returning the client logged in as create_superuser."""
+    client.force_login(create_superuser)
+    return client
+
+
+@pytest.fixture
+def make_product(
+    product_factory,
+    product_line_factory,
+    product_type_factory,
+    product_attribute_value_factory,
+):
+    """Returning a function creating a product with lines of one product
+    type and attribute values of distinct attributes. The skus are the
+    sku prefix, the slug by default, followed by the line number and the
+    line fields apply to every line."""
+    def make_product(
+        slug,
+        lines,
+        attribute_values=0,
+        sku_prefix=None,
+        line_fields=None,
+        **fields,
+    ):
+        product = product_factory(slug=slug, **fields)
+        prefix = slug if sku_prefix is None else sku_prefix
+        product_line_factory.create_batch(
+            lines,
+            product=product,
+            product_type=product_type_factory(),
+            sku=factory.Iterator(
+                [f"{prefix}{number}" for number in range(lines)]
+            ),
+            **(line_fields or {}),
+        )
+        product_attribute_value_factory.create_batch(
+            attribute_values, product=product
+        )
+        return product
+    return make_product
@@ -0,0 +1,128 @@
+"""
+Test the primary/replica database router with SQLite replica files.
+"""
+import pytest
+
+from django.db import connections
+from django.test import RequestFactory
+from django.urls import reverse
+
+from core import routers
+from core.middleware import ReplicaRoutingMiddleware
+from core.models.product import Category
+
+pytestmark = pytest.mark.django_db
+
+
+def add_database(alias, **config):
+    """Adding a database alias to the connection handler."""
+    connections.settings[alias] = connections.configure_settings(
+        {"default": connections.settings["default"], alias: config}
+    )[alias]
+
+
+def remove_database(alias):
+    connections[alias].close()
+    del connections[alias]
+    del connections.settings[alias]
+
+
+def create_replica(alias, path, category_name):
+    """Creating a replica file with the categories table and one category,
+    then opening it read-only like the replicas of the settings."""
+    add_database(alias, ENGINE="django.db.backends.sqlite3", NAME=str(path))
+    with connections[alias].schema_editor() as editor:
+        editor.create_model(Category)
+    Category.objects.using(alias).bulk_create([
+        Category(
+            name=category_name, slug=category_name, is_active=True,
+            lft=1, rght=2, tree_id=1, level=0,
+        )
+    ])
+    remove_database(alias)
+    add_read_only_database(alias, path)
+
+
+def add_read_only_database(alias, path):
+    add_database(
+        alias,
+        ENGINE="django.db.backends.sqlite3",
+        NAME=f"file:{path}?mode=ro",
+        OPTIONS={"uri": True},
+    )
+
+
+@pytest.fixture
+def replicas(settings, tmp_path):
+    """Configuring two SQLite replica files."""
+    aliases = ["replica1", "replica2"]
+    for alias in aliases:
+        create_replica(alias, tmp_path / f"{alias}.sqlite3", "replica")
+    settings.DATABASE_REPLICAS = aliases
+    yield aliases
+    for alias in aliases:
+        remove_database(alias)
+    routers._unavailable_until.clear()
+
+
+class TestPrimaryReplicaRouter:
+    """Test routing reads to replicas and writes to the primary."""
+
+    CATEGORY_LIST_URL = reverse("product-api:category-list")
+
+    def test_api_reads_from_replica(self, replicas, category_factory, client):
+        """Test the category list is read from a replica."""
+        category_factory(name="primary", is_active=True)
+
+        response = client.get(self.CATEGORY_LIST_URL)
+
+        assert [row["category"] for row in response.data] == ["replica"]
+
+    def test_reads_pinned_to_primary_after_write(
+        self, replicas, category_factory
+    ):
+        """Test the reads following a write use the primary."""
+        with routers.replica_reads():
+            before = Category.objects.count()
+            category_factory(name="primary")
+            after = list(Category.objects.values_list("name", flat=True))
+
+        assert before == 1
+        assert after == ["primary"]
+
+    def test_unavailable_replica_falls_back(
+        self, replicas, category_factory, client, tmp_path
+    ):
+        """Test a replica which can't be opened is skipped."""
+        for alias in replicas:
+            remove_database(alias)
+            add_read_only_database(alias, tmp_path / "missing.sqlite3")
+        category_factory(name="primary", is_active=True)
+
+        response = client.get(self.CATEGORY_LIST_URL)
+
+        assert [row["category"] for row in response.data] == ["primary"]
+        assert set(routers._unavailable_until) == set(replicas)
+
+    def test_reads_outside_requests_use_primary(self, replicas):
+        """Test reads outside replica_reads() blocks use the primary."""
+        assert not Category.objects.exists()
+
+    @pytest.mark.parametrize(
+        "method, url, uses_replicas",
+        [
+            ("get", reverse("product-api:product-list"), True),
+            ("head", reverse("product-api:category-list"), True),
+            ("post", reverse("product-api:category-list"), False),
+            ("get", reverse("admin:core_product_changelist"), True),
+            ("get", reverse("admin:core_product_add"), False),
+            ("get", reverse("schema"), False),
+        ],
+    )
+    def test_replica_views(self, settings, method, url, uses_replicas):
+        """Test the views reading from the replicas."""
+        settings.DATABASE_REPLICAS = ["replica1"]
+        request = getattr(RequestFactory(), method)(url)
+        middleware = ReplicaRoutingMiddleware(lambda request: None)
+
+        assert middleware.uses_replicas(request) is uses_replicas
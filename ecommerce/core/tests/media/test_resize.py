@@ -0,0 +1,169 @@
+"""
+Test the on-demand image resize endpoint.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from PIL import Image
+
+from django.urls import reverse
+
+from core import media, views
+from core.media import ResizeCache
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def resize_cache(settings, tmp_path, monkeypatch):
+    """Resizing the files of a temporary media root into a
+    temporary cache with a single worker process."""
+    settings.MEDIA_ROOT = tmp_path / "media"
+    settings.IMAGE_RESIZE_CACHE_DIR = tmp_path / "cache"
+    settings.IMAGE_RESIZE_WORKERS = 1
+    for tree, color in (("product", "red"), ("profile", "blue")):
+        (settings.MEDIA_ROOT / "uploads" / tree).mkdir(parents=True)
+        Image.new("RGB", (800, 600), color).save(
+            settings.MEDIA_ROOT / "uploads" / tree / "image.jpg"
+        )
+    Image.new("RGB", (10, 10)).save(settings.MEDIA_ROOT / "private.jpg")
+    cache = ResizeCache()
+    monkeypatch.setattr(views, "resize_cache", cache)
+    yield cache
+    if cache.executor is not None:
+        cache.executor.shutdown()
+
+
+def resize_url(width, height, path="uploads/product/image.jpg"):
+    return reverse("resize-image", args=[width, height, path])
+
+
+def cached_files(settings):
+    return sorted(settings.IMAGE_RESIZE_CACHE_DIR.glob("*/*/*"))
+
+
+def use_threads(cache, slots):
+    """Resizing in a thread of the test process, so the
+    patched resize_file and Pillow limits apply to it."""
+    cache.executor = ThreadPoolExecutor(max_workers=1)
+    cache.pending = threading.BoundedSemaphore(slots)
+
+
+class TestResizeImage:
+    """Test resizing the uploaded images with a disk cache."""
+
+    def test_resize_then_cache_hit(self, resize_cache, client, settings):
+        """Test a miss resizes the image to fit the box and the
+        following requests are served from the same cache file."""
+        response = client.get(resize_url(200, 200))
+        files = cached_files(settings)
+        resize_cache.executor.shutdown()
+
+        second = client.get(resize_url(200, 200))
+
+        assert response.status_code == second.status_code == 200
+        assert response["Content-Type"] == "image/jpeg"
+        assert response["ETag"] == second["ETag"]
+        assert b"".join(response.streaming_content) == b"".join(
+            second.streaming_content
+        )
+        assert cached_files(settings) == files
+        with Image.open(files[0]) as image:
+            assert image.size == (200, 150)
+
+    def test_profile_images(self, resize_cache, client):
+        """Test the profile images are resizable too."""
+        response = client.get(resize_url(80, 80, "uploads/profile/image.jpg"))
+
+        assert response.status_code == 200
+
+    @pytest.mark.parametrize(
+        "width, height, path",
+        [
+            (100, 100, "private.jpg"),
+            (100, 100, "uploads/product/../../private.jpg"),
+            (100, 100, "uploads/product/missing.jpg"),
+            (0, 100, "uploads/product/image.jpg"),
+            (100, 5000, "uploads/product/image.jpg"),
+        ],
+    )
+    def test_not_found(self, resize_cache, client, width, height, path):
+        """Test files outside the upload trees and
+        unsupported sizes are not resized."""
+        response = client.get(resize_url(width, height, path))
+
+        assert response.status_code == 404
+
+    def test_lru_eviction(self, resize_cache, client, settings):
+        """Test the least recently used files are evicted
+        when the cache grows beyond its size cap."""
+        client.get(resize_url(100, 100))
+        client.get(resize_url(120, 120))
+        for file in cached_files(settings):
+            # Aging the files beyond the file system's time resolution.
+            os.utime(file, (time.time() - 60,) * 2)
+        first, second = (
+            file.stat().st_size for file in cached_files(settings)
+        )
+        # Room for two and a half of the similarly sized files.
+        settings.IMAGE_RESIZE_CACHE_SIZE = first + second + first // 2
+        client.get(resize_url(100, 100))
+
+        client.get(resize_url(110, 110))
+
+        sizes = {
+            Image.open(file).size for file in cached_files(settings)
+        }
+        assert (100, 75) in sizes
+        assert (120, 90) not in sizes
+
+    def test_busy_pool(self, resize_cache, client, settings):
+        """Test a resize beyond the bound of the pool gets a 503."""
+        settings.IMAGE_RESIZE_QUEUE_FACTOR = 1
+        resize_cache.get_executor()
+        resize_cache.pending = threading.BoundedSemaphore(1)
+        resize_cache.pending.acquire()
+
+        response = client.get(resize_url(100, 100))
+
+        assert response.status_code == 503
+        assert response["Retry-After"] == "1"
+        assert cached_files(settings) == []
+
+    def test_timed_out_resize_keeps_its_slot(
+        self, resize_cache, client, settings, monkeypatch
+    ):
+        """Test a resize still running after its request timed out
+        holds its slot until it finishes."""
+        settings.IMAGE_RESIZE_TIMEOUT = 0.01
+        finish = threading.Event()
+        resize_file = media.resize_file
+
+        def slow_resize_file(*args):
+            finish.wait(5)
+            return resize_file(*args)
+
+        monkeypatch.setattr(media, "resize_file", slow_resize_file)
+        use_threads(resize_cache, slots=1)
+
+        timed_out = client.get(resize_url(100, 100))
+        held = not resize_cache.pending.acquire(blocking=False)
+        finish.set()
+        resize_cache.executor.shutdown()
+        released = resize_cache.pending.acquire(blocking=False)
+
+        assert timed_out.status_code == 503
+        assert held
+        assert released
+
+    def test_decompression_bomb(self, resize_cache, client, monkeypatch):
+        """Test an image beyond Pillow's pixel limit isn't resized."""
+        monkeypatch.setattr(Image, "MAX_IMAGE_PIXELS", 1000)
+        use_threads(resize_cache, slots=1)
+
+        response = client.get(resize_url(100, 100))
+
+        assert response.status_code == 404
@@ -0,0 +1,219 @@
+"""
+Test the request metrics and the metrics endpoint.
+"""
+import json
+import subprocess
+import sys
+import threading
+
+import pytest
+
+from django.urls import reverse
+
+from core.metrics import AGGREGATE_FILE, Metrics, collect, metrics
+
+pytestmark = pytest.mark.django_db
+
+URL = reverse("metrics")
+DETAIL_URL = reverse("product-api:product-detail", args=["lamp"])
+DETAIL_VIEW = 'view="product-api:product-detail"'
+TOKEN = "scraper-token"
+
+
+@pytest.fixture(autouse=True)
+def metrics_token(settings):
+    settings.METRICS_TOKEN = TOKEN
+
+
+@pytest.fixture
+def catalog(category_factory, product_factory, product_line_factory):
+    category = category_factory(slug="lamps", is_active=True)
+    product_line_factory(
+        product=product_factory(slug="lamp", category=category), sku="s1"
+    )
+
+
+def parse(text):
+    """Returning the samples of the text format as a dict of the sample
+    names with their labels to values, and the types by metric name."""
+    samples, types = {}, {}
+    for line in text.splitlines():
+        if line.startswith("# TYPE"):
+            _, _, name, kind = line.split()
+            types[name] = kind
+        elif not line.startswith("#"):
+            sample, value = line.rsplit(" ", 1)
+            samples[sample] = float(value)
+    return samples, types
+
+
+def get_metrics(client):
+    response = client.get(URL, HTTP_AUTHORIZATION=f"Bearer {TOKEN}")
+    assert response.status_code == 200
+    assert response["Content-Type"] == "text/plain; version=0.0.4"
+    return parse(response.content.decode())
+
+
+class TestMetrics:
+    """Test collecting the request metrics of the processes."""
+
+    def test_request_metrics(self, catalog, client):
+        """Test the counters and histograms of a view, including its
+        cache hits and misses and the cumulative histogram buckets."""
+        client.get(DETAIL_URL)
+        client.get(DETAIL_URL)
+        samples, types = get_metrics(client)
+
+        assert samples[
+            "http_requests_total{method=\"GET\",status=\"200\","
+            f"{DETAIL_VIEW}}}"
+        ] == 2
+        assert samples[
+            f'cache_requests_total{{cache="product_detail",result="hit",'
+            f"{DETAIL_VIEW}}}"
+        ] == 1
+        assert samples[
+            f'cache_requests_total{{cache="product_detail",result="miss",'
+            f"{DETAIL_VIEW}}}"
+        ] == 1
+        assert samples[f"db_queries_total{{{DETAIL_VIEW}}}"] > 0
+        assert types["http_request_duration_seconds"] == "histogram"
+
+        buckets = [
+            value for sample, value in samples.items()
+            if sample.startswith("http_request_duration_seconds_bucket")
+            and DETAIL_VIEW in sample
+        ]
+        assert buckets == sorted(buckets)
+        assert buckets[-1] == 2 == samples[
+            f"http_request_duration_seconds_count{{{DETAIL_VIEW}}}"
+        ]
+        assert samples[
+            f'http_response_size_bytes_bucket{{{DETAIL_VIEW},le="+Inf"}}'
+        ] == 2
+
+    def test_unresolved(self, client):
+        """Test the requests of unknown paths share one label."""
+        client.get("/missing/")
+        samples, _ = get_metrics(client)
+
+        assert samples[
+            'http_requests_total{method="GET",status="404",'
+            'view="<unresolved>"}'
+        ] == 1
+
+    def test_processes_summed(self, settings, client):
+        """Test the metric files of all processes are summed, with the
+        metrics of this process written before collecting them."""
+        metrics.inc("db_queries_total", {"view": "a"}, 3)
+        metrics.observe("db_queries_per_request", {"view": "a"}, 3)
+        settings.METRICS_DIR.mkdir(parents=True)
+        (settings.METRICS_DIR / "1-0a1b2c3d.json").write_text(json.dumps([
+            ["db_queries_total", {"view": "a"}, 4],
+            ["db_queries_per_request_bucket", {"view": "a", "le": "1"}, 1],
+            ["db_queries_per_request_sum", {"view": "a"}, 1],
+            ["db_queries_per_request_count", {"view": "a"}, 1],
+        ]))
+        samples, _ = get_metrics(client)
+
+        assert samples['db_queries_total{view="a"}'] == 7
+        assert samples['db_queries_per_request_sum{view="a"}'] == 4
+        assert [
+            samples[f'db_queries_per_request_bucket{{view="a",le="{le}"}}']
+            for le in ("0", "1", "2", "5", "+Inf")
+        ] == [0, 1, 1, 2, 2]
+
+    def test_throttled_flush(self, settings):
+        """Test a process writes its metrics at most every
+        METRICS_FLUSH_SECONDS unless forced to."""
+        settings.METRICS_FLUSH_SECONDS = 60
+        metrics.inc("db_queries_total", {"view": "a"})
+        metrics.flush(force=True)
+        metrics.inc("db_queries_total", {"view": "a"})
+        metrics.flush()
+
+        assert json.loads(metrics.path().read_text()) == [
+            ["db_queries_total", {"view": "a"}, 1]
+        ]
+
+    def test_reused_pid(self, settings):
+        """Test a process reusing a pid writes its own file
+        instead of overwriting the file of the exited one."""
+        exited, current = Metrics(), Metrics()
+        exited.inc("db_queries_total", {"view": "a"}, 5)
+        exited.flush(force=True)
+        current.inc("db_queries_total", {"view": "a"}, 1)
+        current.flush(force=True)
+
+        assert exited.path() != current.path()
+        assert collect()[("db_queries_total", (("view", "a"),))] == 6
+
+    def test_exited_processes_folded(self, settings):
+        """Test the files of exited processes are folded into the
+        aggregate file without the sums going down."""
+        exited = subprocess.Popen([sys.executable, "-c", ""])
+        exited.wait()
+        settings.METRICS_DIR.mkdir(parents=True)
+        for token, value in (("a", 2), ("b", 3)):
+            (settings.METRICS_DIR / f"{exited.pid}-{token}.json").write_text(
+                json.dumps([["db_queries_total", {"view": "a"}, value]])
+            )
+        metrics.inc("db_queries_total", {"view": "a"}, 1)
+        metrics.flush(force=True)
+
+        first = collect()
+        second = collect()
+
+        key = ("db_queries_total", (("view", "a"),))
+        assert first[key] == second[key] == 6
+        assert sorted(
+            path.name for path in settings.METRICS_DIR.glob("*.json")
+        ) == sorted([AGGREGATE_FILE, metrics.path().name])
+
+    def test_concurrent_flushes(self, settings):
+        """Test concurrent forced flushes each write a whole
+        file and leave no temporary files behind."""
+        metrics.inc("db_queries_total", {"view": "a"})
+        errors = []
+
+        def flush():
+            try:
+                for _ in range(20):
+                    metrics.flush(force=True)
+            except Exception as error:
+                errors.append(error)
+
+        threads = [threading.Thread(target=flush) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert errors == []
+        assert [
+            path.name for path in settings.METRICS_DIR.iterdir()
+            if path.suffix != ".lock"
+        ] == [metrics.path().name]
+
+    def test_access(self, client, settings, create_superuser):
+        """Test only the staff and the holders of
+        the METRICS_TOKEN read the metrics."""
+        local = {"REMOTE_ADDR": "127.0.0.1"}
+        anonymous = client.get(URL, **local)
+        wrong_token = client.get(
+            URL, HTTP_AUTHORIZATION="Bearer wrong", **local
+        )
+        token = client.get(URL, HTTP_AUTHORIZATION=f"Bearer {TOKEN}")
+        settings.METRICS_TOKEN = ""
+        no_token_set = client.get(URL, HTTP_AUTHORIZATION="Bearer ")
+        client.force_login(create_superuser)
+        staff = client.get(URL)
+
+        assert [
+            response.status_code
+            for response in (anonymous, wrong_token, no_token_set)
+        ] == [403, 403, 403]
+        assert token.status_code == staff.status_code == 200
+        assert "# TYPE http_requests_total counter" in (
+            staff.content.decode().splitlines()
+        )
@@ -0,0 +1,117 @@
+"""
+Test the performance instrumentation middleware.
+"""
+import json
+import logging
+import re
+
+import pytest
+from asgiref.sync import async_to_sync
+
+from django.test import AsyncClient
+from django.urls import reverse
+
+from core.tests.product.test_async_views import reload_urls
+
+pytestmark = pytest.mark.django_db
+
+DETAIL_URL = reverse("product-api:product-detail", args=["lamp"])
+
+
+@pytest.fixture
+def catalog(category_factory, product_factory, product_line_factory):
+    category = category_factory(slug="lamps", is_active=True)
+    product_line_factory(
+        product=product_factory(slug="lamp", category=category), sku="s1"
+    )
+
+
+@pytest.fixture(autouse=True)
+def sample_all(settings):
+    settings.PERFORMANCE_SAMPLE_RATE = 1
+    settings.PERFORMANCE_QUERY_BUDGET = 20
+
+
+def parse_server_timing(header):
+    """Returning the Server-Timing metrics as a dict of names to params."""
+    return {
+        metric.split(";")[0]: dict(
+            param.split("=", 1) for param in metric.split(";")[1:]
+        )
+        for metric in header.split(", ")
+    }
+
+
+def get_log(caplog):
+    (record,) = [
+        record for record in caplog.records
+        if record.name == "core.performance"
+    ]
+    return record.levelno, json.loads(record.getMessage())
+
+
+class TestPerformanceMiddleware:
+    """Test recording the performance stats of sampled requests."""
+
+    def test_server_timing_and_log(
+        self, catalog, client, caplog, django_assert_max_num_queries
+    ):
+        """Test the query count, phase timings and the JSON log line."""
+        caplog.set_level(logging.INFO, "core.performance")
+        with django_assert_max_num_queries(20) as captured:
+            response = client.get(DETAIL_URL)
+
+        timing = parse_server_timing(response["Server-Timing"])
+        level, log = get_log(caplog)
+        assert set(timing) == {"db", "serialize", "render", "total"}
+        assert timing["db"]["desc"] == f'"{len(captured)} queries"'
+        assert float(timing["serialize"]["dur"]) > 0
+        assert float(timing["render"]["dur"]) > 0
+        assert level == logging.INFO
+        assert log["view"] == "product-api:product-detail"
+        assert log["queries"] == len(captured)
+        assert log["status"] == 200
+        assert log["over_budget"] is False
+        assert log["total_ms"] >= log["sql_ms"]
+
+    def test_over_budget(self, catalog, client, caplog, settings):
+        """Test a request over the query budget is logged as a warning."""
+        settings.PERFORMANCE_QUERY_BUDGET = 1
+
+        client.get(DETAIL_URL)
+
+        level, log = get_log(caplog)
+        assert level == logging.WARNING
+        assert log["over_budget"] is True
+
+    def test_not_sampled(self, catalog, client, settings):
+        """Test the requests left out of the sample aren't recorded."""
+        settings.PERFORMANCE_SAMPLE_RATE = 0
+
+        response = client.get(DETAIL_URL)
+
+        assert "Server-Timing" not in response
+
+    def test_other_views_not_recorded(self, client):
+        """Test only the views in PERFORMANCE_VIEWS are recorded."""
+        response = client.get(reverse("schema"))
+
+        assert "Server-Timing" not in response
+
+    def test_async_views(self, catalog, settings, caplog):
+        """Test the queries run by the async ORM's threads are counted."""
+        caplog.set_level(logging.INFO, "core.performance")
+        settings.ASYNC_API = True
+        reload_urls()
+        try:
+            response = async_to_sync(AsyncClient().get)(DETAIL_URL)
+        finally:
+            settings.ASYNC_API = False
+            reload_urls()
+
+        _, log = get_log(caplog)
+        assert re.match(
+            r'db;dur=[\d.]+;desc="[1-9]\d* queries"', response["Server-Timing"]
+        )
+        assert log["view"] == "product-api:product-detail"
+        assert log["render_ms"] > 0
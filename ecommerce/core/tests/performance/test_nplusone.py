@@ -0,0 +1,78 @@
+"""
+Test the detection of N+1 queries.
+"""
+import logging
+
+import pytest
+
+from django.urls import reverse
+
+from core.models.product import Product, ProductQuerySet
+from core.nplusone import NPlusOne, detecting
+from product.api.v1.serializers import ProductSerializer
+
+pytestmark = pytest.mark.django_db
+
+URL = reverse("product-api:product-list")
+
+
+@pytest.fixture
+def catalog(product_factory, product_line_factory):
+    for number in range(3):
+        product_line_factory(
+            product=product_factory(slug=f"p{number}"), sku=f"s{number}"
+        )
+
+
+@pytest.fixture
+def without_prefetch(monkeypatch):
+    """Dropping the prefetches of the product list."""
+    monkeypatch.setattr(ProductQuerySet, "with_details", lambda self: self)
+
+
+class TestNPlusOne:
+    """Test detecting lazy loads repeated across instances."""
+
+    def test_serializer_field(self, catalog):
+        """Test the N+1 queries are reported by serializer field,
+        while the prefetched relations aren't reported."""
+        with detecting() as detector:
+            ProductSerializer(Product.objects.all(), many=True).data
+        with detecting() as prefetched:
+            ProductSerializer(
+                Product.objects.with_details(), many=True
+            ).data
+
+        sites = {site: count for site, _, count in detector.problems()}
+        assert sites == {
+            "ProductSerializer.product_line": 3,
+            "ProductSerializer.attribute_value": 3,
+            "ProductLineSerializer.product_image": 3,
+            "ProductLineSerializer.attribute_value": 3,
+        }
+        assert 'FROM "core_productline"' in detector.report()
+        assert prefetched.problems() == []
+
+    def test_threshold(self, catalog):
+        """Test queries repeated less than the threshold are let be."""
+        with detecting(threshold=4) as detector:
+            ProductSerializer(Product.objects.all(), many=True).data
+
+        assert detector.problems() == []
+
+    def test_request_raises(self, catalog, without_prefetch, client):
+        """Test a request with N+1 queries fails in the raise mode."""
+        with pytest.raises(NPlusOne, match="ProductSerializer.product_line"):
+            client.get(URL)
+
+    def test_request_logs(
+        self, catalog, without_prefetch, client, settings, caplog
+    ):
+        """Test the N+1 queries of a request are logged in the log mode."""
+        settings.NPLUSONE_DETECTION = "log"
+        caplog.set_level(logging.WARNING, "core.nplusone")
+        response = client.get(URL)
+
+        assert response.status_code == 200
+        (record,) = caplog.records
+        assert record.getMessage().startswith(f"N+1 queries in GET {URL}:")
@@ -0,0 +1,140 @@
+"""
+Test the async views of product's API.
+"""
+import asyncio
+from importlib import reload
+
+import pytest
+from asgiref.sync import async_to_sync
+
+from django.core.cache import cache
+from django.test import AsyncClient
+from django.urls import clear_url_caches, resolve, reverse
+
+from rest_framework import status
+
+import ecommerce.urls
+import product.api.v1.urls
+from product.api.v1 import async_views
+
+pytestmark = pytest.mark.django_db
+
+
+def reload_urls():
+    reload(product.api.v1.urls)
+    reload(ecommerce.urls)
+    clear_url_caches()
+
+
+@pytest.fixture
+def async_api(settings):
+    """Routing the hot read endpoints to the async views."""
+    settings.ASYNC_API = True
+    reload_urls()
+    yield
+    settings.ASYNC_API = False
+    reload_urls()
+
+
+@pytest.fixture
+def catalog(category_factory, product_factory, product_line_factory):
+    category = category_factory(name="Lamps", slug="lamps", is_active=True)
+    lamp = product_factory(slug="lamp", category=category)
+    product_line_factory(product=lamp, sku="s1")
+    product_factory(slug="shade", category=category)
+
+
+URLS = [
+    reverse("product-api:category-list"),
+    reverse("product-api:product-detail", args=["lamp"]),
+    reverse(
+        "product-api:product-list-product-by-category-slug", args=["lamps"]
+    ),
+    reverse(
+        "product-api:product-list-product-by-category-slug", args=["lamps"]
+    ) + "?ordering=-price&min_price=1",
+    reverse(
+        "product-api:product-list-product-by-category-slug", args=["lamps"]
+    ) + "?ordering=name",
+]
+
+
+class TestAsyncViews:
+    """Test the async views replacing the viewset actions."""
+
+    def test_routes_replaced_in_place(self, async_api):
+        """Test only the hot read routes are served by async views."""
+        detail = resolve(reverse("product-api:product-detail", args=["a"]))
+        search = resolve(reverse("product-api:product-search"))
+
+        assert detail.func is async_views.product_detail
+        assert search.func is not async_views.product_detail
+
+    @pytest.mark.parametrize("url", URLS)
+    def test_same_response_as_viewsets(self, catalog, client, url, settings):
+        """Test the async views respond with the same status, bytes
+        and etag."""
+        expected = client.get(url)
+        settings.ASYNC_API = True
+        reload_urls()
+        try:
+            response = async_to_sync(AsyncClient().get)(url)
+        finally:
+            settings.ASYNC_API = False
+            reload_urls()
+
+        assert response.status_code == expected.status_code
+        assert response.content == expected.content
+        assert response.get("ETag") == expected.get("ETag")
+
+    def test_attribute_filter_on_cold_cache(
+        self, catalog, async_api, attribute_value_factory
+    ):
+        """Test the attribute names of a filtered listing are looked
+        up with the async ORM when the cache is empty."""
+        attribute_value_factory(attribute__name="color", value="red")
+        url = reverse(
+            "product-api:product-list-product-by-category-slug",
+            args=["lamps"],
+        )
+        cache.clear()
+
+        response = async_to_sync(AsyncClient().get)(
+            url, {"color": "red", "utm_source": "mail"}
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == []
+
+    def test_not_modified(self, catalog, async_api):
+        """Test a matching etag returns a 304 from the cached detail."""
+        url = reverse("product-api:product-detail", args=["lamp"])
+        client = AsyncClient()
+        etag = async_to_sync(client.get)(url)["ETag"]
+
+        response = async_to_sync(client.get)(
+            url, headers={"If-None-Match": etag}
+        )
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_concurrent_requests(self, catalog, async_api):
+        """Test serving concurrent requests from one event loop."""
+        client = AsyncClient()
+
+        async def get_all():
+            return await asyncio.gather(
+                *(client.get(url) for url in URLS[:3] * 5)
+            )
+
+        responses = async_to_sync(get_all)()
+
+        assert {response.status_code for response in responses} == {200}
+
+    def test_unsafe_method_not_allowed(self, async_api):
+        """Test only GET and HEAD are allowed."""
+        url = reverse("product-api:category-list")
+
+        response = async_to_sync(AsyncClient().post)(url)
+
+        assert response.status_code == status.HTTP_405_METHOD_NOT_ALLOWED
@@ -1,12 +1,19 @@
 """
 Test API's endpoints for the product app.
 """
+import json
+from datetime import datetime, timezone
+
 import pytest
 
+from django.core.cache import cache
 from django.urls import reverse
 
 from rest_framework import status
 
+from core.models.product import Product, ProductLine
+from product import stock
+
 pytestmark = pytest.mark.django_db
 
 
@@ -25,6 +32,107 @@ class TestCategoryEndpoints:
         assert len(response.data) == 4
 
 
+class TestCategoryTreeEndpoint:
+    """Test the nested category tree endpoint."""
+
+    CATEGORY_TREE_URL = reverse("product-api:category-tree")
+
+    @pytest.fixture
+    def sample_tree(self, category_factory):
+        """Creating a sample tree of categories."""
+        root = category_factory(name="a", slug="a", is_active=True)
+        child = category_factory(
+            name="b", slug="b", parent=root, is_active=True
+        )
+        category_factory(name="c", slug="c", parent=child, is_active=True)
+        hidden = category_factory(name="d", slug="d", parent=root)
+        category_factory(name="e", slug="e", parent=hidden, is_active=True)
+        category_factory(name="f", slug="f", is_active=True)
+
+    def test_get_nested_tree_in_one_query(
+        self, sample_tree, client, django_assert_num_queries
+    ):
+        """Test returning the nested tree of active categories."""
+        with django_assert_num_queries(1):
+            response = client.get(self.CATEGORY_TREE_URL)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == [
+            {"category": "a", "slug": "a", "children": [
+                {"category": "b", "slug": "b", "children": [
+                    {"category": "c", "slug": "c", "children": []},
+                ]},
+            ]},
+            {"category": "f", "slug": "f", "children": []},
+        ]
+
+    def test_get_tree_by_root_and_depth(self, sample_tree, client):
+        """Test returning the subtree of a root slug up to a depth."""
+        response = client.get(
+            self.CATEGORY_TREE_URL, {"root": "a", "depth": 1}
+        )
+
+        assert response.json() == [
+            {"category": "a", "slug": "a", "children": [
+                {"category": "b", "slug": "b", "children": []},
+            ]},
+        ]
+
+    def test_get_tree_unknown_root_response_404(self, sample_tree, client):
+        """Test returning 404 for an unknown root slug."""
+        response = client.get(self.CATEGORY_TREE_URL, {"root": "x"})
+
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+    def test_get_tree_not_modified_by_etag(
+        self, sample_tree, client, django_assert_num_queries
+    ):
+        """Test returning 304 for an unchanged tree."""
+        etag = client.get(self.CATEGORY_TREE_URL)["ETag"]
+
+        with django_assert_num_queries(0):
+            response = client.get(
+                self.CATEGORY_TREE_URL, HTTP_IF_NONE_MATCH=etag
+            )
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_get_tree_cached_with_timeout(
+        self, sample_tree, client, settings, monkeypatch
+    ):
+        """Test trees expire, the signals of other processes
+        can't invalidate a process-local cache."""
+        settings.CATEGORY_TREE_CACHE_TIMEOUT = 30
+        timeouts = []
+        set_cache = cache.set
+        monkeypatch.setattr(
+            cache,
+            "set",
+            lambda key, value, timeout=None: (
+                timeouts.append(timeout) or set_cache(key, value, timeout)
+            ),
+        )
+
+        client.get(self.CATEGORY_TREE_URL)
+
+        assert timeouts[-1] == 30
+
+    def test_get_tree_invalidated_by_category_changes(
+        self, sample_tree, client, category_factory
+    ):
+        """Test a changed tree gets a new etag."""
+        etag = client.get(self.CATEGORY_TREE_URL)["ETag"]
+        category_factory(name="g", slug="g", is_active=True)
+
+        response = client.get(
+            self.CATEGORY_TREE_URL, HTTP_IF_NONE_MATCH=etag
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["ETag"] != etag
+        assert len(response.json()) == 3
+
+
 class TestProductEndpoints:
     """Test Products endpoints."""
 
@@ -37,7 +145,45 @@ class TestProductEndpoints:
         response = client.get(self.PRODUCT_LIST_URL)
 
         assert response.status_code == status.HTTP_200_OK
-        assert len(response.data) == 4
+        assert len(response.data["results"]) == 4
+
+    def test_product_list_paginated_by_cursor(self, product_factory, client):
+        """Test listing products page by page with the page_size param."""
+        product_factory.create_batch(5)
+
+        response = client.get(self.PRODUCT_LIST_URL, {"page_size": 2})
+        next_response = client.get(response.data["next"])
+
+        assert len(response.data["results"]) == 2
+        assert len(next_response.data["results"]) == 2
+        assert response.data["previous"] is None
+        assert {p["slug"] for p in response.data["results"]}.isdisjoint(
+            p["slug"] for p in next_response.data["results"]
+        )
+
+    def test_product_list_constant_number_of_queries(
+        self,
+        product_factory,
+        product_line_factory,
+        product_image_factory,
+        attribute_value_factory,
+        client,
+        django_assert_num_queries,
+    ):
+        """Test listing products costs the same number
+        of queries regardless of the number of products."""
+        for product in product_factory.create_batch(3):
+            product_line = product_line_factory(
+                product=product,
+                attribute_value=(attribute_value_factory(),),
+            )
+            product_image_factory(product_line=product_line)
+
+        with django_assert_num_queries(5):
+            response = client.get(self.PRODUCT_LIST_URL)
+
+        assert len(response.data["results"]) == 3
+        assert len(response.data["results"][0]["product_line"]) == 1
 
     def test_get_product_by_associated_slug(self, product_factory, client):
         """Test get products by a specific category."""
@@ -113,6 +259,30 @@ class TestProductEndpoints:
         assert response.status_code == status.HTTP_200_OK
         assert len(response.data) == 1
 
+    def test_list_products_including_descendant_categories(
+        self, category_factory, product_factory, client,
+        django_assert_num_queries
+    ):
+        """Test returning products of descendant categories
+        with the include_descendants param."""
+        parent = category_factory(name="parent", slug="parent")
+        child = category_factory(name="child", slug="child", parent=parent)
+        grandchild = category_factory(
+            name="grandchild", slug="grandchild", parent=child
+        )
+        other = category_factory(name="other", slug="other")
+        for category in (parent, child, grandchild, other):
+            product_factory(category=category)
+        url = f"{self.PRODUCT_LIST_URL}category/{child.slug}/"
+
+        response = client.get(url)
+        # The validators and the products, which have no lines.
+        with django_assert_num_queries(2):
+            all_response = client.get(url, {"include_descendants": "true"})
+
+        assert len(response.data) == 1
+        assert len(all_response.data) == 2
+
     def test_return_first_product_line_first_product_image_by_category_slug(
         self,
         product_factory,
@@ -149,3 +319,514 @@ class TestProductEndpoints:
         assert len(response.data[0]["image"]) == 1
         assert response.data[0]["image"][0]["order"] == sample_prod_img1.order
         assert response.data[0]["image"][0]["order"] != sample_prod_img2.order
+
+
+class TestProductDetailCache:
+    """Test caching rendered product detail documents."""
+
+    PRODUCT_LIST_URL = reverse("product-api:product-list")
+
+    def test_cached_product_detail_without_queries(
+        self, product_factory, product_line_factory, client,
+        django_assert_num_queries
+    ):
+        """Test a cache hit doesn't run any queries."""
+        sample_product = product_factory()
+        product_line_factory(product=sample_product)
+        url = f"{self.PRODUCT_LIST_URL}{sample_product.slug}/"
+        first_response = client.get(url)
+
+        with django_assert_num_queries(0):
+            response = client.get(url)
+
+        assert response.data == first_response.data
+        assert len(response.data[0]["product_line"]) == 1
+
+    def test_cache_invalidated_by_product_line_changes(
+        self, product_factory, product_line_factory, client
+    ):
+        """Test saving a product line rebuilds the document."""
+        sample_product = product_factory()
+        prod_line = product_line_factory(product=sample_product, price=10)
+        url = f"{self.PRODUCT_LIST_URL}{sample_product.slug}/"
+        client.get(url)
+
+        prod_line.price = 20
+        prod_line.save()
+        response = client.get(url)
+
+        assert response.data[0]["product_line"][0]["price"] == "20.00"
+
+    def test_cache_invalidated_by_attribute_changes(
+        self, product_factory, product_line_factory,
+        attribute_value_factory, client
+    ):
+        """Test changing attributes and their links
+        through many to many managers rebuilds the document."""
+        attr_value = attribute_value_factory(value="red")
+        sample_product = product_factory(attribute_value=(attr_value,))
+        prod_line = product_line_factory(product=sample_product)
+        url = f"{self.PRODUCT_LIST_URL}{sample_product.slug}/"
+        client.get(url)
+
+        attr_value.attribute.name = "color"
+        attr_value.attribute.save()
+        prod_line.attribute_value.add(attr_value)
+        response = client.get(url)
+
+        assert response.data[0]["attributes"] == {"color": "red"}
+        assert response.data[0]["product_line"][0]["specifications"] == {
+            "color": "red"
+        }
+
+    def test_cache_invalidated_by_deactivating_product(
+        self, product_factory, client
+    ):
+        """Test a deactivated product isn't served from the cache."""
+        sample_product = product_factory()
+        url = f"{self.PRODUCT_LIST_URL}{sample_product.slug}/"
+        client.get(url)
+
+        sample_product.is_active = False
+        sample_product.save()
+        response = client.get(url)
+
+        assert response.data == []
+
+
+class TestAttributeFacets:
+    """Test filtering category listings by attribute values."""
+
+    PRODUCT_LIST_URL = reverse("product-api:product-list")
+
+    @pytest.fixture
+    def sample_catalog(
+        self, category_factory, product_factory, product_line_factory,
+        attribute_factory, attribute_value_factory
+    ):
+        """Creating products with colors and sizes in a category."""
+        category = category_factory(slug="clothes")
+        color = attribute_factory(name="color")
+        size = attribute_factory(name="size")
+        values = {
+            value: attribute_value_factory(attribute=attribute, value=value)
+            for attribute, value in (
+                (color, "red"), (color, "blue"), (size, "M"), (size, "L")
+            )
+        }
+        lines = {}
+        for name, attrs in (
+            ("p1", ("red", "M")), ("p2", ("red", "L")), ("p3", ("blue", "M"))
+        ):
+            lines[name] = product_line_factory(
+                product=product_factory(slug=name, category=category),
+                attribute_value=[values[attr] for attr in attrs],
+            )
+        return lines, values
+
+    def test_filter_category_listing_by_attribute_values(
+        self, sample_catalog, client
+    ):
+        """Test returning products having the attribute values."""
+        url = f"{self.PRODUCT_LIST_URL}category/clothes/"
+
+        red = client.get(url, {"color": "red"})
+        red_medium = client.get(url, {"color": "red", "size": "M"})
+        any_color = client.get(f"{url}?color=red&color=blue")
+
+        assert {p["slug"] for p in red.data} == {"p1", "p2"}
+        assert [p["slug"] for p in red_medium.data] == ["p1"]
+        assert len(any_color.data) == 3
+
+    def test_unknown_params_ignored(
+        self, sample_catalog, client, django_assert_num_queries
+    ):
+        """Test params which aren't attribute names, like tracking
+        params, neither filter the listing nor the facets."""
+        url = f"{self.PRODUCT_LIST_URL}category/clothes/"
+        client.get(f"{url}facets/", {"color": "red"})
+
+        listing = client.get(url, {"utm_source": "x", "color": "red"})
+        with django_assert_num_queries(0):
+            facets = client.get(
+                f"{url}facets/", {"fbclid": "y", "color": "red"}
+            )
+
+        assert {p["slug"] for p in listing.data} == {"p1", "p2"}
+        assert facets.json()["color"] == {"blue": 1, "red": 2}
+
+    def test_facet_counts_by_category_slug(
+        self, sample_catalog, client, django_assert_max_num_queries
+    ):
+        """Test counting products per value with grouped queries and
+        one query of the attribute names on a cold cache, a filtered
+        attribute ignores its own filter."""
+        url = f"{self.PRODUCT_LIST_URL}category/clothes/facets/"
+
+        with django_assert_max_num_queries(3):
+            response = client.get(url, {"color": "red"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.json() == {
+            "color": {"blue": 1, "red": 2},
+            "size": {"L": 1, "M": 1},
+        }
+
+    def test_facet_counts_cached_until_links_change(
+        self, sample_catalog, client, django_assert_num_queries
+    ):
+        """Test facet counts are served from the cache
+        and invalidated when attribute links change."""
+        lines, values = sample_catalog
+        url = f"{self.PRODUCT_LIST_URL}category/clothes/facets/"
+        client.get(url)
+
+        with django_assert_num_queries(0):
+            client.get(url)
+        lines["p2"].attribute_value.add(values["blue"])
+        response = client.get(url)
+
+        assert response.json()["color"] == {"blue": 2, "red": 2}
+
+
+class TestCategoryListingPrices:
+    """Test sorting and filtering category listings by price."""
+
+    URL = reverse(
+        "product-api:product-list-product-by-category-slug", args=["lamps"]
+    )
+
+    @pytest.fixture(autouse=True)
+    def sample_catalog(
+        self, category_factory, product_factory, product_line_factory,
+        attribute_factory, attribute_value_factory
+    ):
+        """Creating products with price ranges, one out of
+        stock, one without lines and a colored one."""
+        category = category_factory(slug="lamps")
+        red = attribute_value_factory(
+            attribute=attribute_factory(name="color"), value="red"
+        )
+        for slug, prices, stock_qty in (
+            ("p1", (30, 8), 1), ("p2", (15,), 0), ("p3", (50, 20), 5)
+        ):
+            product = product_factory(slug=slug, category=category)
+            for price in prices:
+                product_line_factory(
+                    product=product, price=price, stock_qty=stock_qty,
+                    attribute_value=[red] if slug == "p3" else [],
+                )
+        product_factory(slug="p4", category=category)
+
+    @pytest.mark.parametrize("fast", [True, False])
+    @pytest.mark.parametrize(
+        "params, slugs",
+        [
+            ({}, ["p1", "p2", "p3", "p4"]),
+            ({"ordering": "price"}, ["p1", "p2", "p3", "p4"]),
+            ({"ordering": "-price"}, ["p3", "p2", "p1", "p4"]),
+            ({"min_price": "10", "max_price": "20"}, ["p2", "p3"]),
+            ({"min_price": "15.5", "ordering": "-price"}, ["p3"]),
+            ({"in_stock": "true"}, ["p1", "p3"]),
+            ({"color": "red", "page_size": "10"}, ["p3"]),
+        ],
+    )
+    def test_sorted_and_filtered(self, client, settings, fast, params, slugs):
+        """Test the listings are sorted and filtered by the lowest price
+        and the stock flag, the other params stay attribute filters."""
+        settings.PRODUCT_FAST_SERIALIZERS = (
+            {"list_product_by_category_slug"} if fast else set()
+        )
+
+        response = client.get(self.URL, params)
+
+        assert [p["slug"] for p in response.data] == slugs
+
+    @pytest.mark.parametrize(
+        "params",
+        [{"ordering": "name"}, {"min_price": "cheap"}, {"max_price": "nan"}],
+    )
+    def test_invalid_params(self, client, params):
+        """Test invalid ordering and price params are rejected."""
+        response = client.get(self.URL, params)
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert set(response.data) == set(params)
+
+    def test_lines_not_loaded(self, client, django_assert_num_queries):
+        """Test the listing reads the prices from the products,
+        only the images of the cover lines are fetched."""
+        # The validators, the products and the cover line images.
+        with django_assert_num_queries(3):
+            response = client.get(self.URL, {"ordering": "price"})
+
+        assert response.data[0]["price"] == "8.00"
+        assert "price" not in response.data[-1]
+
+    def test_facets_filtered_like_listing(self, client):
+        """Test the facets count the products of the listing with the
+        same price and stock params, and follow the stock flag."""
+        url = reverse(
+            "product-api:product-list-facets-by-category-slug",
+            args=["lamps"],
+        )
+        red = {"color": {"red": 1}}
+
+        cheap = client.get(url, {"max_price": "15"}).json()
+        priced = client.get(url, {"min_price": "15"}).json()
+        in_stock = client.get(url, {"in_stock": "true"}).json()
+        stock.reserve({
+            line.sku: line.stock_qty
+            for line in ProductLine.objects.filter(product__slug="p3")
+        })
+        sold_out = client.get(url, {"in_stock": "true"}).json()
+
+        assert (cheap, priced, in_stock, sold_out) == ({}, red, red, {})
+
+
+class TestProductSearch:
+    """Test the full-text product search endpoint."""
+
+    SEARCH_URL = reverse("product-api:product-search")
+
+    def test_search_products_ranked_by_relevance(
+        self, product_factory, category_factory, client
+    ):
+        """Test matching names before descriptions and
+        searching by the names of ancestor categories."""
+        parent = category_factory(name="Electronics", slug="electronics")
+        child = category_factory(name="Phones", slug="phones", parent=parent)
+        product_factory(
+            slug="case", name="Leather case", description="Phone case",
+            category=child,
+        )
+        product_factory(slug="phone", name="Smart phone", category=child)
+        product_factory(slug="lamp", name="Desk lamp")
+        product_factory(slug="hidden", name="Old phone", is_active=False)
+
+        response = client.get(self.SEARCH_URL, {"q": "phon"})
+        category_response = client.get(self.SEARCH_URL, {"q": "electronics"})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["count"] == 2
+        assert [p["slug"] for p in response.data["results"]] == [
+            "phone", "case"
+        ]
+        assert category_response.data["count"] == 2
+
+    def test_search_by_attribute_values_kept_in_sync(
+        self, product_factory, product_line_factory,
+        attribute_value_factory, client
+    ):
+        """Test the index follows attribute value changes."""
+        attr_value = attribute_value_factory(value="crimson")
+        product_line = product_line_factory(product=product_factory())
+
+        before = client.get(self.SEARCH_URL, {"q": "crimson"})
+        product_line.attribute_value.add(attr_value)
+        after = client.get(self.SEARCH_URL, {"q": "crimson"})
+        attr_value.value = "scarlet"
+        attr_value.save()
+        renamed = client.get(self.SEARCH_URL, {"q": "scarlet"})
+
+        assert before.data["count"] == 0
+        assert after.data["count"] == 1
+        assert renamed.data["count"] == 1
+
+    def test_search_paginated(self, product_factory, client):
+        """Test paginating search results with the page_size param."""
+        for n in range(3):
+            product_factory(name=f"Lamp {n}")
+
+        response = client.get(self.SEARCH_URL, {"q": "lamp", "page_size": 2})
+
+        assert response.data["count"] == 3
+        assert len(response.data["results"]) == 2
+        assert response.data["next"] is not None
+
+    def test_search_with_special_characters(self, product_factory, client):
+        """Test the query syntax of FTS5 isn't exposed to clients."""
+        product_factory(name="Lamp")
+
+        response = client.get(self.SEARCH_URL, {"q": 'lamp" (*'})
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response.data["count"] == 1
+
+
+class TestCatalogExport:
+    """Test the streaming JSONL catalog export."""
+
+    EXPORT_URL = reverse("product-api:product-export")
+
+    def read_lines(self, response):
+        return [
+            json.loads(line)
+            for line in b"".join(response.streaming_content).splitlines()
+        ]
+
+    def test_export_products_in_detail_shape(
+        self, product_factory, product_line_factory, client
+    ):
+        """Test exporting one ProductSerializer document per line."""
+        product = product_factory(slug="lamp")
+        product_line_factory(product=product)
+        product_factory(is_active=False)
+
+        response = client.get(self.EXPORT_URL)
+        detail = client.get(
+            reverse("product-api:product-detail", args=["lamp"])
+        )
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["Content-Type"] == "application/x-ndjson"
+        assert self.read_lines(response) == detail.json()
+
+    def test_export_prefetches_per_chunk(
+        self, product_factory, product_line_factory, client,
+        django_assert_num_queries, settings
+    ):
+        """Test the queries grow with the chunks and not the products."""
+        settings.PRODUCT_EXPORT_CHUNK_SIZE = 2
+        for n in range(4):
+            product_line_factory(product=product_factory(slug=f"p{n}"))
+
+        response = client.get(self.EXPORT_URL)
+        # One products cursor, then per chunk the lines, images
+        # and the product and product line attribute values.
+        with django_assert_num_queries(1 + 2 * 4):
+            lines = self.read_lines(response)
+
+        assert [line["slug"] for line in lines] == ["p0", "p1", "p2", "p3"]
+
+    def test_export_updated_since(self, product_factory, client):
+        """Test filtering the export by the updated_since param."""
+        product_factory(slug="old")
+        Product.objects.update(
+            updated_at=datetime(2020, 1, 1, tzinfo=timezone.utc)
+        )
+        product_factory(slug="new")
+
+        response = client.get(
+            self.EXPORT_URL, {"updated_since": "2021-01-01"}
+        )
+        invalid = client.get(self.EXPORT_URL, {"updated_since": "yesterday"})
+
+        assert [line["slug"] for line in self.read_lines(response)] == ["new"]
+        assert invalid.status_code == status.HTTP_400_BAD_REQUEST
+
+
+class TestConditionalGet:
+    """Test answering revalidation requests with 304 responses."""
+
+    CATEGORY_LIST_URL = reverse("product-api:category-list")
+
+    def test_product_detail_not_modified(
+        self, product_factory, client, django_assert_num_queries
+    ):
+        """Test a matching etag returns a 304 from the cache
+        or from one query without serializing the product."""
+        product_factory(slug="lamp", is_active=True)
+        url = reverse("product-api:product-detail", args=["lamp"])
+        response = client.get(url)
+        etag = response["ETag"]
+
+        with django_assert_num_queries(0):
+            cached = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        cache.clear()
+        with django_assert_num_queries(1):
+            uncached = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        since = client.get(
+            url, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+
+        assert cached.status_code == status.HTTP_304_NOT_MODIFIED
+        assert uncached.status_code == status.HTTP_304_NOT_MODIFIED
+        assert uncached["ETag"] == etag
+        assert since.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_product_detail_modified_by_image_changes(
+        self, product_factory, product_line_factory,
+        product_image_factory, client
+    ):
+        """Test changing an image of a product line changes the etag."""
+        product = product_factory(slug="lamp", is_active=True)
+        product_line = product_line_factory(product=product)
+        url = reverse("product-api:product-detail", args=["lamp"])
+        etag = client.get(url)["ETag"]
+
+        product_image_factory(product_line=product_line)
+        response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_200_OK
+        assert response["ETag"] != etag
+        assert len(response.data[0]["product_line"][0]["product_image"]) == 1
+
+    def test_category_listing_not_modified(
+        self, category_factory, product_factory, client,
+        django_assert_num_queries
+    ):
+        """Test the listing is validated with one query
+        and adding a product changes the etag."""
+        category = category_factory(slug="lamps")
+        product_factory(category=category, is_active=True)
+        url = reverse(
+            "product-api:product-list-product-by-category-slug",
+            args=["lamps"],
+        )
+        etag = client.get(url)["ETag"]
+
+        with django_assert_num_queries(1):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        product_factory(category=category, is_active=True)
+        modified = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        filtered = client.get(url, {"color": "red"}, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert modified.status_code == status.HTTP_200_OK
+        assert len(modified.data) == 2
+        assert filtered.status_code == status.HTTP_200_OK
+
+    def test_category_listing_ignores_if_modified_since(
+        self, category_factory, product_factory, client
+    ):
+        """Test the listings are validated by their etag only, the
+        latest modification time of the listed products doesn't change
+        when a product leaves the listing."""
+        category = category_factory(slug="lamps", is_active=True)
+        product_factory(category=category, is_active=True)
+        url = reverse(
+            "product-api:product-list-product-by-category-slug",
+            args=["lamps"],
+        )
+        since = "Fri, 01 Jan 2100 00:00:00 GMT"
+
+        listing = client.get(url, HTTP_IF_MODIFIED_SINCE=since)
+        categories = client.get(
+            self.CATEGORY_LIST_URL, HTTP_IF_MODIFIED_SINCE=since
+        )
+
+        assert listing.status_code == status.HTTP_200_OK
+        assert categories.status_code == status.HTTP_200_OK
+        assert not listing.has_header("Last-Modified")
+        assert not categories.has_header("Last-Modified")
+
+    def test_category_list_not_modified(
+        self, category_factory, client, django_assert_num_queries
+    ):
+        """Test the category list is validated with one query
+        and deactivating a category changes the etag."""
+        category = category_factory(is_active=True)
+        etag = client.get(self.CATEGORY_LIST_URL)["ETag"]
+
+        with django_assert_num_queries(1):
+            response = client.get(
+                self.CATEGORY_LIST_URL, HTTP_IF_NONE_MATCH=etag
+            )
+        category.is_active = False
+        category.save()
+        modified = client.get(self.CATEGORY_LIST_URL, HTTP_IF_NONE_MATCH=etag)
+
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert modified.status_code == status.HTTP_200_OK
+        assert modified.data == []
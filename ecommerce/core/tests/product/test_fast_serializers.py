@@ -0,0 +1,157 @@
+"""
+Test the values() based fast serializers render the
+same bytes as the model serializers of product's API.
+"""
+import pytest
+
+from django.core.cache import cache
+from django.urls import reverse
+
+from rest_framework.renderers import JSONRenderer
+
+from core.models.product import Product
+from product.api.v1.fast_serializers import (
+    serialize_details,
+    serialize_listing,
+)
+from product.api.v1.serializers import (
+    ProductCategorySerializer,
+    ProductSerializer,
+)
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def catalog(
+    category_factory,
+    product_factory,
+    product_line_factory,
+    product_image_factory,
+    attribute_factory,
+    attribute_value_factory,
+):
+    """Creating products with out of order lines and images with and
+    without variants, repeated attribute names, a product without
+    lines and a line without images."""
+    category = category_factory(name="Lamps", slug="lamps", is_active=True)
+    color = attribute_factory(name="color")
+    size = attribute_factory(name="size")
+    red, blue = (
+        attribute_value_factory(attribute=color, value=value)
+        for value in ("red", "blue")
+    )
+    large = attribute_value_factory(attribute=size, value="L")
+
+    lamp = product_factory(
+        name="Desk lamp", slug="lamp", pid="p1", category=category,
+        description="Läsk \"lamp\" <b>&</b> ✓",
+        attribute_value=[large, blue, red],
+    )
+    second = product_line_factory(
+        product=lamp, sku="s2", order=2, price=5.5,
+        attribute_value=[red, large],
+    )
+    first = product_line_factory(
+        product=lamp, sku="s1", order=1, price=999.99,
+        attribute_value=[blue, red],
+    )
+    for product_line, orders in ((first, (2, 1, 3)), (second, (2,))):
+        for order in orders:
+            product_image_factory(
+                product_line=product_line, order=order,
+                url=f"uploads/product/{product_line.sku}-{order}.jpg",
+                alternative_text=f"{product_line.sku} {order}",
+                variants=[
+                    {
+                        "name": f"{product_line.sku}-{order}-{width}w.{ext}",
+                        "width": width,
+                        "height": width // 2,
+                        "mime_type": f"image/{mime_type}",
+                    }
+                    for width in (640, 320)
+                    for ext, mime_type in (("webp", "webp"), ("jpg", "jpeg"))
+                ] if order != 3 else [],
+            )
+
+    product_factory(name="Lamp shade", slug="shade", pid="p2",
+                    category=category)
+    product_line_factory(
+        product=product_factory(
+            name="Floor lamp", slug="floor", pid="p3", category=category
+        ),
+        sku="s3",
+        price=10,
+    )
+    return category
+
+
+def render(data):
+    return JSONRenderer().render(data)
+
+
+class TestFastSerializerParity:
+    """Test the fast serializers render byte-identical documents."""
+
+    def test_details_parity(self, catalog, django_assert_num_queries):
+        """Test the detail documents of all products in the same queries."""
+        products = Product.objects.order_by("pk")
+        expected = render(
+            ProductSerializer(products.with_details(), many=True).data
+        )
+
+        with django_assert_num_queries(5):
+            data = serialize_details(products)
+
+        assert render(data) == expected
+        assert data[0]["product_line"][0]["specifications"] == {
+            "color": "blue"
+        }
+
+    def test_listing_parity(self, catalog, django_assert_num_queries):
+        """Test the listing documents of all products in the same queries."""
+        products = Product.objects.order_by("pk")
+        expected = render(
+            ProductCategorySerializer(products.for_listing(), many=True).data
+        )
+
+        with django_assert_num_queries(2):
+            data = serialize_listing(products)
+
+        assert render(data) == expected
+
+    def test_empty_querysets(self, django_assert_num_queries):
+        """Test empty querysets don't fetch any related rows."""
+        with django_assert_num_queries(2):
+            details = serialize_details(Product.objects.all())
+            listing = serialize_listing(Product.objects.all())
+
+        assert details == listing == []
+
+    @pytest.mark.parametrize(
+        "action, url_name, slug",
+        [
+            ("retrieve", "product-detail", "lamp"),
+            ("retrieve", "product-detail", "shade"),
+            (
+                "list_product_by_category_slug",
+                "product-list-product-by-category-slug",
+                "lamps",
+            ),
+        ],
+    )
+    def test_endpoint_parity(
+        self, catalog, client, settings, action, url_name, slug
+    ):
+        """Test the endpoints respond with the same bytes
+        whichever path the switch selects."""
+        url = reverse(f"product-api:{url_name}", args=[slug])
+        settings.PRODUCT_FAST_SERIALIZERS = set()
+        expected = client.get(url)
+        cache.clear()
+        settings.PRODUCT_FAST_SERIALIZERS = {action}
+
+        response = client.get(url)
+
+        assert response.content == expected.content
+        assert response["ETag"] == expected["ETag"]
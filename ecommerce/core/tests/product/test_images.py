@@ -0,0 +1,171 @@
+"""
+Test the responsive variants of product images.
+"""
+from io import StringIO
+from types import SimpleNamespace
+
+import pytest
+from PIL import Image
+
+from django.core.management import call_command
+from django.urls import reverse
+
+from product import images
+from product.images import build_variants, get_formats
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def media(settings, tmp_path):
+    """Storing the uploaded files in a temporary directory."""
+    settings.MEDIA_ROOT = tmp_path
+    settings.PRODUCT_IMAGE_WIDTHS = [320, 640, 1024]
+    settings.PRODUCT_LISTING_IMAGE_WIDTH = 400
+    return tmp_path
+
+
+@pytest.fixture
+def image(media, product_image_factory):
+    """Creating a product image with an 800x600 file."""
+    name = "uploads/product/lamp.png"
+    (media / "uploads" / "product").mkdir(parents=True)
+    Image.new("RGBA", (800, 600), "red").save(media / name)
+    return product_image_factory(url=name)
+
+
+class TestImageVariants:
+    """Test generating and serving the image variants."""
+
+    def test_build_variants(self, image, media):
+        """Test the variants are generated in the widths up to the
+        original width and in every supported format."""
+        build_variants(image.pk)
+
+        image.refresh_from_db()
+        widths = sorted({v["width"] for v in image.variants})
+        assert widths == [320, 640, 800]
+        assert len(image.variants) == len(widths) * len(get_formats())
+        assert {v["mime_type"] for v in image.variants} >= {
+            "image/jpeg", "image/webp"
+        }
+        for variant in image.variants:
+            with Image.open(media / variant["name"]) as file:
+                assert file.size == (variant["width"], variant["height"])
+        jpeg = next(v for v in image.variants if v["width"] == 320
+                    and v["mime_type"] == "image/jpeg")
+        with Image.open(media / jpeg["name"]) as file:
+            assert file.info.get("progressive")
+            assert file.size == (320, 240)
+
+    def test_missing_file(self, product_image_factory):
+        """Test an image without a readable file keeps no variants."""
+        image = product_image_factory(url="uploads/product/missing.jpg")
+
+        build_variants(image.pk)
+
+        image.refresh_from_db()
+        assert image.variants == []
+
+    def test_scheduled_on_upload(
+        self, image, media, monkeypatch, django_capture_on_commit_callbacks
+    ):
+        """Test saving a new file replaces the variants on commit,
+        while the other changes don't submit any work."""
+        submitted = []
+
+        def submit(func, *args):
+            submitted.append(args)
+            func(*args)
+
+        monkeypatch.setattr(
+            images, "get_executor", lambda: SimpleNamespace(submit=submit)
+        )
+        build_variants(image.pk)
+        image.refresh_from_db()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            image.alternative_text = "lamp"
+            image.save()
+        assert submitted == []
+
+        Image.new("RGB", (300, 200)).save(media / "uploads/product/new.png")
+        with django_capture_on_commit_callbacks(execute=True):
+            image.url = "uploads/product/new.png"
+            image.save()
+        image.refresh_from_db()
+        assert submitted == [(image.pk,)]
+        assert {v["width"] for v in image.variants} == {300}
+
+    def test_replaced_variants_deleted(
+        self, image, media, monkeypatch, django_capture_on_commit_callbacks
+    ):
+        """Test replacing the file deletes the variant files
+        of the old file once the change commits."""
+        monkeypatch.setattr(
+            images,
+            "get_executor",
+            lambda: SimpleNamespace(submit=lambda func, *args: None),
+        )
+        build_variants(image.pk)
+        image.refresh_from_db()
+        old_files = [media / variant["name"] for variant in image.variants]
+
+        Image.new("RGB", (300, 200)).save(media / "uploads/product/new.png")
+        with django_capture_on_commit_callbacks(execute=True):
+            image.url = "uploads/product/new.png"
+            image.save()
+            assert all(path.exists() for path in old_files)
+
+        assert not any(path.exists() for path in old_files)
+
+    def test_generate_missing_variants_command(
+        self, image, media, product_image_factory
+    ):
+        """Test the command generates the variants of the
+        images without variants and leaves the others alone."""
+        Image.new("RGB", (300, 200)).save(media / "uploads/product/done.png")
+        done = product_image_factory(url="uploads/product/done.png")
+        build_variants(done.pk)
+        done.refresh_from_db()
+        updated_at = done.updated_at
+        out = StringIO()
+
+        call_command("generate_image_variants", stdout=out)
+
+        image.refresh_from_db()
+        done.refresh_from_db()
+        assert {v["width"] for v in image.variants} == {320, 640, 800}
+        assert done.updated_at == updated_at
+        assert "Generated the variants of 1 of 1 images" in out.getvalue()
+
+    def test_srcset_and_listing_variant(self, image, client):
+        """Test the detail lists the srcset of every format while the
+        listing picks the smallest variant fitting the grid."""
+        build_variants(image.pk)
+        product = image.product_line.product
+        product.is_active = True
+        product.save()
+        product.category.slug = "lamps"
+        product.category.is_active = True
+        product.category.save()
+
+        detail = client.get(
+            reverse("product-api:product-detail", args=[product.slug])
+        ).json()[0]["product_line"][0]["product_image"][0]
+        listing = client.get(
+            reverse(
+                "product-api:product-list-product-by-category-slug",
+                args=["lamps"],
+            )
+        ).json()[0]["image"][0]
+
+        assert detail["url"] == "/media/uploads/product/lamp.png"
+        assert detail["srcset"]["image/jpeg"] == ", ".join(
+            f"/media/uploads/product/variants/lamp-{width}w.jpg {width}w"
+            for width in (320, 640, 800)
+        )
+        assert listing["url"] == (
+            "/media/uploads/product/variants/lamp-640w.jpg"
+        )
+        assert listing["srcset"] == detail["srcset"]
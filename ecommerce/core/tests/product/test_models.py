@@ -1,13 +1,22 @@
 """
 Test models.
 """
+from datetime import datetime, timezone
+
 import pytest
 
 from django.core.exceptions import ValidationError
 from django.db.utils import IntegrityError
 from django.db.models import ProtectedError
 
-from core.models.product import Category, Product, ProductLine, AttributeValue
+from core.fields import OrderField
+from core.models.product import (
+    Category,
+    Product,
+    ProductLine,
+    ProductImage,
+    AttributeValue,
+)
 
 pytestmark = pytest.mark.django_db
 
@@ -230,6 +239,32 @@ class TestProductLineModel:
         with pytest.raises(ValidationError):
             product_line_factory(order=1, product=product_obj)
 
+    def test_duplicate_order_values_database_constraint(
+            self, product_line_factory, product_factory
+    ):
+        """Test the database rejects duplicate order
+        values of the same product without validation."""
+        product_obj = product_factory()
+        prod_line = product_line_factory(order=1, product=product_obj)
+        prod_line.pk = None
+        prod_line.sku = "unique"
+        with pytest.raises(IntegrityError):
+            ProductLine.objects.bulk_create([prod_line])
+
+    def test_duplicate_order_validated_with_single_query(
+            self, product_line_factory, product_factory,
+            django_assert_max_num_queries
+    ):
+        """Test validating the order of a product line costs the
+        same number of queries regardless of its siblings."""
+        product_obj = product_factory()
+        prod_lines = [
+            product_line_factory(product=product_obj) for _ in range(5)
+        ]
+
+        with django_assert_max_num_queries(4):
+            prod_lines[0].full_clean()
+
     def test_product_type_on_delete_protect(
         self, product_line_factory, product_type_factory
     ):
@@ -264,6 +299,101 @@ class TestProductImageModel:
         with pytest.raises(ValidationError):
             product_image_factory(product_line=obj, order=1)
 
+    def test_order_allocated_automatically(
+            self, product_line_factory, product_image_factory
+    ):
+        """Test allocating the next order number of the same product line
+        when the order field isn't set."""
+        obj = product_line_factory()
+        product_image_factory(product_line=obj, order=5)
+        image = product_image_factory(product_line=obj)
+        other_image = product_image_factory()
+
+        image.refresh_from_db()
+        assert image.order == 6
+        assert other_image.order == 1
+
+    def test_order_allocated_again_after_conflict(
+            self, product_line_factory, product_image_factory, monkeypatch
+    ):
+        """Test a save whose order number was taken by a concurrent
+        save retries with the next free order number."""
+        obj = product_line_factory()
+        product_image_factory(product_line=obj)
+        next_values = OrderField.next_values
+        stale = [{obj.pk: 1}]
+        monkeypatch.setattr(
+            OrderField,
+            "next_values",
+            lambda self, values, using: (
+                stale.pop() if stale else next_values(self, values, using)
+            ),
+        )
+
+        image = product_image_factory(product_line=obj)
+
+        assert image.order == 2
+        assert not stale
+
+    def test_bulk_create_allocates_contiguous_orders(
+            self, product_line_factory, product_image_factory,
+            django_assert_num_queries
+    ):
+        """Test bulk_create allocates contiguous order
+        numbers for every product line in one query."""
+        obj1 = product_line_factory()
+        obj2 = product_line_factory()
+        product_image_factory(product_line=obj1, order=3)
+        images = [
+            ProductImage(product_line=obj, alternative_text="alt")
+            for obj in (obj1, obj2, obj1, obj2, obj1)
+        ]
+
+        with django_assert_num_queries(2):
+            ProductImage.objects.bulk_create(images)
+
+        assert [image.order for image in images] == [4, 1, 5, 2, 6]
+
+    def test_changes_bump_product_line_and_product(
+            self, product_line_factory, product_image_factory
+    ):
+        """Test saving or deleting an image bumps the updated_at
+        timestamps of its product line and product."""
+        obj = product_line_factory()
+        stale = {"updated_at": datetime(2020, 1, 1, tzinfo=timezone.utc)}
+        ProductLine.objects.update(**stale)
+        Product.objects.update(**stale)
+
+        product_image_factory(product_line=obj).delete()
+
+        obj.refresh_from_db()
+        obj.product.refresh_from_db()
+        assert obj.updated_at > stale["updated_at"]
+        assert obj.product.updated_at > stale["updated_at"]
+
+    def test_line_summary_of_product(
+            self, product_factory, product_line_factory
+    ):
+        """Test the price range and stock flag of the product follow
+        its lines, saving a stale product keeps the summary."""
+        product = product_factory()
+        cheap = product_line_factory(product=product, price=5, stock_qty=0)
+        product_line_factory(product=product, price=20, stock_qty=0)
+        cheap.stock_qty = 3
+        cheap.save()
+        product.name = "renamed"
+        product.save()
+
+        product.refresh_from_db()
+        assert (product.min_price, product.max_price) == (5, 20)
+        assert product.in_stock is True
+
+        cheap.delete()
+
+        product.refresh_from_db()
+        assert (product.min_price, product.max_price) == (20, 20)
+        assert product.in_stock is False
+
 
 class TestAttributeModel:
     """Test for the Attribute model."""
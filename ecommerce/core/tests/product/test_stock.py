@@ -0,0 +1,296 @@
+"""
+Test the stock reservations of product lines.
+"""
+import threading
+import time
+from datetime import timedelta
+
+import pytest
+
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework import status
+
+from core.models.product import Product, ProductLine, StockReservation
+from core.models.user import User
+from core.signals import catalog_changed
+from product import stock
+
+pytestmark = pytest.mark.django_db
+
+
+def make_lines(make_product, count):
+    """Creating the lines s0, s1... of the lamp product
+    with 10 items in stock each."""
+    product = make_product(
+        "lamp", count, sku_prefix="s", line_fields={"stock_qty": 10}
+    )
+    return list(product.product_line.order_by("order"))
+
+
+@pytest.fixture
+def lines(make_product):
+    return make_lines(make_product, 2)
+
+
+def get_stock(*skus):
+    return dict(
+        ProductLine.objects.filter(sku__in=skus).values_list(
+            "sku", "stock_qty"
+        )
+    )
+
+
+class TestStockReservation:
+    """Test reserving, releasing and confirming stock."""
+
+    def test_constant_queries(self, make_product):
+        """Test reserving 50 lines costs the same queries as one line."""
+        lines = make_lines(make_product, 50)
+        with CaptureQueriesContext(connection) as one:
+            stock.reserve({"s0": 1})
+        with CaptureQueriesContext(connection) as fifty:
+            stock.reserve({line.sku: 2 for line in lines})
+
+        assert len(fifty) == len(one)
+        assert get_stock("s0", "s1", "s49") == {"s0": 7, "s1": 8, "s49": 8}
+
+    def test_all_or_nothing(self, lines):
+        """Test nothing is reserved when any line is short or unknown."""
+        with pytest.raises(stock.InsufficientStock) as error:
+            stock.reserve({"s0": 3, "s1": 11, "missing": 1})
+
+        assert error.value.skus == ["missing", "s1"]
+        assert get_stock("s0", "s1") == {"s0": 10, "s1": 10}
+        assert not StockReservation.objects.exists()
+
+    def test_release(self, lines):
+        """Test a released reservation gives its stock back once."""
+        reservation = stock.reserve({"s0": 4, "s1": 10})
+
+        assert get_stock("s0", "s1") == {"s0": 6, "s1": 0}
+        assert stock.release(reservation.token) is True
+        assert stock.release(reservation.token) is False
+        assert get_stock("s0", "s1") == {"s0": 10, "s1": 10}
+
+    def test_confirm(self, lines):
+        """Test a confirmed reservation keeps its stock taken,
+        while expired reservations can't be confirmed."""
+        reservation = stock.reserve({"s0": 4})
+        expired = stock.reserve({"s1": 4})
+        StockReservation.objects.filter(pk=expired.pk).update(
+            expires_at=timezone.now() - timedelta(seconds=1)
+        )
+
+        assert stock.confirm(reservation.token) is True
+        assert stock.confirm(expired.token) is False
+        assert stock.release(reservation.token) is False
+        assert get_stock("s0", "s1") == {"s0": 6, "s1": 6}
+
+    def test_stock_flag_without_catalog_refresh(self, lines):
+        """Test reserving and releasing update the stock flag of the
+        product without the reindex and facet refresh of bulk writes."""
+        sent = []
+
+        def receiver(sender, **kwargs):
+            sent.append(sender)
+
+        catalog_changed.connect(receiver)
+        try:
+            reservation = stock.reserve({"s0": 10, "s1": 10})
+            reserved = Product.objects.get(slug="lamp").in_stock
+            stock.release(reservation.token)
+        finally:
+            catalog_changed.disconnect(receiver)
+
+        assert reserved is False
+        assert Product.objects.get(slug="lamp").in_stock is True
+        assert sent == []
+
+    def test_release_expired(self, lines):
+        """Test the command releases only the expired reservations."""
+        expired = [stock.reserve({"s0": 1, "s1": 2}) for _ in range(2)]
+        stock.reserve({"s0": 3})
+        StockReservation.objects.filter(
+            pk__in=[reservation.pk for reservation in expired]
+        ).update(expires_at=timezone.now())
+
+        call_command("release_expired_reservations", stdout=None)
+
+        assert get_stock("s0", "s1") == {"s0": 7, "s1": 10}
+        assert StockReservation.objects.count() == 1
+
+
+class TestStockReservationEndpoints:
+    """Test the stock reservation endpoints."""
+
+    URL = reverse("product-api:reservation-list")
+
+    def test_reserve(self, lines, user_client, create_user):
+        """Test creating a reservation invalidates the product document."""
+        detail_url = reverse("product-api:product-detail", args=["lamp"])
+        user_client.get(detail_url)
+
+        response = user_client.post(
+            self.URL,
+            {
+                "items": [
+                    {"sku": "s1", "quantity": 2},
+                    {"sku": "s0", "quantity": 1},
+                ],
+                "ttl": 60,
+            },
+            format="json",
+        )
+        detail = user_client.get(detail_url).json()[0]
+
+        assert response.status_code == status.HTTP_201_CREATED
+        assert response.data["items"] == [
+            {"sku": "s0", "quantity": 1}, {"sku": "s1", "quantity": 2}
+        ]
+        reservation = StockReservation.objects.get()
+        assert reservation.owner == create_user
+        assert response.data["token"] == str(reservation.token)
+        assert timedelta(seconds=55) < (
+            reservation.expires_at - timezone.now()
+        ) <= timedelta(seconds=60)
+        assert {
+            line["sku"]: line["stock_qty"] for line in detail["product_line"]
+        }.items() >= {"s0": 9, "s1": 8}.items()
+
+    @pytest.mark.parametrize(
+        "data",
+        [
+            {"items": []},
+            {"items": [{"sku": "s0", "quantity": 0}]},
+            {"items": [{"sku": "s0", "quantity": 1}] * 2},
+            {"items": [{"sku": "s0", "quantity": 1}], "ttl": 100000},
+        ],
+    )
+    def test_invalid(self, lines, user_client, data):
+        """Test invalid reservations are rejected."""
+        response = user_client.post(self.URL, data, format="json")
+
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_insufficient_stock(self, lines, user_client):
+        """Test a reservation beyond the stock gets a 409."""
+        response = user_client.post(
+            self.URL,
+            {"items": [{"sku": "s0", "quantity": 11}]},
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_409_CONFLICT
+        assert response.data["skus"] == ["s0"]
+
+    def test_release_and_confirm(self, lines, user_client, create_user):
+        """Test releasing and confirming reservations by token."""
+        released, confirmed = (
+            stock.reserve({sku: 1}, owner=create_user).token
+            for sku in ("s0", "s1")
+        )
+
+        responses = [
+            user_client.delete(reverse(
+                "product-api:reservation-detail", args=[released]
+            )),
+            user_client.post(reverse(
+                "product-api:reservation-confirm", args=[confirmed]
+            )),
+            user_client.delete(reverse(
+                "product-api:reservation-detail", args=[released]
+            )),
+        ]
+
+        assert [response.status_code for response in responses] == [
+            status.HTTP_204_NO_CONTENT,
+            status.HTTP_204_NO_CONTENT,
+            status.HTTP_404_NOT_FOUND,
+        ]
+        assert get_stock("s0", "s1") == {"s0": 10, "s1": 9}
+
+    def test_anonymous(self, lines, client):
+        """Test anonymous users can't reserve stock."""
+        response = client.post(
+            self.URL,
+            {"items": [{"sku": "s0", "quantity": 1}]},
+            format="json",
+        )
+
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+        assert get_stock("s0") == {"s0": 10}
+
+    def test_other_users_reservations(self, lines, user_client):
+        """Test the reservations of other users are not found,
+        while the staff may release and confirm them."""
+        other = User.objects.create_user(
+            email="other@example.com", password="Test123456"
+        )
+        released, confirmed = (
+            stock.reserve({sku: 1}, owner=other).token
+            for sku in ("s0", "s1")
+        )
+        release_url = reverse(
+            "product-api:reservation-detail", args=[released]
+        )
+        confirm_url = reverse(
+            "product-api:reservation-confirm", args=[confirmed]
+        )
+
+        denied = [
+            user_client.delete(release_url), user_client.post(confirm_url)
+        ]
+        user_client.force_login(User.objects.create_user(
+            email="staff@example.com", password="Test123456", is_staff=True
+        ))
+        allowed = [
+            user_client.delete(release_url), user_client.post(confirm_url)
+        ]
+
+        assert [response.status_code for response in denied] == [
+            status.HTTP_404_NOT_FOUND, status.HTTP_404_NOT_FOUND
+        ]
+        assert [response.status_code for response in allowed] == [
+            status.HTTP_204_NO_CONTENT, status.HTTP_204_NO_CONTENT
+        ]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_reservations(product_line_factory):
+    """Test many threads reserving the same line never oversell it."""
+    product_line_factory(sku="hot", stock_qty=25)
+    results = {"reserved": 0, "short": 0}
+    lock = threading.Lock()
+
+    def hammer():
+        for _ in range(10):
+            while True:
+                try:
+                    stock.reserve({"hot": 1})
+                    outcome = "reserved"
+                except stock.InsufficientStock:
+                    outcome = "short"
+                except OperationalError:
+                    # The shared in-memory test database reports a busy
+                    # table instead of waiting, the attempt is retried.
+                    time.sleep(0.001)
+                    continue
+                break
+            with lock:
+                results[outcome] += 1
+        connections.close_all()
+
+    threads = [threading.Thread(target=hammer) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {"reserved": 25, "short": 55}
+    assert get_stock("hot") == {"hot": 0}
+    assert StockReservation.objects.count() == 25
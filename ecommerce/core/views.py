@@ -0,0 +1,71 @@
+"""
+Views of the core app.
+"""
+import mimetypes
+import secrets
+from concurrent.futures import TimeoutError
+
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_safe
+
+from PIL import Image
+
+from core.media import PoolBusy, SourceNotFound, resize_cache
+from core.metrics import collect, metrics, render
+
+
+@require_safe
+def resize_image(request, width, height, path):
+    """Returning an uploaded image resized to fit the width and height,
+    served from the disk cache. A 503 response asks to retry when the
+    resize pool is saturated."""
+    if not (
+        0 < width <= settings.IMAGE_RESIZE_MAX_SIZE
+        and 0 < height <= settings.IMAGE_RESIZE_MAX_SIZE
+    ):
+        raise Http404("Unsupported size.")
+    try:
+        file = resize_cache.get(path, width, height)
+    except SourceNotFound:
+        raise Http404("Image not found.")
+    except (PoolBusy, TimeoutError):
+        return HttpResponse(status=503, headers={"Retry-After": "1"})
+    except (OSError, Image.DecompressionBombError):
+        raise Http404("Image can't be resized.")
+
+    response = FileResponse(
+        open(file, "rb"), content_type=mimetypes.guess_type(file)[0]
+    )
+    response["ETag"] = f'"{file.stem}"'
+    patch_cache_control(
+        response, public=True, max_age=settings.IMAGE_RESIZE_MAX_AGE
+    )
+    return response
+
+
+def has_metrics_token(request):
+    """Returning whether the request carries the METRICS_TOKEN
+    as its bearer token."""
+    header = request.headers.get("Authorization", "")
+    scheme, _, token = header.partition(" ")
+    return bool(settings.METRICS_TOKEN) and (
+        scheme.lower() == "bearer"
+        and secrets.compare_digest(
+            token.encode(), settings.METRICS_TOKEN.encode()
+        )
+    )
+
+
+@require_safe
+def metrics_view(request):
+    """Returning the metrics of all processes in the Prometheus text
+    format, to the staff and to the holders of the METRICS_TOKEN only."""
+    if not (request.user.is_staff or has_metrics_token(request)):
+        raise PermissionDenied
+    metrics.flush(force=True)
+    return HttpResponse(
+        render(collect()), content_type="text/plain; version=0.0.4"
+    )
@@ -48,6 +48,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "core.middleware.PerformanceMiddleware",
+    "core.middleware.MetricsMiddleware",
+    "core.middleware.NPlusOneMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -55,6 +58,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "core.middleware.ReplicaRoutingMiddleware",
 ]
 
 ROOT_URLCONF = "ecommerce.urls"
@@ -88,6 +92,103 @@ DATABASES = {
     }
 }
 
+# Read replicas as comma separated SQLite files, opened read-only,
+# e.g. DATABASE_REPLICAS=/data/replica1.sqlite3,/data/replica2.sqlite3
+DATABASE_REPLICAS = []
+for number, path in enumerate(
+    filter(None, os.environ.get("DATABASE_REPLICAS", "").split(",")),
+    start=1,
+):
+    DATABASES[f"replica{number}"] = {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": f"file:{path}?mode=ro",
+        "OPTIONS": {"uri": True},
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_REPLICAS.append(f"replica{number}")
+
+DATABASE_ROUTERS = ["core.routers.PrimaryReplicaRouter"]
+
+# Views whose GET requests read from the replicas, as dotted paths of
+# views, viewsets or modules. Admin changelists always use the replicas.
+REPLICA_READ_VIEWS = [
+    "product.api.v1.views.CategoryViewSet",
+    "product.api.v1.views.ProductViewSet",
+    "product.api.v1.async_views",
+]
+
+# Seconds an unavailable replica is skipped before it's tried again.
+REPLICA_RETRY_SECONDS = int(os.environ.get("REPLICA_RETRY_SECONDS", 30))
+
+# PRAGMAs run on every new SQLite connection. DATABASE_PROFILE=production
+# enables WAL, so writers don't block readers, and keeps the connections
+# open between requests instead of reopening them for every request.
+SQLITE_PRODUCTION_PRAGMAS = {
+    "journal_mode": "wal",
+    # Syncing at checkpoints only, still durable against crashes.
+    "synchronous": "normal",
+    # A 64 MB page cache and 256 MB of memory mapped I/O.
+    "cache_size": -64000,
+    "mmap_size": 256 * 1024 * 1024,
+    # Milliseconds a writer waits for the write lock.
+    "busy_timeout": 5000,
+}
+SQLITE_PRAGMAS = {}
+if os.environ.get("DATABASE_PROFILE") == "production":
+    SQLITE_PRAGMAS = SQLITE_PRODUCTION_PRAGMAS
+    for database in DATABASES.values():
+        database["CONN_MAX_AGE"] = int(os.environ.get("CONN_MAX_AGE", 600))
+        database["CONN_HEALTH_CHECKS"] = True
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": os.environ.get(
+            "CACHE_BACKEND", "django.core.cache.backends.locmem.LocMemCache"
+        ),
+        "LOCATION": os.environ.get("CACHE_LOCATION", ""),
+    }
+}
+
+# The signals invalidating the cached documents only reach the cache of
+# the process handling the write. A process-local cache keeps documents
+# for a few seconds by default, so the other workers can't serve stale
+# documents for long, a shared cache like Redis keeps them for long.
+CACHE_IS_SHARED = CACHES["default"]["BACKEND"] not in (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+LOCAL_CACHE_TIMEOUT = 5
+
+# Seconds a rendered product detail document is kept in the cache,
+# documents are invalidated by signals whenever the product changes.
+PRODUCT_DETAIL_CACHE_TIMEOUT = int(
+    os.environ.get(
+        "PRODUCT_DETAIL_CACHE_TIMEOUT",
+        60 * 60 * 24 if CACHE_IS_SHARED else LOCAL_CACHE_TIMEOUT,
+    )
+)
+
+# Seconds a nested category tree is kept in the cache, trees are
+# invalidated by signals whenever a category changes.
+CATEGORY_TREE_CACHE_TIMEOUT = int(
+    os.environ.get(
+        "CATEGORY_TREE_CACHE_TIMEOUT",
+        60 * 60 if CACHE_IS_SHARED else LOCAL_CACHE_TIMEOUT,
+    )
+)
+
+# Seconds the attribute facet counts of a category are kept in the cache.
+FACETS_CACHE_TIMEOUT = int(
+    os.environ.get(
+        "FACETS_CACHE_TIMEOUT",
+        60 * 15 if CACHE_IS_SHARED else LOCAL_CACHE_TIMEOUT,
+    )
+)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -125,6 +226,28 @@ USE_TZ = True
 
 STATIC_URL = "static/"
 
+# Uploaded files
+MEDIA_URL = "/media/"
+MEDIA_ROOT = os.environ.get("MEDIA_ROOT", BASE_DIR / "media")
+
+# On-demand image resizing of the uploads under MEDIA_URL/resize/<w>x<h>/
+IMAGE_RESIZE_TREES = ["uploads/product", "uploads/profile"]
+IMAGE_RESIZE_MAX_SIZE = int(os.environ.get("IMAGE_RESIZE_MAX_SIZE", 2400))
+IMAGE_RESIZE_CACHE_DIR = os.environ.get(
+    "IMAGE_RESIZE_CACHE_DIR", BASE_DIR / "cache" / "resized"
+)
+# Cap of the cache in bytes, least recently used files are evicted
+IMAGE_RESIZE_CACHE_SIZE = int(
+    os.environ.get("IMAGE_RESIZE_CACHE_SIZE", 1024 * 1024 * 1024)
+)
+# Resize processes and the pending resizes accepted per process
+IMAGE_RESIZE_WORKERS = int(os.environ.get("IMAGE_RESIZE_WORKERS", 2))
+IMAGE_RESIZE_QUEUE_FACTOR = int(
+    os.environ.get("IMAGE_RESIZE_QUEUE_FACTOR", 4)
+)
+IMAGE_RESIZE_TIMEOUT = int(os.environ.get("IMAGE_RESIZE_TIMEOUT", 10))
+IMAGE_RESIZE_MAX_AGE = int(os.environ.get("IMAGE_RESIZE_MAX_AGE", 86400))
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -136,6 +259,88 @@ REST_FRAMEWORK = {
 
 SPECTACULAR_SETTINGS = {"TITLE": "Django ecommerce project"}
 
+# Product list pagination
+PRODUCT_LIST_PAGE_SIZE = int(os.environ.get("PRODUCT_LIST_PAGE_SIZE", 20))
+PRODUCT_LIST_MAX_PAGE_SIZE = int(
+    os.environ.get("PRODUCT_LIST_MAX_PAGE_SIZE", 100)
+)
+PRODUCT_SEARCH_PAGE_SIZE = int(os.environ.get("PRODUCT_SEARCH_PAGE_SIZE", 20))
+
+# Products fetched with their related rows per query of the catalog export
+PRODUCT_EXPORT_CHUNK_SIZE = int(
+    os.environ.get("PRODUCT_EXPORT_CHUNK_SIZE", 500)
+)
+
+# Serving the hot read endpoints of product's API by async views
+ASYNC_API = bool(int(os.environ.get("ASYNC_API", 0)))
+
+# Product API actions rendered by the values() based fast serializers
+PRODUCT_FAST_SERIALIZERS = set(
+    filter(
+        None,
+        os.environ.get(
+            "PRODUCT_FAST_SERIALIZERS",
+            "retrieve,list_product_by_category_slug",
+        ).split(","),
+    )
+)
+
+
+# Widths of the responsive product image variants and the grid width
+# the category listing picks the smallest fitting variant for
+PRODUCT_IMAGE_WIDTHS = [
+    int(width)
+    for width in os.environ.get(
+        "PRODUCT_IMAGE_WIDTHS", "320,640,1024,1600"
+    ).split(",")
+]
+PRODUCT_LISTING_IMAGE_WIDTH = int(
+    os.environ.get("PRODUCT_LISTING_IMAGE_WIDTH", 320)
+)
+# Background workers generating the image variants per process
+PRODUCT_IMAGE_WORKERS = int(os.environ.get("PRODUCT_IMAGE_WORKERS", 2))
+
+
+# Seconds a stock reservation holds the stock by default and at most
+STOCK_RESERVATION_TTL = int(os.environ.get("STOCK_RESERVATION_TTL", 900))
+STOCK_RESERVATION_MAX_TTL = int(
+    os.environ.get("STOCK_RESERVATION_MAX_TTL", 3600)
+)
+# Product lines per reservation, all updated by one conditional query
+STOCK_RESERVATION_MAX_ITEMS = int(
+    os.environ.get("STOCK_RESERVATION_MAX_ITEMS", 100)
+)
+
+
+# Share of the requests recording Server-Timing headers and performance
+# logs, for the views under the dotted paths of PERFORMANCE_VIEWS
+PERFORMANCE_SAMPLE_RATE = float(
+    os.environ.get("PERFORMANCE_SAMPLE_RATE", 0.1)
+)
+PERFORMANCE_VIEWS = ["product.api.v1.views", "product.api.v1.async_views"]
+# Queries per request over which the request is logged as a warning
+PERFORMANCE_QUERY_BUDGET = int(
+    os.environ.get("PERFORMANCE_QUERY_BUDGET", 20)
+)
+# N+1 query detection of the requests, "log" or "raise", off if empty.
+# The same query run NPLUSONE_THRESHOLD times from one serializer field
+# or line of code is reported.
+NPLUSONE_DETECTION = os.environ.get("NPLUSONE_DETECTION", "")
+NPLUSONE_THRESHOLD = int(os.environ.get("NPLUSONE_THRESHOLD", 3))
+# Directory of the metric files of the processes, summed by the metrics
+# endpoint. It's shared by the processes of one host and should be
+# emptied when the server restarts, like the counters of Prometheus.
+METRICS_DIR = os.environ.get("METRICS_DIR", BASE_DIR / "cache" / "metrics")
+# Seconds between the writes of the metrics of a process to its file
+METRICS_FLUSH_SECONDS = float(os.environ.get("METRICS_FLUSH_SECONDS", 5))
+# Bearer token of the scrapers reading the metrics endpoint besides the
+# staff, the endpoint is staff only while it's empty.
+METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+
+
+# Rows per page of the admin inlines of the catalog
+ADMIN_INLINE_PER_PAGE = int(os.environ.get("ADMIN_INLINE_PER_PAGE", 20))
+
 
 # Custom user model config
 AUTH_USER_MODEL = 'core.User'
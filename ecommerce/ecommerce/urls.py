@@ -14,11 +14,15 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+from django.conf import settings
+from django.conf.urls.static import static
 from django.contrib import admin
 from django.urls import path, include
 
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
 
+from core.views import metrics_view, resize_image
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/", include("product.api.v1.urls")),
@@ -28,4 +32,11 @@ urlpatterns = [
         SpectacularSwaggerView.as_view(url_name="schema"),
         name="docs",
     ),
-]
+    path("internal/metrics", metrics_view, name="metrics"),
+    path(
+        f"{settings.MEDIA_URL.strip('/')}/resize/<int:width>x<int:height>/"
+        "<path:path>",
+        resize_image,
+        name="resize-image",
+    ),
+] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
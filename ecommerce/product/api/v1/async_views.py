@@ -0,0 +1,130 @@
+"""
+Async views for the hot read endpoints of product's API. With the
+ASYNC_API setting they replace the matching viewset actions, reading
+through the async ORM and cache with the fast serializers.
+"""
+from functools import wraps
+
+from django.http import HttpResponse, HttpResponseNotAllowed
+
+from rest_framework import status
+from rest_framework.exceptions import ValidationError
+from rest_framework.renderers import JSONRenderer
+
+from .conditional import (
+    get_not_modified_response,
+    make_etag,
+    set_validators,
+)
+from .fast_serializers import (
+    aserialize_categories,
+    aserialize_details,
+    aserialize_listing,
+)
+from .queries import (
+    CATEGORY_VERSIONS,
+    PRODUCT_VERSIONS,
+    get_active_categories,
+    get_category_products,
+    get_listing_ordering,
+    get_product,
+)
+from product.cache import aget_product_detail, aset_product_detail
+from product.facets import aget_attribute_filters
+from core.models.product import Category
+from core.performance import timed
+
+renderer = JSONRenderer()
+
+
+def safe_methods(view):
+    """Allowing only the GET and HEAD methods for an async view."""
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ("GET", "HEAD"):
+            return HttpResponseNotAllowed(["GET", "HEAD"])
+        return await view(request, *args, **kwargs)
+
+    return wrapper
+
+
+async def conditional_response(
+    request, versions, get_data, last_modified=None
+):
+    """Returning a 304 response when the If-None-Match or If-Modified-Since
+    headers match the validators, otherwise the JSON of get_data(). The
+    etag is the one the viewset actions return for JSON responses."""
+    etag = make_etag(
+        renderer.media_type, request.get_full_path(), versions
+    )
+    response = get_not_modified_response(request, etag, last_modified)
+    if response is None:
+        with timed("serialize"):
+            data = await get_data()
+        with timed("render"):
+            content = renderer.render(data)
+        response = HttpResponse(content, content_type=renderer.media_type)
+    return set_validators(response, etag, last_modified)
+
+
+@safe_methods
+async def category_list(request):
+    """Returning the active categories."""
+    versions = await Category.objects.aaggregate(**CATEGORY_VERSIONS)
+    return await conditional_response(
+        request,
+        versions.values(),
+        lambda: aserialize_categories(get_active_categories()),
+    )
+
+
+@safe_methods
+async def product_detail(request, slug):
+    """Returning a product with the assigned slug from the cache
+    or rendering and caching it on a cache miss."""
+    cached = await aget_product_detail(slug)
+    if cached is not None:
+        last_modified, data = cached
+
+        async def get_data():
+            return data
+
+    else:
+        last_modified = await (
+            get_product(slug).values_list("updated_at", flat=True).afirst()
+        )
+
+        async def get_data():
+            data = await aserialize_details(get_product(slug))
+            if data:
+                await aset_product_detail(slug, last_modified, data)
+            return data
+
+    return await conditional_response(
+        request, [last_modified], get_data, last_modified
+    )
+
+
+@safe_methods
+async def category_products(request, cat_slug):
+    """Returning the products of a category, like the
+    list_product_by_category_slug action."""
+    attribute_filters = await aget_attribute_filters(request.GET)
+    try:
+        queryset = get_category_products(
+            cat_slug, request.GET, attribute_filters
+        )
+        ordering = get_listing_ordering(request.GET)
+    except ValidationError as error:
+        return HttpResponse(
+            renderer.render(error.detail),
+            content_type=renderer.media_type,
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    versions = await queryset.aaggregate(**PRODUCT_VERSIONS)
+    return await conditional_response(
+        request,
+        versions.values(),
+        lambda: aserialize_listing(queryset.order_by(*ordering)),
+    )
@@ -0,0 +1,40 @@
+"""
+Conditional GET helpers for product's API views.
+"""
+import hashlib
+import json
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(media_type, path, versions):
+    """Returning an etag digest of the versions, the URL and the
+    media type, so every representation has its own etag."""
+    return quote_etag(
+        hashlib.md5(
+            json.dumps(
+                [media_type, path] + [str(version) for version in versions]
+            ).encode()
+        ).hexdigest()
+    )
+
+
+def get_not_modified_response(request, etag, last_modified):
+    """Returning a 304 response when the If-None-Match or
+    If-Modified-Since headers match the validators, or None."""
+    return get_conditional_response(
+        request,
+        etag=etag,
+        last_modified=int(last_modified.timestamp())
+        if last_modified
+        else None,
+    )
+
+
+def set_validators(response, etag, last_modified):
+    """Setting the ETag and Last-Modified headers of a response."""
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    return response
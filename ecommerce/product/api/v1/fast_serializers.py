@@ -0,0 +1,251 @@
+"""
+Fast serializers for product's API. They build the same documents as
+ProductSerializer and ProductCategorySerializer from values() rows with
+plain dict assembly. Fetching the rows is kept apart from assembling
+them, so the querysets can be evaluated by sync or async code.
+"""
+from django.conf import settings
+
+from rest_framework import serializers
+
+from product.images import build_srcset, pick_variant
+from core.models.product import (
+    ProductAttributeValue,
+    ProductImage,
+    ProductLine,
+    ProductLineAttributeValue,
+)
+
+NAME = "attribute_value__attribute__name"
+VALUE = "attribute_value__value"
+CATEGORY_FIELDS = ("name", "slug")
+DETAIL_FIELDS = ("id", "name", "pid", "slug", "description")
+LISTING_FIELDS = ("id", "name", "slug", "pid", "created_at", "min_price")
+IMAGE_FIELDS = (
+    "product_line_id", "order", "url", "alternative_text", "variants"
+)
+
+# Unbound serializer fields formatting values like the model serializers.
+_price = ProductLine._meta.get_field("price")
+price_field = serializers.DecimalField(
+    max_digits=_price.max_digits, decimal_places=_price.decimal_places
+)
+datetime_field = serializers.DateTimeField()
+image_storage = ProductImage._meta.get_field("url").storage
+
+
+def image_url(name):
+    """Returning the url of an image file like the ImageField serializer."""
+    return image_storage.url(name) if name else None
+
+
+def image_document(row):
+    """Returning the ProductImageSerializer document of an image row."""
+    return {
+        "order": row["order"],
+        "url": image_url(row["url"]),
+        "alternative_text": row["alternative_text"],
+        "srcset": build_srcset(row["variants"], image_storage.url),
+    }
+
+
+def listing_image_document(row):
+    """Returning the ListingImageSerializer document of an image row."""
+    document = image_document(row)
+    variant = pick_variant(
+        row["variants"], settings.PRODUCT_LISTING_IMAGE_WIDTH
+    )
+    if variant is not None:
+        document["url"] = image_url(variant["name"])
+    return document
+
+
+def assemble_categories(categories):
+    """Assembling the CategorySerializer documents of the fetched rows."""
+    return [
+        {"category": category["name"], "slug": category["slug"]}
+        for category in categories
+    ]
+
+
+def detail_querysets(product_ids):
+    """Returning the querysets of the product lines and the attribute
+    values of the products, ordered like ProductQuerySet.with_details()."""
+    return (
+        ProductLine.objects.filter(product__in=product_ids)
+        .order_by("order")
+        .values("id", "product_id", "order", "price", "sku", "stock_qty"),
+        ProductAttributeValue.objects.filter(product__in=product_ids)
+        .order_by("attribute_value_id")
+        .values_list("product_id", NAME, VALUE),
+    )
+
+
+def product_line_querysets(product_line_ids):
+    """Returning the querysets of the images and the attribute values
+    of the product lines, ordered like ProductQuerySet.with_details()."""
+    return (
+        ProductImage.objects.filter(product_line__in=product_line_ids)
+        .order_by("order")
+        .values(*IMAGE_FIELDS),
+        ProductLineAttributeValue.objects.filter(
+            product_line__in=product_line_ids
+        )
+        .order_by("attribute_value_id")
+        .values_list("product_line_id", NAME, VALUE),
+    )
+
+
+def assemble_details(products, lines, attributes, images, line_attributes):
+    """Assembling the ProductSerializer documents of the fetched rows."""
+    line_images, specifications = {}, {}
+    product_lines, product_attributes = {}, {}
+    for row in images:
+        line_images.setdefault(row["product_line_id"], []).append(
+            image_document(row)
+        )
+    for product_line_id, name, value in line_attributes:
+        specifications.setdefault(product_line_id, {})[name] = value
+    for product_id, name, value in attributes:
+        product_attributes.setdefault(product_id, {})[name] = value
+    for row in lines:
+        product_lines.setdefault(row["product_id"], []).append({
+            "order": row["order"],
+            "price": price_field.to_representation(row["price"]),
+            "sku": row["sku"],
+            "stock_qty": row["stock_qty"],
+            "product_image": line_images.get(row["id"], []),
+            "specifications": specifications.get(row["id"], {}),
+        })
+
+    return [
+        {
+            "name": product["name"],
+            "pid": product["pid"],
+            "slug": product["slug"],
+            "description": product["description"],
+            "product_line": product_lines.get(product["id"], []),
+            "attributes": product_attributes.get(product["id"], {}),
+        }
+        for product in products
+    ]
+
+
+def serialize_details(queryset):
+    """Returning the ProductSerializer documents of a product
+    queryset, related rows are only fetched when there are any."""
+    products = list(queryset.values(*DETAIL_FIELDS))
+    if not products:
+        return []
+    lines, attributes = map(
+        list, detail_querysets([product["id"] for product in products])
+    )
+    images, line_attributes = map(
+        list, product_line_querysets([row["id"] for row in lines])
+    ) if lines else ([], [])
+    return assemble_details(
+        products, lines, attributes, images, line_attributes
+    )
+
+
+def listing_images_queryset(product_ids):
+    """Returning the queryset of the first images
+    of the cover lines of the products."""
+    return ProductImage.objects.filter(
+        product_line__in=ProductLine.objects.covers().filter(
+            product__in=product_ids
+        ),
+        order=1,
+    ).values("product_line__product_id", *IMAGE_FIELDS)
+
+
+def assemble_listing(products, images):
+    """Assembling the ProductCategorySerializer documents of the fetched
+    rows, the price is the lowest line price and the image is from the
+    cover line."""
+    product_images = {}
+    for row in images:
+        product_images.setdefault(row["product_line__product_id"], []).append(
+            listing_image_document(row)
+        )
+
+    documents = []
+    for product in products:
+        document = {
+            "name": product["name"],
+            "slug": product["slug"],
+            "pid": product["pid"],
+            "created_at": datetime_field.to_representation(
+                product["created_at"]
+            ),
+        }
+        if product["min_price"] is not None:
+            document["price"] = price_field.to_representation(
+                product["min_price"]
+            )
+            document["image"] = product_images.get(product["id"], [])
+        documents.append(document)
+    return documents
+
+
+def priced_ids(products):
+    """Returning the ids of the products having product lines."""
+    return [
+        product["id"] for product in products
+        if product["min_price"] is not None
+    ]
+
+
+def serialize_listing(queryset):
+    """Returning the ProductCategorySerializer documents of a product
+    queryset, images are only fetched for products with lines."""
+    products = list(queryset.values(*LISTING_FIELDS))
+    product_ids = priced_ids(products)
+    images = list(
+        listing_images_queryset(product_ids)
+    ) if product_ids else []
+    return assemble_listing(products, images)
+
+
+# ======= Async serializers evaluating the same querysets =======
+async def _alist(queryset):
+    """Returning the rows of a queryset fetched with async for."""
+    return [row async for row in queryset]
+
+
+async def aserialize_categories(queryset):
+    """Returning the CategorySerializer documents of a category queryset."""
+    return assemble_categories(
+        await _alist(queryset.values(*CATEGORY_FIELDS))
+    )
+
+
+async def aserialize_details(queryset):
+    """Returning the ProductSerializer documents of a product queryset."""
+    products = await _alist(queryset.values(*DETAIL_FIELDS))
+    if not products:
+        return []
+    lines, attributes = [
+        await _alist(related)
+        for related in detail_querysets(
+            [product["id"] for product in products]
+        )
+    ]
+    images, line_attributes = [
+        await _alist(related)
+        for related in product_line_querysets([row["id"] for row in lines])
+    ] if lines else ([], [])
+    return assemble_details(
+        products, lines, attributes, images, line_attributes
+    )
+
+
+async def aserialize_listing(queryset):
+    """Returning the ProductCategorySerializer
+    documents of a product queryset."""
+    products = await _alist(queryset.values(*LISTING_FIELDS))
+    product_ids = priced_ids(products)
+    images = await _alist(
+        listing_images_queryset(product_ids)
+    ) if product_ids else []
+    return assemble_listing(products, images)
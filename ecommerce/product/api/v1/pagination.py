@@ -0,0 +1,24 @@
+"""
+Pagination classes for product's API.
+"""
+from django.conf import settings
+
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class ProductCursorPagination(CursorPagination):
+    """Keyset pagination for listing products,
+    the newest products are returned first."""
+
+    page_size = getattr(settings, "PRODUCT_LIST_PAGE_SIZE", 20)
+    page_size_query_param = "page_size"
+    max_page_size = getattr(settings, "PRODUCT_LIST_MAX_PAGE_SIZE", 100)
+    ordering = "-id"
+
+
+class SearchPagination(PageNumberPagination):
+    """Page number pagination for the ranked search results."""
+
+    page_size = getattr(settings, "PRODUCT_SEARCH_PAGE_SIZE", 20)
+    page_size_query_param = "page_size"
+    max_page_size = getattr(settings, "PRODUCT_LIST_MAX_PAGE_SIZE", 100)
@@ -0,0 +1,93 @@
+"""
+Query helpers shared by the sync and async views of product's API.
+"""
+from decimal import Decimal, InvalidOperation
+
+from django.db.models import Count, F, Max, Q
+
+from rest_framework.exceptions import ValidationError
+
+from core.models.product import Category, Product
+from product.facets import get_attribute_filters
+
+# Aggregates validating the responses of the category list and listings.
+CATEGORY_VERSIONS = {
+    "count": Count("pk", filter=Q(is_active=True)),
+    "last_modified": Max("updated_at"),
+}
+PRODUCT_VERSIONS = {"count": Count("pk"), "last_modified": Max("updated_at")}
+# Orderings of the ordering param of the listings, products without
+# lines have no price and come last.
+LISTING_ORDERINGS = {
+    "price": (F("min_price").asc(nulls_last=True), "pk"),
+    "-price": (F("min_price").desc(nulls_last=True), "pk"),
+}
+
+
+def is_true(query_params, name):
+    """Returning whether a boolean param is true."""
+    return query_params.get(name, "").lower() in ("1", "true", "yes")
+
+
+def include_descendants(query_params):
+    """Returning whether the include_descendants param is true."""
+    return is_true(query_params, "include_descendants")
+
+
+def get_price_range(query_params):
+    """Returning the min_price and max_price params as decimals."""
+    prices = {}
+    for name in ("min_price", "max_price"):
+        value = query_params.get(name, "")
+        if not value:
+            continue
+        try:
+            price = Decimal(value)
+        except InvalidOperation:
+            price = None
+        if price is None or not price.is_finite():
+            raise ValidationError({name: "A decimal number."})
+        prices[name] = price
+    return prices
+
+
+def get_listing_ordering(query_params):
+    """Returning the order_by() arguments of the ordering param,
+    the listings are ordered by primary key by default."""
+    ordering = query_params.get("ordering", "")
+    if not ordering:
+        return ("pk",)
+    if ordering not in LISTING_ORDERINGS:
+        raise ValidationError(
+            {"ordering": f"One of {', '.join(LISTING_ORDERINGS)}."}
+        )
+    return LISTING_ORDERINGS[ordering]
+
+
+def get_active_categories():
+    """Returning the queryset of the category list."""
+    return Category.objects.active()
+
+
+def get_product(slug):
+    """Returning the queryset of an active product by its slug."""
+    return Product.objects.active().filter(slug=slug)
+
+
+def get_category_products(cat_slug, query_params, attribute_filters=None):
+    """Returning the active products of a category, including the
+    descendant categories when the include_descendants param is
+    true, filtered by attribute values like ?color=red&size=M, by
+    the price range params and by the in_stock param. The async
+    views pass the attribute filters they looked up themselves."""
+    if attribute_filters is None:
+        attribute_filters = get_attribute_filters(query_params)
+    queryset = (
+        Product.objects.active()
+        .in_category(cat_slug, include_descendants(query_params))
+        .with_attribute_values(attribute_filters)
+        .in_price_range(**get_price_range(query_params))
+    )
+    if is_true(query_params, "in_stock"):
+        queryset = queryset.filter(in_stock=True)
+    return queryset
@@ -1,8 +1,11 @@
 """
 Serializers for product app.
 """
+from django.conf import settings
+
 from rest_framework import serializers
 
+from product.images import build_srcset, pick_variant
 from core.models.product import (
     Product,
     Category,
@@ -26,14 +29,35 @@ class CategorySerializer(serializers.ModelSerializer):
 class ProductImageSerializer(serializers.ModelSerializer):
     """Converting data to json format for the ProductImage model."""
 
+    srcset = serializers.SerializerMethodField()
+
     class Meta:
         model = ProductImage
         fields = (
             "order",
             "url",
             "alternative_text",
+            "srcset",
         )
 
+    def get_srcset(self, instance):
+        """Returning the srcset attributes of the variants by mime type."""
+        return build_srcset(instance.variants, instance.url.storage.url)
+
+
+class ListingImageSerializer(ProductImageSerializer):
+    """Serializing the images of the category listing, the url is the
+    smallest variant fitting the grid or the original file."""
+
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        variant = pick_variant(
+            instance.variants, settings.PRODUCT_LISTING_IMAGE_WIDTH
+        )
+        if variant is not None:
+            data["url"] = instance.url.storage.url(variant["name"])
+        return data
+
 
 class AttributeSerializer(serializers.ModelSerializer):
     """Converting data to json format for the Attribute model."""
@@ -117,29 +141,114 @@ class ProductLineCategorySerializer(serializers.ModelSerializer):
     """Serializing data for the endpoint
     that shows products by category slug."""
 
-    product_image = ProductImageSerializer(many=True)
+    product_image = ListingImageSerializer(many=True)
 
     class Meta:
         model = ProductLine
-        fields = ["price", "product_image"]
+        fields = ["product_image"]
 
 
 class ProductCategorySerializer(serializers.ModelSerializer):
     """Serializing data for the endpoint
     that shows products by category slug."""
 
+    price = serializers.DecimalField(
+        source="min_price", max_digits=5, decimal_places=2
+    )
     product_line = ProductLineCategorySerializer(many=True)
 
     class Meta:
         model = Product
-        fields = ["name", "slug", "pid", "created_at", "product_line"]
+        fields = ["name", "slug", "pid", "created_at", "price", "product_line"]
 
     def to_representation(self, instance):
+        """The price is the lowest price of the product lines and the
+        image is from the cover line, prefetched by for_listing()."""
         data = super().to_representation(instance)
         product_line = data.pop("product_line")
-        if product_line:
-            price = product_line[0]["price"]
-            img = product_line[0]["product_image"]
-            data.update({"price": price})
+        if data["price"] is None:
+            del data["price"]
+        else:
+            img = product_line[0]["product_image"] if product_line else []
             data.update({"image": img})
         return data
+
+
+class ReservationItemSerializer(serializers.Serializer):
+    """Validating a product line and quantity of a stock reservation."""
+
+    sku = serializers.CharField(max_length=10)
+    quantity = serializers.IntegerField(min_value=1)
+
+
+class StockReservationSerializer(serializers.Serializer):
+    """Validating the items of a new stock reservation and its ttl
+    in seconds, converting data to json format for the reservation."""
+
+    token = serializers.UUIDField(read_only=True)
+    expires_at = serializers.DateTimeField(read_only=True)
+    items = ReservationItemSerializer(many=True, allow_empty=False)
+    ttl = serializers.IntegerField(
+        min_value=1,
+        max_value=settings.STOCK_RESERVATION_MAX_TTL,
+        required=False,
+        write_only=True,
+    )
+
+    def validate_items(self, items):
+        """Checking the items fit in one query and
+        every product line is reserved once."""
+        if len(items) > settings.STOCK_RESERVATION_MAX_ITEMS:
+            raise serializers.ValidationError(
+                "Up to "
+                f"{settings.STOCK_RESERVATION_MAX_ITEMS} items are allowed."
+            )
+        skus = [item["sku"] for item in items]
+        if len(set(skus)) != len(skus):
+            raise serializers.ValidationError("Duplicate skus.")
+        return items
+
+    def to_representation(self, instance):
+        """Listing the reserved skus and quantities of a reservation."""
+        return {
+            "token": str(instance.token),
+            "expires_at": self.fields["expires_at"].to_representation(
+                instance.expires_at
+            ),
+            "items": [
+                {"sku": sku, "quantity": quantity}
+                for sku, quantity in instance.lines.order_by(
+                    "product_line__sku"
+                ).values_list("product_line__sku", "quantity")
+            ],
+        }
+
+
+def build_category_tree(rows):
+    """Building a nested category tree from category rows
+    ordered by their tree_id and lft columns, inactive
+    categories are left out with all their descendants."""
+    roots, path, skipped = [], [], None
+
+    for row in rows:
+        if (
+            skipped
+            and row["tree_id"] == skipped["tree_id"]
+            and row["rght"] < skipped["rght"]
+        ):
+            continue
+        if not row["is_active"]:
+            skipped = row
+            continue
+
+        while path and (
+            path[-1][0]["tree_id"] != row["tree_id"]
+            or path[-1][0]["rght"] < row["lft"]
+        ):
+            path.pop()
+
+        node = {"category": row["name"], "slug": row["slug"], "children": []}
+        (path[-1][1]["children"] if path else roots).append(node)
+        path.append((row, node))
+
+    return roots
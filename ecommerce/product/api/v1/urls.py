@@ -1,16 +1,45 @@
 """
 URL's for the product app.
 """
+from django.conf import settings
+from django.urls import URLPattern
+
 from rest_framework.routers import DefaultRouter
 
-from . import views
+from . import async_views, views
 
 app_name = "product-api"
 
 router = DefaultRouter()
 router.register("category", views.CategoryViewSet)
 router.register("product", views.ProductViewSet)
+router.register(
+    "reservation", views.StockReservationViewSet, basename="reservation"
+)
+
+# Async views replacing the viewset actions of the same URL names.
+ASYNC_VIEWS = {
+    "category-list": async_views.category_list,
+    "product-detail": async_views.product_detail,
+    "product-list-product-by-category-slug": async_views.category_products,
+}
+
+
+def use_async_views(patterns):
+    """Replacing the routes of the async views in place, so they keep
+    the precedence of the router. Format suffix routes stay with DRF."""
+    return [
+        URLPattern(
+            pattern.pattern, ASYNC_VIEWS[pattern.name], name=pattern.name
+        )
+        if pattern.name in ASYNC_VIEWS
+        and "format" not in pattern.pattern.regex.groupindex
+        else pattern
+        for pattern in patterns
+    ]
 
 
 urlpatterns = []
 urlpatterns += router.urls
+if settings.ASYNC_API:
+    urlpatterns = use_async_views(urlpatterns)
@@ -1,9 +1,18 @@
 """
 Views for product's API.
 """
-from django.db.models import Prefetch
+import hashlib
+import json
 
-from rest_framework import viewsets
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
+
+from rest_framework import status, viewsets
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.decorators import action
 
@@ -11,8 +20,57 @@ from .serializers import (
     CategorySerializer,
     ProductSerializer,
     ProductCategorySerializer,
+    StockReservationSerializer,
+    build_category_tree,
+)
+from .conditional import (
+    get_not_modified_response,
+    make_etag,
+    set_validators,
+)
+from .fast_serializers import serialize_details, serialize_listing
+from .pagination import ProductCursorPagination, SearchPagination
+from .queries import (
+    CATEGORY_VERSIONS,
+    PRODUCT_VERSIONS,
+    get_active_categories,
+    get_category_products,
+    get_listing_ordering,
+    get_price_range,
+    get_product,
+    include_descendants,
+    is_true,
 )
-from core.models.product import Category, Product, ProductLine, ProductImage
+from product.export import export_products, parse_updated_since
+from product.facets import get_attribute_filters, get_category_facets
+from product.search import search_products
+from product import stock
+from product.cache import (
+    get_category_tree,
+    get_product_detail,
+    set_category_tree,
+    set_product_detail,
+)
+from core.models.product import Category, Product
+from core.performance import timed
+
+
+def conditional_response(
+    request, versions, get_data, last_modified=None
+):
+    """Returning a 304 response when the If-None-Match or If-Modified-Since
+    headers match the validators, otherwise the response of get_data().
+    Listings have no last_modified, the latest modification time of the
+    listed rows doesn't change when a row leaves the listing."""
+    etag = make_etag(
+        request.accepted_media_type, request.get_full_path(), versions
+    )
+    response = get_not_modified_response(request, etag, last_modified)
+    if response is None:
+        with timed("serialize"):
+            data = get_data()
+        response = Response(data)
+    return set_validators(response, etag, last_modified)
 
 
 class CategoryViewSet(viewsets.ViewSet):
@@ -22,8 +80,59 @@ class CategoryViewSet(viewsets.ViewSet):
     serializer_class = CategorySerializer
 
     def list(self, request, *args, **kwargs):
-        serializer = self.serializer_class(self.queryset, many=True)
-        return Response(serializer.data)
+        """Returning the active categories or a 304 response
+        validated by the number of active categories and the
+        last modification time of all categories."""
+        versions = Category.objects.aggregate(**CATEGORY_VERSIONS)
+        return conditional_response(
+            request,
+            versions.values(),
+            lambda: self.serializer_class(
+                get_active_categories(), many=True
+            ).data,
+        )
+
+    @action(methods=["GET"], detail=False, url_path="tree")
+    def tree(self, request):
+        """Returning the nested tree of active categories, optionally
+        under the category with the root slug and up to max depth."""
+        root = request.query_params.get("root", "")
+        depth = request.query_params.get("depth", "")
+        if depth and not depth.isdigit():
+            raise ValidationError({"depth": "A non-negative integer."})
+
+        cached = get_category_tree(root, depth)
+        if cached is None:
+            with timed("serialize"):
+                data = build_category_tree(self.get_tree_rows(root, depth))
+            etag = quote_etag(
+                hashlib.md5(json.dumps(data).encode()).hexdigest()
+            )
+            set_category_tree(root, depth, etag, data)
+        else:
+            etag, data = cached
+
+        response = Response(data, headers={"ETag": etag})
+        return get_conditional_response(request, etag=etag, response=response)
+
+    def get_tree_rows(self, root, depth):
+        """Returning the category rows of the requested
+        tree in depth-first order from one query."""
+        queryset = Category.objects.order_by("tree_id", "lft").values(
+            "name", "slug", "is_active", "tree_id", "lft", "rght"
+        )
+        level = 0
+        if root:
+            root_category = get_object_or_404(self.queryset, slug=root)
+            level = root_category.level
+            queryset = queryset.filter(
+                tree_id=root_category.tree_id,
+                lft__gte=root_category.lft,
+                rght__lte=root_category.rght,
+            )
+        if depth:
+            queryset = queryset.filter(level__lte=level + int(depth))
+        return queryset
 
 
 class ProductViewSet(viewsets.ViewSet):
@@ -31,34 +140,90 @@ class ProductViewSet(viewsets.ViewSet):
 
     queryset = Product.objects.active()
     serializer_class = ProductSerializer
+    pagination_class = ProductCursorPagination
     lookup_field = "slug"
 
+    def use_fast_serializers(self):
+        """Returning whether the action renders its documents
+        with the values() based fast serializers."""
+        return self.action in settings.PRODUCT_FAST_SERIALIZERS
+
     def list(self, request):
-        """Returning a list of all products."""
-        serializer = self.serializer_class(self.queryset, many=True)
-        return Response(serializer.data)
+        """Returning a page of all products."""
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(
+            self.queryset.with_details(), request, view=self
+        )
+        with timed("serialize"):
+            data = self.serializer_class(page, many=True).data
+        return paginator.get_paginated_response(data)
 
     def retrieve(self, request, slug=None):
-        """Returning a product with the assigned slug."""
-        serializer = self.serializer_class(
-            self.queryset.filter(slug=slug)
-            .prefetch_related(Prefetch(
-                "product_line",
-                queryset=ProductLine.objects.order_by('order')
-            ))
-            .prefetch_related(Prefetch(
-                "product_line__product_image",
-                queryset=ProductImage.objects.order_by('order')
-            ))
-            .prefetch_related(Prefetch(
-                "product_line__attribute_value__attribute"
-            ))
-            .prefetch_related(Prefetch(
-                "attribute_value__attribute"
-            )),
-            many=True,
+        """Returning a product with the assigned slug, the rendered
+        document is served from the cache. The validators are read
+        from the cache or the product row before serializing."""
+        cached = get_product_detail(slug)
+        if cached is not None:
+            last_modified, data = cached
+            return conditional_response(
+                request, [last_modified], lambda: data, last_modified
+            )
+
+        last_modified = (
+            get_product(slug)
+            .values_list("updated_at", flat=True)
+            .first()
         )
-        return Response(serializer.data)
+
+        def get_data():
+            queryset = get_product(slug)
+            if self.use_fast_serializers():
+                data = serialize_details(queryset)
+            else:
+                data = list(
+                    self.serializer_class(
+                        queryset.with_details(), many=True
+                    ).data
+                )
+            if data:
+                set_product_detail(slug, last_modified, data)
+            return data
+
+        return conditional_response(
+            request, [last_modified], get_data, last_modified
+        )
+
+    @action(methods=["GET"], detail=False, url_path="export")
+    def export(self, request):
+        """Streaming all active products as JSONL, one document per line,
+        optionally only the products changed since updated_since."""
+        updated_since = request.query_params.get("updated_since")
+        if updated_since:
+            try:
+                updated_since = parse_updated_since(updated_since)
+            except ValueError as error:
+                raise ValidationError({"updated_since": str(error)})
+        return StreamingHttpResponse(
+            export_products(updated_since or None),
+            content_type="application/x-ndjson",
+            headers={
+                "Content-Disposition": 'attachment; filename="catalog.jsonl"'
+            },
+        )
+
+    @action(methods=["GET"], detail=False, url_path="search")
+    def search(self, request):
+        """Returning a page of active products matching the q param
+        ranked by relevance from the full-text search index."""
+        paginator = SearchPagination()
+        page = paginator.paginate_queryset(
+            search_products(request.query_params.get("q", "")),
+            request,
+            view=self,
+        )
+        with timed("serialize"):
+            data = ProductCategorySerializer(page, many=True).data
+        return paginator.get_paginated_response(data)
 
     @action(
             methods=["GET"],
@@ -66,22 +231,95 @@ class ProductViewSet(viewsets.ViewSet):
             url_path=r"category/(?P<cat_slug>[\w-]+)"
         )
     def list_product_by_category_slug(self, request, cat_slug=None):
-        """Returning all products filtered by
-        the associated category slug."""
-        serializer = ProductCategorySerializer(
-            self.queryset.filter(category__slug=cat_slug)
-            .prefetch_related(
-                Prefetch(
-                    "product_line",
-                    queryset=ProductLine.objects.order_by("order")
-                )
+        """Returning all products filtered by the associated category
+        slug, including the products of all descendant categories
+        when the include_descendants param is true, and filtered by
+        attribute values like ?color=red&size=M, by the min_price,
+        max_price and in_stock params and sorted by the ordering param.
+        The response is validated by the number of listed products and
+        their last modification time."""
+        queryset = get_category_products(cat_slug, request.query_params)
+        ordering = get_listing_ordering(request.query_params)
+        versions = queryset.aggregate(**PRODUCT_VERSIONS)
+
+        def get_data():
+            products = queryset.order_by(*ordering)
+            if self.use_fast_serializers():
+                return serialize_listing(products)
+            return ProductCategorySerializer(
+                products.for_listing(), many=True
+            ).data
+
+        return conditional_response(
+            request, versions.values(), get_data
+        )
+
+    @action(
+            methods=["GET"],
+            detail=False,
+            url_path=r"category/(?P<cat_slug>[\w-]+)/facets"
+        )
+    def list_facets_by_category_slug(self, request, cat_slug=None):
+        """Returning the number of products per attribute value of
+        the products listed by the same category slug and params."""
+        facets = get_category_facets(
+            cat_slug,
+            include_descendants(request.query_params),
+            get_attribute_filters(request.query_params),
+            get_price_range(request.query_params),
+            is_true(request.query_params, "in_stock"),
+        )
+        return Response(facets)
+
+
+class StockReservationViewSet(viewsets.ViewSet):
+    """Reserving the stock of product lines for checkouts. Reservations
+    are released and confirmed by their owner or by the staff."""
+
+    serializer_class = StockReservationSerializer
+    permission_classes = [IsAuthenticated]
+    lookup_field = "token"
+    lookup_value_regex = "[0-9a-f-]{36}"
+
+    def get_owner(self):
+        """Returning the owner the reservations are limited to,
+        None for the staff who may handle every reservation."""
+        return None if self.request.user.is_staff else self.request.user
+
+    def create(self, request):
+        """Returning a new reservation of the user holding the stock of
+        all the items, or a 409 response listing the skus without
+        enough stock."""
+        serializer = self.serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        items = serializer.validated_data["items"]
+        try:
+            reservation = stock.reserve(
+                {item["sku"]: item["quantity"] for item in items},
+                serializer.validated_data.get("ttl"),
+                owner=request.user,
             )
-            .prefetch_related(
-                Prefetch(
-                    "product_line__product_image",
-                    queryset=ProductImage.objects.filter(order=1),
-                )
-            ),
-            many=True,
+        except stock.InsufficientStock as error:
+            return Response(
+                {"detail": str(error), "skus": error.skus},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return Response(
+            self.serializer_class(reservation).data,
+            status=status.HTTP_201_CREATED,
         )
-        return Response(serializer.data)
+
+    def destroy(self, request, token=None):
+        """Releasing a reservation, its stock is available again.
+        Reservations of other users are not found."""
+        if not stock.release(token, self.get_owner()):
+            raise NotFound()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(methods=["POST"], detail=True, url_path="confirm")
+    def confirm(self, request, token=None):
+        """Confirming an unexpired reservation for an order, its stock
+        stays taken. Expired reservations can't be confirmed."""
+        if not stock.confirm(token, self.get_owner()):
+            raise NotFound()
+        return Response(status=status.HTTP_204_NO_CONTENT)
@@ -1,6 +1,14 @@
-from django.apps import AppConfig
+from django.apps import AppConfig, apps
+from django.db.models.signals import post_migrate
 
 
 class ProductConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "product"
+
+    def ready(self):
+        from . import signals  # noqa
+        from .search import create_index
+
+        # The index is built from the tables of the core app.
+        post_migrate.connect(create_index, sender=apps.get_app_config("core"))
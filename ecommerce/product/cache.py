@@ -0,0 +1,204 @@
+"""
+Caching rendered documents of product's API.
+"""
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from core.performance import record_cache
+
+PRODUCT_DETAIL_KEY = "product:detail:{slug}"
+CATEGORY_TREE_KEY = "category:tree:{generation}:{root}:{depth}"
+FACETS_KEY = "facets:{generation}:{category_generation}:{slug}:{params}"
+ATTRIBUTE_NAMES_KEY = "attribute:names:{generation}"
+GENERATION_KEY = "generation:{namespace}"
+
+
+def digest(value):
+    """Returning a digest of free-form key parts like slugs
+    and params, so keys stay valid for every cache backend."""
+    if not isinstance(value, str):
+        value = json.dumps(value, sort_keys=True)
+    return hashlib.md5(value.encode()).hexdigest()
+
+
+def get_generation(namespace):
+    """Returning the current generation of a cache namespace,
+    bumping it invalidates all the keys built with it."""
+    key = GENERATION_KEY.format(namespace=namespace)
+    return cache.get_or_set(key, 1, None)
+
+
+async def aget_generation(namespace):
+    """Async version of get_generation()."""
+    key = GENERATION_KEY.format(namespace=namespace)
+    return await cache.aget_or_set(key, 1, None)
+
+
+def bump_generation(namespace):
+    """Invalidating all the keys of a cache namespace."""
+    key = GENERATION_KEY.format(namespace=namespace)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+
+def product_detail_key(slug):
+    """Returning the cache key of a product detail document."""
+    return PRODUCT_DETAIL_KEY.format(slug=digest(slug))
+
+
+def get_product_detail(slug):
+    """Returning the cached last modification time and
+    detail document of a product or None on a cache miss."""
+    return record_cache(
+        "product_detail", cache.get(product_detail_key(slug))
+    )
+
+
+def set_product_detail(slug, last_modified, data):
+    """Storing the last modification time and
+    the rendered detail document of a product."""
+    cache.set(
+        product_detail_key(slug),
+        (last_modified, data),
+        settings.PRODUCT_DETAIL_CACHE_TIMEOUT,
+    )
+
+
+async def aget_product_detail(slug):
+    """Async version of get_product_detail()."""
+    return record_cache(
+        "product_detail", await cache.aget(product_detail_key(slug))
+    )
+
+
+async def aset_product_detail(slug, last_modified, data):
+    """Async version of set_product_detail()."""
+    await cache.aset(
+        product_detail_key(slug),
+        (last_modified, data),
+        settings.PRODUCT_DETAIL_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_product_details(slugs):
+    """Removing the detail documents of the given product slugs.
+    Keys are removed again after commit so a document rebuilt
+    from not yet committed rows doesn't outlive the transaction."""
+    keys = [product_detail_key(slug) for slug in set(slugs)]
+    if not keys:
+        return
+    cache.delete_many(keys)
+    transaction.on_commit(lambda: cache.delete_many(keys))
+
+
+def category_tree_key(root, depth):
+    """Returning the cache key of a category tree."""
+    return CATEGORY_TREE_KEY.format(
+        generation=get_generation("category-tree"),
+        root=digest(root),
+        depth=depth,
+    )
+
+
+def get_category_tree(root, depth):
+    """Returning the cached etag and nested
+    category tree or None on a cache miss."""
+    return record_cache(
+        "category_tree", cache.get(category_tree_key(root, depth))
+    )
+
+
+def set_category_tree(root, depth, etag, data):
+    """Storing the etag and the nested category tree."""
+    cache.set(
+        category_tree_key(root, depth),
+        (etag, data),
+        settings.CATEGORY_TREE_CACHE_TIMEOUT,
+    )
+
+
+def invalidate_category_trees():
+    """Invalidating all the cached category trees."""
+    bump_generation("category-tree")
+    transaction.on_commit(lambda: bump_generation("category-tree"))
+
+
+def facets_key(cat_slug, params):
+    """Returning the cache key of the facet counts of a category."""
+    return FACETS_KEY.format(
+        generation=get_generation("facets"),
+        category_generation=get_generation(f"facets:{digest(cat_slug)}"),
+        slug=digest(cat_slug),
+        params=digest(params),
+    )
+
+
+def get_facets(cat_slug, params):
+    """Returning the cached facet counts of
+    a category or None on a cache miss."""
+    return record_cache("facets", cache.get(facets_key(cat_slug, params)))
+
+
+def set_facets(cat_slug, params, data):
+    """Storing the facet counts of a category."""
+    cache.set(
+        facets_key(cat_slug, params), data, settings.FACETS_CACHE_TIMEOUT
+    )
+
+
+def attribute_names_key():
+    """Returning the cache key of the attribute names, which are
+    invalidated with the facets of all categories."""
+    return ATTRIBUTE_NAMES_KEY.format(generation=get_generation("facets"))
+
+
+def get_attribute_names():
+    """Returning the cached attribute names or None on a cache miss."""
+    return cache.get(attribute_names_key())
+
+
+def set_attribute_names(names):
+    """Storing the attribute names."""
+    cache.set(attribute_names_key(), names, settings.FACETS_CACHE_TIMEOUT)
+
+
+async def aattribute_names_key():
+    """Async version of attribute_names_key()."""
+    return ATTRIBUTE_NAMES_KEY.format(
+        generation=await aget_generation("facets")
+    )
+
+
+async def aget_attribute_names():
+    """Async version of get_attribute_names()."""
+    return await cache.aget(await aattribute_names_key())
+
+
+async def aset_attribute_names(names):
+    """Async version of set_attribute_names()."""
+    await cache.aset(
+        await aattribute_names_key(), names, settings.FACETS_CACHE_TIMEOUT
+    )
+
+
+def invalidate_facets(cat_slugs=None):
+    """Invalidating the facet counts of the given category
+    slugs or the facet counts of all categories."""
+    namespaces = (
+        ["facets"]
+        if cat_slugs is None
+        else [f"facets:{digest(slug)}" for slug in set(cat_slugs)]
+    )
+
+    def bump():
+        for namespace in namespaces:
+            bump_generation(namespace)
+
+    bump()
+    transaction.on_commit(bump)
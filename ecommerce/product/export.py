@@ -0,0 +1,48 @@
+"""
+Streaming JSONL export of the product catalog.
+"""
+from datetime import datetime, time
+
+from django.conf import settings
+from django.utils.dateparse import parse_date, parse_datetime
+from django.utils.timezone import get_current_timezone, make_aware
+
+from rest_framework.utils.encoders import JSONEncoder
+
+from core.models.product import Product
+from product.api.v1.serializers import ProductSerializer
+
+
+def parse_updated_since(value):
+    """Returning the aware datetime of an ISO date or datetime,
+    raising ValueError for an invalid value."""
+    since = parse_datetime(value)
+    if since is None:
+        date = parse_date(value)
+        if date is None:
+            raise ValueError(f"Invalid date or datetime '{value}'.")
+        since = datetime.combine(date, time.min)
+    if settings.USE_TZ and since.tzinfo is None:
+        since = make_aware(since, get_current_timezone())
+    return since
+
+
+def get_export_queryset(updated_since=None):
+    """Returning the active products of the export in a stable order."""
+    queryset = Product.objects.active().with_details().order_by("pk")
+    if updated_since is not None:
+        queryset = queryset.filter(updated_at__gte=updated_since)
+    return queryset
+
+
+def export_products(updated_since=None, chunk_size=None):
+    """Yielding one JSON document per line for every active product, in
+    the shape of ProductSerializer. Products and their related rows are
+    fetched chunk by chunk, so memory doesn't grow with the catalog."""
+    chunk_size = chunk_size or settings.PRODUCT_EXPORT_CHUNK_SIZE
+    serializer = ProductSerializer()
+    encoder = JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    for product in get_export_queryset(updated_since).iterator(
+        chunk_size=chunk_size
+    ):
+        yield encoder.encode(serializer.to_representation(product)) + "\n"
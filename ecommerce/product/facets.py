@@ -0,0 +1,185 @@
+"""
+Faceted attribute filtering for product's API.
+"""
+from operator import itemgetter
+
+from django.db.models import Count, Exists, OuterRef
+
+from core.models.product import (
+    Attribute,
+    Category,
+    Product,
+    ProductLineAttributeValue,
+)
+from .cache import (
+    aget_attribute_names,
+    aset_attribute_names,
+    get_attribute_names,
+    get_facets,
+    invalidate_facets,
+    set_attribute_names,
+    set_facets,
+)
+
+# Query params of the listings which aren't attribute names.
+RESERVED_PARAMS = {
+    "format",
+    "include_descendants",
+    "ordering",
+    "min_price",
+    "max_price",
+    "in_stock",
+    "page",
+    "page_size",
+    "cursor",
+}
+NAME = "attribute_value__attribute__name"
+VALUE = "attribute_value__value"
+
+
+def get_known_attribute_names():
+    """Returning the names of all attributes, from the cache."""
+    names = get_attribute_names()
+    if names is None:
+        names = set(Attribute.objects.values_list("name", flat=True))
+        set_attribute_names(names)
+    return names
+
+
+async def aget_known_attribute_names():
+    """Async version of get_known_attribute_names()."""
+    names = await aget_attribute_names()
+    if names is None:
+        names = {
+            name
+            async for name in Attribute.objects.values_list(
+                "name", flat=True
+            )
+        }
+        await aset_attribute_names(names)
+    return names
+
+
+def get_candidate_names(query_params):
+    """Returning the query params which may be attribute names."""
+    return [name for name in query_params if name not in RESERVED_PARAMS]
+
+
+def filter_known_names(query_params, names, known):
+    """Returning the attribute filters of the params which are known
+    attribute names as a dict of attribute names to values."""
+    return {
+        name: sorted(set(query_params.getlist(name)))
+        for name in sorted(names)
+        if name in known
+    }
+
+
+def get_attribute_filters(query_params):
+    """Returning the attribute filters of the query params as a dict of
+    attribute names to values, e.g. ?color=red&color=blue&size=M. The
+    params which aren't attribute names, like ?utm_source=x, are left
+    out, so they neither empty the listing nor split the facets cache."""
+    names = get_candidate_names(query_params)
+    if not names:
+        return {}
+    return filter_known_names(
+        query_params, names, get_known_attribute_names()
+    )
+
+
+async def aget_attribute_filters(query_params):
+    """Async version of get_attribute_filters()."""
+    names = get_candidate_names(query_params)
+    if not names:
+        return {}
+    return filter_known_names(
+        query_params, names, await aget_known_attribute_names()
+    )
+
+
+def _count_values(products, attributes=None, exclude=()):
+    """Counting the products of every attribute
+    value of the given products in one grouped query."""
+    queryset = ProductLineAttributeValue.objects.filter(
+        product_line__product__in=products.values("pk")
+    )
+    if attributes is not None:
+        queryset = queryset.filter(**{f"{NAME}__in": attributes})
+    if exclude:
+        queryset = queryset.exclude(**{f"{NAME}__in": exclude})
+    return (
+        queryset.values(NAME, VALUE)
+        .annotate(count=Count("product_line__product", distinct=True))
+        .order_by()
+    )
+
+
+def count_facets(products, filters):
+    """Returning the number of products per attribute value. The counts of
+    a filtered attribute ignore its own filter, so they show how many
+    products every other value of that attribute would return."""
+    rows = list(
+        _count_values(
+            products.with_attribute_values(filters), exclude=list(filters)
+        )
+    )
+    for name in filters:
+        others = {
+            other: values
+            for other, values in filters.items()
+            if other != name
+        }
+        rows.extend(
+            _count_values(
+                products.with_attribute_values(others), attributes=[name]
+            )
+        )
+
+    facets = {}
+    for row in sorted(rows, key=itemgetter(NAME, VALUE)):
+        facets.setdefault(row[NAME], {})[row[VALUE]] = row["count"]
+    return facets
+
+
+def get_category_facets(
+    cat_slug, include_descendants, filters, price_range=None, in_stock=False
+):
+    """Returning the cached facet counts of the active products of a
+    category for the given filters, price range and stock flag, so
+    they count the products of the listing with the same params."""
+    price_range = price_range or {}
+    params = {
+        "include_descendants": include_descendants,
+        **{name: str(price) for name, price in price_range.items()},
+        "in_stock": in_stock,
+        **filters,
+    }
+    facets = get_facets(cat_slug, params)
+    if facets is None:
+        products = (
+            Product.objects.active()
+            .in_category(cat_slug, include_descendants)
+            .in_price_range(**price_range)
+        )
+        if in_stock:
+            products = products.filter(in_stock=True)
+        facets = count_facets(products, filters)
+        set_facets(cat_slug, params, facets)
+    return facets
+
+
+def invalidate_category_facets(categories):
+    """Invalidating the facet counts of a category
+    queryset and all the ancestors of its categories."""
+    invalidate_facets(
+        Category.objects.filter(
+            Exists(
+                categories.filter(
+                    tree_id=OuterRef("tree_id"),
+                    lft__gte=OuterRef("lft"),
+                    rght__lte=OuterRef("rght"),
+                )
+            )
+        ).values_list("slug", flat=True)
+    )
@@ -0,0 +1,172 @@
+"""
+Responsive variants of product images. After an image is uploaded its
+variants are generated by a pool of background workers with Pillow in
+several widths and in every output format the Pillow build can write.
+The variants are recorded on the image as a list of documents like
+{"name": ..., "width": 320, "height": 240, "mime_type": "image/webp"}.
+"""
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+
+from PIL import Image, ImageOps
+
+from core.models.product import ProductImage
+
+logger = logging.getLogger(__name__)
+
+# Output formats in the order of preference with their Pillow save options.
+FORMATS = {
+    "AVIF": {"quality": 60},
+    "WEBP": {"quality": 80, "method": 4},
+    "JPEG": {"quality": 82, "optimize": True, "progressive": True},
+}
+EXTENSIONS = {"AVIF": ".avif", "WEBP": ".webp", "JPEG": ".jpg"}
+
+_executor = None
+
+
+def get_executor():
+    """Returning the worker pool, created on first use so
+    forked web workers don't share the parent's threads."""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.PRODUCT_IMAGE_WORKERS,
+            thread_name_prefix="image-variants",
+        )
+    return _executor
+
+
+def get_formats():
+    """Returning the output formats supported by the Pillow build."""
+    Image.init()
+    return [name for name in FORMATS if name in Image.SAVE]
+
+
+def get_widths(width):
+    """Returning the variant widths smaller than the original
+    width, the original width itself is always included."""
+    return [w for w in settings.PRODUCT_IMAGE_WIDTHS if w < width] + [width]
+
+
+def variant_name(name, width, image_format):
+    """Returning the storage name of a variant next to the original."""
+    directory, filename = os.path.split(name)
+    stem = os.path.splitext(filename)[0]
+    return os.path.join(
+        directory, "variants", f"{stem}-{width}w{EXTENSIONS[image_format]}"
+    )
+
+
+def encode(image, image_format):
+    """Returning the bytes of an image saved in the given format."""
+    if image_format == "JPEG" and image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+    buffer = BytesIO()
+    image.save(buffer, image_format, **FORMATS[image_format])
+    return buffer.getvalue()
+
+
+def generate_variants(name, storage):
+    """Generating the variants of a stored image file and
+    returning their documents from the smallest width."""
+    with storage.open(name) as file, Image.open(file) as original:
+        original = ImageOps.exif_transpose(original)
+        original.load()
+
+    variants = []
+    for width in get_widths(original.width):
+        height = max(1, round(original.height * width / original.width))
+        resized = original.resize((width, height), Image.LANCZOS)
+        for image_format in get_formats():
+            variants.append({
+                "name": storage.save(
+                    variant_name(name, width, image_format),
+                    ContentFile(encode(resized, image_format)),
+                ),
+                "width": width,
+                "height": height,
+                "mime_type": Image.MIME[image_format],
+            })
+    return variants
+
+
+def build_variants(image_id):
+    """Generating and recording the variants of a product image,
+    unless its file was replaced while the variants were built."""
+    try:
+        image = ProductImage.objects.filter(pk=image_id).first()
+        if image is None or not image.url:
+            return
+        name = image.url.name
+        try:
+            variants = generate_variants(name, image.url.storage)
+        except OSError:
+            logger.warning("Can't build the variants of %s", name)
+            return
+        with transaction.atomic():
+            image = (
+                ProductImage.objects.select_for_update()
+                .filter(pk=image_id, url=name)
+                .first()
+            )
+            if image is not None:
+                image.variants = variants
+                image.save(update_fields=["variants", "updated_at"])
+    finally:
+        close_old_connections()
+
+
+def schedule_variants(image_id):
+    """Submitting the variants of a product image to the
+    worker pool once the current transaction commits."""
+    transaction.on_commit(
+        lambda: get_executor().submit(build_variants, image_id)
+    )
+
+
+def delete_variants(variants, storage):
+    """Deleting the files of replaced variants once the current
+    transaction commits, missing files are skipped."""
+
+    def delete():
+        for variant in variants:
+            try:
+                storage.delete(variant["name"])
+            except OSError:
+                logger.warning("Can't delete the variant %s", variant["name"])
+
+    if variants:
+        transaction.on_commit(delete)
+
+
+def pick_variant(variants, width, mime_type="image/jpeg"):
+    """Returning the smallest variant of the mime type at least as
+    wide as the width, otherwise the widest one, or None."""
+    candidates = sorted(
+        (v for v in variants if v["mime_type"] == mime_type),
+        key=lambda variant: variant["width"],
+    )
+    return next(
+        (v for v in candidates if v["width"] >= width),
+        candidates[-1] if candidates else None,
+    )
+
+
+def build_srcset(variants, url):
+    """Returning the srcset attributes of the variants by mime
+    type, the variant names are turned into urls by url()."""
+    widths = {}
+    for variant in sorted(variants, key=lambda variant: variant["width"]):
+        widths.setdefault(variant["mime_type"], []).append(
+            f"{url(variant['name'])} {variant['width']}w"
+        )
+    return {
+        mime_type: ", ".join(srcset) for mime_type, srcset in widths.items()
+    }
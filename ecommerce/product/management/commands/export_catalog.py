@@ -0,0 +1,58 @@
+"""
+Custom command for exporting the product catalog as JSONL.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from product.export import export_products, parse_updated_since
+
+
+class Command(BaseCommand):
+    """Custom command for streaming the active products to a JSONL file."""
+
+    help = (
+        "Export the active products as JSONL, one ProductSerializer "
+        "document per line."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--output",
+            help="Output file, the standard output by default.",
+        )
+        parser.add_argument(
+            "--updated-since",
+            help="Only export products changed since an ISO date or time.",
+        )
+        parser.add_argument(
+            "--chunk-size",
+            type=int,
+            help="Number of products fetched per query.",
+        )
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        updated_since = None
+        if options["updated_since"]:
+            try:
+                updated_since = parse_updated_since(options["updated_since"])
+            except ValueError as error:
+                raise CommandError(error)
+        if options["chunk_size"] is not None and options["chunk_size"] < 1:
+            raise CommandError("--chunk-size must be positive.")
+
+        start = time.perf_counter()
+        lines = export_products(updated_since, options["chunk_size"])
+        count = 0
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as file:
+                for count, line in enumerate(lines, start=1):
+                    file.write(line)
+        else:
+            for count, line in enumerate(lines, start=1):
+                self.stdout.write(line, ending="")
+        self.stderr.write(
+            f"Exported {count} products in "
+            f"{time.perf_counter() - start:.2f} seconds."
+        )
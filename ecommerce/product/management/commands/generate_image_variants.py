@@ -0,0 +1,36 @@
+"""
+Custom command for generating the missing responsive image variants.
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from core.models.product import ProductImage
+from product.images import build_variants
+
+
+class Command(BaseCommand):
+    """Custom command for generating the variants of the product images
+    which have none, like images uploaded while the workers were down."""
+
+    help = "Generate the missing variants of the product images."
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        image_ids = list(
+            ProductImage.objects.exclude(url="")
+            .filter(variants=[])
+            .values_list("pk", flat=True)
+        )
+        start = time.perf_counter()
+        for image_id in image_ids:
+            build_variants(image_id)
+        generated = (
+            ProductImage.objects.filter(pk__in=image_ids)
+            .exclude(variants=[])
+            .count()
+        )
+        self.stdout.write(
+            f"Generated the variants of {generated} of {len(image_ids)} "
+            f"images in {time.perf_counter() - start:.2f} seconds."
+        )
@@ -0,0 +1,26 @@
+"""
+Custom command for rebuilding the full-text product search index.
+"""
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from product.search import is_supported, rebuild_index
+
+
+class Command(BaseCommand):
+    """Custom command for rebuilding the product search index."""
+
+    help = "Rebuild the FTS5 product search index from the products table."
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        if not is_supported():
+            raise CommandError("The search index requires SQLite FTS5.")
+
+        start = time.perf_counter()
+        count = rebuild_index()
+        self.stdout.write(self.style.SUCCESS(
+            f"Indexed {count} products in "
+            f"{time.perf_counter() - start:.2f} seconds."
+        ))
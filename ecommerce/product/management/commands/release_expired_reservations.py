@@ -0,0 +1,18 @@
+"""
+Custom command for releasing the expired stock reservations.
+"""
+from django.core.management.base import BaseCommand
+
+from product.stock import release_expired
+
+
+class Command(BaseCommand):
+    """Custom command for giving the stock of expired reservations back,
+    meant to be run periodically like every minute from cron."""
+
+    help = "Release the expired stock reservations."
+
+    def handle(self, *args, **options):
+        """Entrypoint for command."""
+        count = release_expired()
+        self.stdout.write(f"Released {count} expired reservations.")
@@ -0,0 +1,193 @@
+"""
+Full-text product search backed by an SQLite FTS5 index.
+"""
+import re
+from itertools import islice
+
+from django.db import DEFAULT_DB_ALIAS, connection, connections, transaction
+
+from core.models.product import (
+    Category,
+    Product,
+    ProductAttributeValue,
+    ProductLineAttributeValue,
+)
+
+TABLE = "product_search"
+# Weights of the name, description, category and attributes columns.
+BM25 = f"bm25({TABLE}, 10.0, 1.0, 4.0, 2.0)"
+CHUNK_SIZE = 500
+
+
+def is_supported(using=DEFAULT_DB_ALIAS):
+    """Returning whether the database supports the FTS5 index."""
+    return connections[using].vendor == "sqlite"
+
+
+def create_index(using=DEFAULT_DB_ALIAS, **kwargs):
+    """Creating the FTS5 virtual table if it doesn't exist,
+    it's connected to the post_migrate signal."""
+    if not is_supported(using):
+        return
+    with connections[using].cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+            "name, description, category, attributes, "
+            "tokenize = 'unicode61 remove_diacritics 2')"
+        )
+
+
+def _chunks(ids):
+    """Splitting ids to chunks fitting the query params limit."""
+    ids = iter(ids)
+    while chunk := list(islice(ids, CHUNK_SIZE)):
+        yield chunk
+
+
+def _category_names(category_ids):
+    """Returning the names of every category
+    and all its ancestors by the category id."""
+    rows = (
+        Category.objects.filter(
+            tree_id__in=Category.objects.filter(pk__in=category_ids).values(
+                "tree_id"
+            )
+        )
+        .order_by("tree_id", "lft")
+        .values_list("pk", "name", "tree_id", "rght")
+    )
+    names, path = {}, []
+    for pk, name, tree_id, rght in rows:
+        while path and (path[-1][1] != tree_id or path[-1][2] < rght):
+            path.pop()
+        path.append((name, tree_id, rght))
+        names[pk] = " ".join(node[0] for node in path)
+    return names
+
+
+def _documents(product_ids):
+    """Returning the indexed columns of the given active products."""
+    products = list(
+        Product.objects.active()
+        .filter(pk__in=product_ids)
+        .values_list("pk", "name", "description", "category_id")
+    )
+    attributes = {}
+    for product_id, value in [
+        *ProductAttributeValue.objects.filter(
+            product__in=product_ids
+        ).values_list("product_id", "attribute_value__value"),
+        *ProductLineAttributeValue.objects.filter(
+            product_line__product__in=product_ids
+        ).values_list("product_line__product_id", "attribute_value__value"),
+    ]:
+        attributes.setdefault(product_id, set()).add(value)
+    categories = _category_names({product[3] for product in products})
+
+    return [
+        (
+            pk,
+            name,
+            description,
+            categories.get(category_id, ""),
+            " ".join(sorted(attributes.get(pk, ()))),
+        )
+        for pk, name, description, category_id in products
+    ]
+
+
+def remove_products(product_ids):
+    """Removing the given products from the index."""
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        for chunk in _chunks(product_ids):
+            cursor.execute(
+                f"DELETE FROM {TABLE} WHERE rowid IN "
+                f"({', '.join(['%s'] * len(chunk))})",
+                chunk,
+            )
+
+
+def index_products(product_ids):
+    """Updating the index entries of the given products,
+    inactive products are removed from the index."""
+    if not is_supported():
+        return
+    for chunk in _chunks(product_ids):
+        remove_products(chunk)
+        with connection.cursor() as cursor:
+            cursor.executemany(
+                f"INSERT INTO {TABLE} "
+                "(rowid, name, description, category, attributes) "
+                "VALUES (%s, %s, %s, %s, %s)",
+                _documents(chunk),
+            )
+
+
+@transaction.atomic
+def rebuild_index():
+    """Rebuilding the whole index from the products table chunk
+    by chunk, searches see the old index until it's committed."""
+    create_index()
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE}")
+    product_ids = Product.objects.active().order_by("pk").values_list(
+        "pk", flat=True
+    )
+    count = 0
+    for chunk in _chunks(product_ids.iterator(chunk_size=CHUNK_SIZE)):
+        index_products(chunk)
+        count += len(chunk)
+    with connection.cursor() as cursor:
+        cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')")
+    return count
+
+
+def build_match(query):
+    """Converting the search query to an FTS5 expression matching
+    all of its words as prefixes, e.g. 'red shi' -> '"red"* "shi"*'."""
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", query))
+
+
+class SearchResults:
+    """Lazy ranked results of a search query,
+    sliced by the paginator with LIMIT and OFFSET."""
+
+    def __init__(self, query):
+        self.match = build_match(query) if is_supported() else ""
+
+    def count(self):
+        if not self.match:
+            return 0
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT count(*) FROM {TABLE} WHERE {TABLE} MATCH %s",
+                [self.match],
+            )
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return self[key:key + 1][0]
+        start, stop = key.start or 0, key.stop
+        if not self.match or (stop is not None and stop <= start):
+            return []
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s "
+                f"ORDER BY {BM25} LIMIT %s OFFSET %s",
+                [self.match, -1 if stop is None else stop - start, start],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        products = Product.objects.active().for_listing().in_bulk(ids)
+        return [products[pk] for pk in ids if pk in products]
+
+
+def search_products(query):
+    """Returning the active products matching the
+    search query ranked by BM25 relevance."""
+    return SearchResults(query)
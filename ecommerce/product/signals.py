@@ -0,0 +1,293 @@
+"""
+Signals for keeping product's API caches up to date.
+"""
+from django.db.models import Exists, OuterRef, Q
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+
+from core.models.product import (
+    Attribute,
+    AttributeValue,
+    Category,
+    Product,
+    ProductAttributeValue,
+    ProductImage,
+    ProductLine,
+    ProductLineAttributeValue,
+)
+from core.signals import catalog_changed
+from .facets import invalidate_category_facets
+from .images import delete_variants, schedule_variants
+from .cache import (
+    invalidate_category_trees,
+    invalidate_facets,
+    invalidate_product_details,
+)
+from .search import index_products, remove_products
+
+
+def _invalidate(products):
+    """Invalidating the detail documents of a product queryset."""
+    invalidate_product_details(products.values_list("slug", flat=True))
+
+
+@receiver(post_save, sender=Category)
+@receiver(pre_delete, sender=Category)
+def invalidate_categories(sender, instance, **kwargs):
+    """Invalidating the category trees of a changed category."""
+    invalidate_category_trees()
+
+
+@receiver(pre_save, sender=Product)
+def remember_product_slug(sender, instance, **kwargs):
+    """Keeping the stored slug and category for invalidating
+    the old document and facets when they change."""
+    instance._stored_slug, instance._stored_category_id = (
+        Product.objects.filter(pk=instance.pk)
+        .values_list("slug", "category_id")
+        .first()
+        if instance.pk
+        else None
+    ) or (None, None)
+
+
+@receiver(post_save, sender=Product)
+@receiver(pre_delete, sender=Product)
+def invalidate_product(sender, instance, **kwargs):
+    """Invalidating the documents and facets of a changed product."""
+    slugs = [instance.slug, getattr(instance, "_stored_slug", None)]
+    invalidate_product_details(filter(None, slugs))
+    category_ids = [
+        instance.category_id,
+        getattr(instance, "_stored_category_id", None),
+    ]
+    invalidate_category_facets(Category.objects.filter(pk__in=category_ids))
+
+
+@receiver(post_save, sender=ProductLine)
+@receiver(pre_delete, sender=ProductLine)
+@receiver(post_save, sender=ProductAttributeValue)
+@receiver(pre_delete, sender=ProductAttributeValue)
+def invalidate_product_of_row(sender, instance, **kwargs):
+    """Invalidating the product of a changed related row."""
+    _invalidate(Product.objects.filter(pk=instance.product_id))
+    if sender is ProductLine:
+        invalidate_category_facets(
+            Category.objects.filter(product=instance.product_id)
+        )
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(pre_delete, sender=ProductImage)
+@receiver(post_save, sender=ProductLineAttributeValue)
+@receiver(pre_delete, sender=ProductLineAttributeValue)
+def invalidate_product_of_product_line(sender, instance, **kwargs):
+    """Invalidating the product of a changed product line's row."""
+    _invalidate(Product.objects.filter(product_line=instance.product_line_id))
+    if sender is ProductLineAttributeValue:
+        invalidate_category_facets(
+            Category.objects.filter(
+                product__product_line=instance.product_line_id
+            )
+        )
+
+
+@receiver(post_save, sender=AttributeValue)
+@receiver(pre_delete, sender=AttributeValue)
+def invalidate_products_of_attribute_value(sender, instance, **kwargs):
+    """Invalidating all products using a changed attribute value."""
+    invalidate_facets()
+    _invalidate(
+        Product.objects.filter(
+            Q(attribute_value=instance.pk)
+            | Q(product_line__attribute_value=instance.pk)
+        )
+    )
+
+
+@receiver(post_save, sender=Attribute)
+@receiver(pre_delete, sender=Attribute)
+def invalidate_products_of_attribute(sender, instance, **kwargs):
+    """Invalidating all products using a changed attribute."""
+    invalidate_facets()
+    _invalidate(
+        Product.objects.filter(
+            Q(attribute_value__attribute=instance.pk)
+            | Q(product_line__attribute_value__attribute=instance.pk)
+        )
+    )
+
+
+@receiver(m2m_changed, sender=ProductAttributeValue)
+def invalidate_product_attribute_values(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """Invalidating products whose attribute values
+    are changed through the many to many manager."""
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        invalidate_product_details([instance.slug])
+    elif pk_set is None:
+        _invalidate(Product.objects.filter(attribute_value=instance.pk))
+    else:
+        _invalidate(Product.objects.filter(pk__in=pk_set))
+
+
+@receiver(m2m_changed, sender=ProductLineAttributeValue)
+def invalidate_product_line_attribute_values(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """Invalidating products and facets whose product lines attribute
+    values are changed through the many to many manager."""
+    if action not in ("post_add", "post_remove", "pre_clear"):
+        return
+    if not reverse:
+        products = Product.objects.filter(product_line=instance.pk)
+    elif pk_set is None:
+        products = Product.objects.filter(
+            product_line__attribute_value=instance.pk
+        )
+    else:
+        products = Product.objects.filter(product_line__in=pk_set)
+    _invalidate(products)
+    invalidate_category_facets(Category.objects.filter(product__in=products))
+
+
+# ======= Signals for keeping the search index in sync =======
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    """Indexing a saved product."""
+    index_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def remove_product(sender, instance, **kwargs):
+    """Removing a deleted product from the index."""
+    remove_products([instance.pk])
+
+
+@receiver(post_save, sender=Category)
+def index_category_products(sender, instance, **kwargs):
+    """Indexing the products of a category and its
+    descendants, category names include the ancestors."""
+    index_products(
+        Product.objects.filter(
+            category__tree_id=instance.tree_id,
+            category__lft__gte=instance.lft,
+            category__rght__lte=instance.rght,
+        ).values_list("pk", flat=True)
+    )
+
+
+@receiver(post_save, sender=AttributeValue)
+def index_attribute_value_products(sender, instance, **kwargs):
+    """Indexing all products using a changed attribute value."""
+    index_products(
+        Product.objects.filter(
+            Q(attribute_value=instance.pk)
+            | Q(product_line__attribute_value=instance.pk)
+        ).values_list("pk", flat=True)
+    )
+
+
+@receiver(post_save, sender=ProductAttributeValue)
+@receiver(post_delete, sender=ProductAttributeValue)
+def index_product_of_attribute_link(sender, instance, **kwargs):
+    """Indexing the product of a changed attribute link."""
+    index_products([instance.product_id])
+
+
+@receiver(post_save, sender=ProductLineAttributeValue)
+@receiver(post_delete, sender=ProductLineAttributeValue)
+def index_product_of_line_attribute_link(sender, instance, **kwargs):
+    """Indexing the product of a changed product line attribute link."""
+    index_products(
+        Product.objects.filter(
+            product_line=instance.product_line_id
+        ).values_list("pk", flat=True)
+    )
+
+
+@receiver(m2m_changed, sender=ProductAttributeValue)
+@receiver(m2m_changed, sender=ProductLineAttributeValue)
+def index_products_of_attribute_links(
+    sender, instance, action, reverse, pk_set, **kwargs
+):
+    """Indexing the products whose attribute values are
+    changed through the many to many managers, the products
+    losing their links by clear() are kept before clearing."""
+    if sender is ProductAttributeValue:
+        lookup = "attribute_value" if reverse else "pk"
+        pk_lookup = "pk"
+    else:
+        lookup = (
+            "product_line__attribute_value" if reverse else "product_line"
+        )
+        pk_lookup = "product_line"
+
+    if action == "pre_clear":
+        instance._cleared_product_ids = list(
+            Product.objects.filter(**{lookup: instance.pk}).values_list(
+                "pk", flat=True
+            )
+        )
+    elif action == "post_clear":
+        index_products(getattr(instance, "_cleared_product_ids", []))
+    elif action in ("post_add", "post_remove"):
+        products = (
+            Product.objects.filter(**{f"{pk_lookup}__in": pk_set})
+            if reverse
+            else Product.objects.filter(**{lookup: instance.pk})
+        )
+        index_products(products.values_list("pk", flat=True))
+
+
+# ======= Signals for generating the responsive image variants =======
+@receiver(pre_save, sender=ProductImage)
+def reset_image_variants(sender, instance, **kwargs):
+    """Dropping the variants of an image whose file is replaced,
+    the replaced file is kept for scheduling the new variants."""
+    stored_url, stored_variants = (
+        ProductImage.objects.filter(pk=instance.pk)
+        .values_list("url", "variants")
+        .first()
+        if instance.pk
+        else None
+    ) or (None, [])
+    instance._url_changed = stored_url != instance.url.name
+    if instance._url_changed:
+        instance.variants = []
+        delete_variants(stored_variants, instance.url.storage)
+
+
+@receiver(post_save, sender=ProductImage)
+def generate_image_variants(sender, instance, **kwargs):
+    """Generating the variants of a new or replaced image file."""
+    if instance.url and getattr(instance, "_url_changed", False):
+        schedule_variants(instance.pk)
+
+
+# ======= Signals for bulk writes bypassing the model signals =======
+@receiver(catalog_changed)
+def refresh_changed_products(sender, product_ids, category_ids=(), **kwargs):
+    """Invalidating the documents and facets of the products changed
+    in bulk and indexing them, and the category trees and facets of
+    the categories changed in bulk or losing products."""
+    products = Product.objects.filter(pk__in=product_ids)
+    _invalidate(products)
+    invalidate_category_facets(
+        Category.objects.filter(
+            Q(Exists(products.filter(category=OuterRef("pk"))))
+            | Q(pk__in=category_ids)
+        )
+    )
+    if category_ids:
+        invalidate_category_trees()
+    index_products(product_ids)
@@ -0,0 +1,197 @@
+"""
+Stock reservations of product lines. Stock is taken and given back with
+a single conditional UPDATE of all the reserved product lines, so a
+reservation of any number of lines costs the same number of queries and
+concurrent reservations can never take the stock below zero. The rows
+are never locked for reading. Only the stock flag and the detail
+documents of the products follow the stock, checkouts don't reindex
+the products and only invalidate the facets when a product goes in
+or out of stock.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import (
+    Case,
+    Exists,
+    F,
+    OuterRef,
+    Q,
+    Sum,
+    Value,
+    When,
+)
+from django.utils import timezone
+
+from core.models.product import (
+    Category,
+    Product,
+    ProductLine,
+    StockReservation,
+    StockReservationLine,
+)
+from product.cache import invalidate_product_details
+from product.facets import invalidate_category_facets
+
+
+class InsufficientStock(Exception):
+    """Raised when the stock of some product lines can't cover
+    a reservation, the skus lists the unknown or short lines."""
+
+    def __init__(self, skus=()):
+        self.skus = sorted(skus)
+        super().__init__(f"Insufficient stock: {', '.join(self.skus)}")
+
+
+def change_stock(deltas, lookup="sku"):
+    """Adding the deltas to the stock of the product lines looked up by
+    the keys of deltas in one query, lines whose stock would go below
+    zero are left alone. Returning the number of updated lines."""
+    condition = Q()
+    for key, delta in deltas.items():
+        condition |= Q(**{lookup: key}, stock_qty__gte=-delta)
+    return ProductLine.objects.filter(condition).update(
+        stock_qty=F("stock_qty") + Case(
+            *(
+                When(**{lookup: key}, then=Value(delta))
+                for key, delta in deltas.items()
+            )
+        ),
+        updated_at=timezone.now(),
+    )
+
+
+def refresh_stock(product_ids):
+    """Updating the stock flag of the products whose stock changed and
+    removing their detail documents. Only the facets of the categories
+    of products going in or out of stock are invalidated."""
+    products = Product.objects.filter(pk__in=product_ids)
+    flipped = list(
+        products.exclude(
+            in_stock=Exists(
+                ProductLine.objects.filter(
+                    product=OuterRef("pk"), stock_qty__gt=0
+                )
+            )
+        ).values_list("category", flat=True)
+    )
+    products.update_line_summary()
+    invalidate_product_details(products.values_list("slug", flat=True))
+    if flipped:
+        invalidate_category_facets(Category.objects.filter(pk__in=flipped))
+
+
+def get_short_skus(quantities):
+    """Returning the skus whose current stock is below the quantity."""
+    stock = dict(
+        ProductLine.objects.filter(sku__in=quantities).values_list(
+            "sku", "stock_qty"
+        )
+    )
+    return [
+        sku for sku, quantity in quantities.items()
+        if stock.get(sku, 0) < quantity
+    ]
+
+
+def reserve(quantities, ttl=None, owner=None):
+    """Reserving the quantities of the product lines by sku for ttl
+    seconds in one transaction, either every line is reserved or
+    InsufficientStock is raised. Returning the new reservation."""
+    if not quantities or min(quantities.values()) < 1:
+        raise ValueError("The quantities must be positive integers.")
+    ttl = ttl or settings.STOCK_RESERVATION_TTL
+    try:
+        with transaction.atomic():
+            lines = list(
+                ProductLine.objects.filter(sku__in=quantities).values_list(
+                    "pk", "sku", "product_id"
+                )
+            )
+            updated = change_stock(
+                {sku: -quantity for sku, quantity in quantities.items()}
+            )
+            if updated != len(quantities):
+                raise InsufficientStock()
+
+            reservation = StockReservation.objects.create(
+                owner=owner,
+                expires_at=timezone.now() + timedelta(seconds=ttl),
+            )
+            StockReservationLine.objects.bulk_create(
+                StockReservationLine(
+                    reservation=reservation,
+                    product_line_id=pk,
+                    quantity=quantities[sku],
+                )
+                for pk, sku, _ in lines
+            )
+            refresh_stock({product_id for _, _, product_id in lines})
+    except InsufficientStock:
+        # Read after the rollback, so the reasons are only informative.
+        raise InsufficientStock(get_short_skus(quantities))
+    return reservation
+
+
+def restore_stock(reservation_ids):
+    """Giving the stock held by the reservations back
+    and deleting the reservations with their lines."""
+    rows = list(
+        StockReservationLine.objects.filter(reservation__in=reservation_ids)
+        .values("product_line", "product_line__product")
+        .annotate(total=Sum("quantity"))
+    )
+    if rows:
+        change_stock(
+            {row["product_line"]: row["total"] for row in rows}, lookup="pk"
+        )
+        refresh_stock({row["product_line__product"] for row in rows})
+    StockReservation.objects.filter(pk__in=reservation_ids).delete()
+
+
+def get_reservations(token, owner=None):
+    """Returning the reservations with the token,
+    only the ones of the owner when it's given."""
+    reservations = StockReservation.objects.filter(token=token)
+    if owner is not None:
+        reservations = reservations.filter(owner=owner)
+    return reservations
+
+
+@transaction.atomic
+def release(token, owner=None):
+    """Releasing a reservation and giving its stock back.
+    Returning whether the reservation existed."""
+    reservation_ids = list(
+        get_reservations(token, owner)
+        .select_for_update()
+        .values_list("pk", flat=True)
+    )
+    if reservation_ids:
+        restore_stock(reservation_ids)
+    return bool(reservation_ids)
+
+
+@transaction.atomic
+def confirm(token, owner=None):
+    """Confirming an unexpired reservation, its stock is kept taken
+    for the order. Returning whether the reservation was confirmed."""
+    deleted, _ = get_reservations(token, owner).filter(
+        expires_at__gt=timezone.now()
+    ).delete()
+    return bool(deleted)
+
+
+@transaction.atomic
+def release_expired():
+    """Releasing all the expired reservations which aren't being
+    released at the same time. Returning their number."""
+    reservation_ids = list(
+        StockReservation.objects.select_for_update(skip_locked=True)
+        .filter(expires_at__lte=timezone.now())
+        .values_list("pk", flat=True)
+    )
+    if reservation_ids:
+        restore_stock(reservation_ids)
+    return len(reservation_ids)